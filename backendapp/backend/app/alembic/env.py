@@ -21,6 +21,7 @@ from app.models.gr_yojana import Yojana, GR
 from app.models.books import Book
 from app.models.books import Page
 from app.models.books import Word
+from app.models.books import PagePosting
 from app.models.documents import DocumentType, UserDocument
 from app.models.otp import UserOTP
 
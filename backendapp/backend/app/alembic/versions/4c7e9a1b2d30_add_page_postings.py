@@ -0,0 +1,40 @@
+"""Add inverted index (page_postings) and page line offsets
+
+Revision ID: 4c7e9a1b2d30
+Revises: 2a34e1c5ce77
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c7e9a1b2d30'
+down_revision = '2a34e1c5ce77'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('pages', sa.Column('line_offsets', sa.JSON(), nullable=True))
+    op.create_table('page_postings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('term', sa.String(length=100), nullable=False),
+    sa.Column('page_id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('term_frequency', sa.Integer(), nullable=False),
+    sa.Column('positions', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['page_id'], ['pages.id'], ),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_page_postings_term_book', 'page_postings', ['term', 'book_id'], unique=False)
+    op.create_index('ix_page_postings_page_id', 'page_postings', ['page_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_page_postings_page_id', table_name='page_postings')
+    op.drop_index('ix_page_postings_term_book', table_name='page_postings')
+    op.drop_table('page_postings')
+    op.drop_column('pages', 'line_offsets')
@@ -0,0 +1,26 @@
+"""Add packed word box columns to pages
+
+Revision ID: 5d8f0b2c3e41
+Revises: 4c7e9a1b2d30
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8f0b2c3e41'
+down_revision = '4c7e9a1b2d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('pages', sa.Column('word_boxes', sa.LargeBinary(), nullable=True))
+    op.add_column('pages', sa.Column('word_tokens', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('pages', 'word_tokens')
+    op.drop_column('pages', 'word_boxes')
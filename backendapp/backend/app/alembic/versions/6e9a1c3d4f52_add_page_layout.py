@@ -0,0 +1,24 @@
+"""Add layout column to pages
+
+Revision ID: 6e9a1c3d4f52
+Revises: 5d8f0b2c3e41
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e9a1c3d4f52'
+down_revision = '5d8f0b2c3e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('pages', sa.Column('layout', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('pages', 'layout')
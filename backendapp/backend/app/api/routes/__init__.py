@@ -7,5 +7,6 @@ from  app.api.routes.v1 import gram_sevaks
 from  app.api.routes.v1 import preset
 from  app.api.routes.v1 import profile
 from  app.api.routes.v1 import upload
+from  app.api.routes.v1 import search
 from app.api.routes.v1 import enhanced_profile
 from app.api.routes.v1 import health
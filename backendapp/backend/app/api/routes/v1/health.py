@@ -8,6 +8,10 @@ from typing import Dict, Any
 
 from app.config import get_db, check_database_health, check_database_connection
 from app.models.enums.vx_api_perms_enum import VxAPIPermsEnum
+from app.services.embedding_model import EmbeddingModelRegistry
+from app.services.ocr_cache import get_ocr_cache
+from app.services.search_cache import get_ranking_cache, get_search_cache
+from app.services.vector_index import loaded_vector_index
 from app.utils.vx_api_perms_utils import VxAPIPermsUtils
 
 router = APIRouter(prefix="/v1", tags=["health"])
@@ -16,6 +20,7 @@ router = APIRouter(prefix="/v1", tags=["health"])
 VxAPIPermsUtils.set_perm_get(path=router.prefix + '/health', perm=VxAPIPermsEnum.PUBLIC)
 VxAPIPermsUtils.set_perm_get(path=router.prefix + '/health/detailed', perm=VxAPIPermsEnum.PUBLIC)
 VxAPIPermsUtils.set_perm_get(path=router.prefix + '/health/database', perm=VxAPIPermsEnum.PUBLIC)
+VxAPIPermsUtils.set_perm_get(path=router.prefix + '/health/metrics', perm=VxAPIPermsEnum.AUTHENTICATED)
 
 @router.get("/health")
 async def basic_health_check():
@@ -118,4 +123,37 @@ async def database_specific_health_check(db: Session = Depends(get_db)):
                     "error": str(e)
                 }
             }
-        )
\ No newline at end of file
+        )
+
+
+def _process_memory() -> Dict[str, Any]:
+    """Resident memory of this worker: private pages vs file pages shared with other workers (Linux only)"""
+    fields = {"VmRSS": "rss_mb", "RssAnon": "private_mb", "RssFile": "shared_file_mb"}
+    memory = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    memory[fields[name]] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        return {}
+    return memory
+
+
+@router.get("/health/metrics")
+def search_metrics():
+    """
+    Runtime metrics of the search stack (embedding model, vector index, OCR and search caches).
+    Only reports on what this worker has already loaded; the vector index is null until first used.
+    """
+    vector_index = loaded_vector_index()
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "process": _process_memory(),
+        "embedding_model": EmbeddingModelRegistry.get_metrics(),
+        "vector_index": vector_index.get_metrics() if vector_index else None,
+        "ocr_cache": get_ocr_cache().get_metrics() if get_ocr_cache() else None,
+        "search_cache": get_search_cache().get_metrics() if get_search_cache() else None,
+        "ranking_cache": get_ranking_cache().get_metrics() if get_ranking_cache() else None
+    }
@@ -0,0 +1,202 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Dict, Iterator, List, Optional
+import json
+import logging
+import time
+
+from app.config import SessionLocal, get_db
+from app.models.enums.vx_api_perms_enum import VxAPIPermsEnum
+from app.schemas.search_schema import SemanticBatchSearchRequest
+from app.services.embedding_model import EmbeddingModelRegistry
+from app.services.search_service import SearchService
+from app.services.unified_search_service import DEFAULT_MODES, SEARCH_MODES, UnifiedSearchService
+from app.utils.vx_api_perms_utils import VxAPIPermsUtils
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/v1/search",
+    tags=["search"],
+    responses={404: {"description": "Not Found"}}
+)
+
+# DB-bound modes run in the default threadpool; semantic query encoding runs
+# in the shared embedding model executor.
+# Every mode returns {'mode', 'matches', 'count', 'next_cursor'}; pass `next_cursor`
+# back as `cursor` to get the following page of matches.
+
+VxAPIPermsUtils.set_perm_get(path=router.prefix + '/exact', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.get("/exact")
+async def exact_search(
+    q: str = Query(..., min_length=1),
+    book_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    return await run_in_threadpool(SearchService(db).exact_search, q, book_id, limit, cursor)
+
+
+VxAPIPermsUtils.set_perm_get(path=router.prefix + '/fuzzy', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.get("/fuzzy")
+async def fuzzy_search(
+    q: str = Query(..., min_length=1),
+    book_id: Optional[int] = None,
+    threshold: float = Query(0.7, ge=0.0, le=1.0),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    return await run_in_threadpool(SearchService(db).fuzzy_search, q, book_id, threshold, limit, cursor)
+
+
+VxAPIPermsUtils.set_perm_get(path=router.prefix + '/phrase', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.get("/phrase")
+async def phrase_search(
+    q: str = Query(..., min_length=1),
+    book_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    return await run_in_threadpool(SearchService(db).phrase_search, q, book_id, limit, cursor)
+
+
+VxAPIPermsUtils.set_perm_get(path=router.prefix + '/positional', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.get("/positional")
+async def positional_search(
+    q: str = Query(..., min_length=1),
+    book_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    return await run_in_threadpool(SearchService(db).positional_search, q, book_id, limit, cursor)
+
+
+VxAPIPermsUtils.set_perm_get(path=router.prefix + '/semantic', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.get("/semantic")
+async def semantic_search(
+    q: str = Query(..., min_length=1),
+    book_id: Optional[int] = None,
+    top_k: int = Query(20, ge=1, le=100),
+    min_similarity: float = Query(0.3, ge=0.0, le=1.0),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    query_embedding = (await EmbeddingModelRegistry.encode_queries_async([q]))[0]
+    return await run_in_threadpool(
+        SearchService(db).semantic_search, q, book_id, top_k, min_similarity, query_embedding, cursor
+    )
+
+
+VxAPIPermsUtils.set_perm_post(path=router.prefix + '/semantic/batch', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.post("/semantic/batch")
+async def semantic_batch_search(request: SemanticBatchSearchRequest, db: Session = Depends(get_db)):
+    """Semantic search for many queries in one request; returns the first page of matches of each
+
+    Cached query embeddings are reused and the rest are encoded in one batch.
+    """
+    query_embeddings = await EmbeddingModelRegistry.encode_queries_async(request.queries)
+    return await run_in_threadpool(
+        SearchService(db).semantic_batch_search, request.queries, request.book_id, request.top_k,
+        request.min_similarity, query_embeddings
+    )
+
+
+VxAPIPermsUtils.set_perm_get(path=router.prefix + '/unified', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.get("/unified")
+async def unified_search(
+    q: str = Query(..., min_length=1),
+    book_id: Optional[int] = None,
+    modes: Optional[List[str]] = Query(None, description=f"Any of {', '.join(SEARCH_MODES)}"),
+    limit: int = Query(20, ge=1, le=100),
+    threshold: float = Query(0.7, ge=0.0, le=1.0),
+    min_similarity: float = Query(0.3, ge=0.0, le=1.0)
+):
+    """Run several search modes concurrently and return one fused, page-deduplicated ranking"""
+    modes = modes or list(DEFAULT_MODES)
+    unknown = set(modes) - set(SEARCH_MODES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search modes: {', '.join(sorted(unknown))}")
+    return await UnifiedSearchService.search(q, book_id, modes, limit, threshold, min_similarity)
+
+
+def _stream_records(mode: str, q: str, book_id: Optional[int], max_results: int, threshold: float,
+                    min_similarity: float, query_embedding) -> Iterator[Dict]:
+    """Match records as they are scored, then one summary record"""
+    start_time = time.perf_counter()
+    first_result_ms = None
+    matches_per_book = {}
+    count = 0
+    # The request session is closed before a streaming body is sent, so use a private one
+    db = SessionLocal()
+    try:
+        for match in SearchService(db).stream_matches(mode, q, book_id, max_results, threshold,
+                                                      min_similarity, query_embedding):
+            if first_result_ms is None:
+                first_result_ms = round((time.perf_counter() - start_time) * 1000, 1)
+            matches_per_book[match['book_id']] = matches_per_book.get(match['book_id'], 0) + 1
+            count += 1
+            yield {'type': 'match', **match}
+        error = None
+    except Exception as e:
+        logger.exception(f"Streaming {mode} search failed for query {q!r}")
+        error = str(e)
+    finally:
+        db.close()
+
+    yield {
+        'type': 'summary',
+        'mode': mode,
+        'count': count,
+        'truncated': count >= max_results,
+        'books': [{'book_id': book_id, 'matches': n} for book_id, n in matches_per_book.items()],
+        'first_result_ms': first_result_ms,
+        'elapsed_ms': round((time.perf_counter() - start_time) * 1000, 1),
+        'error': error
+    }
+
+
+def _ndjson(records: Iterator[Dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+
+def _server_sent_events(records: Iterator[Dict]) -> Iterator[str]:
+    for record in records:
+        yield f"event: {record['type']}\ndata: {json.dumps(record, ensure_ascii=False, default=str)}\n\n"
+
+
+VxAPIPermsUtils.set_perm_get(path=router.prefix + '/stream', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.get("/stream")
+async def stream_search(
+    q: str = Query(..., min_length=1),
+    mode: str = Query("exact", description=f"One of {', '.join(SEARCH_MODES)}"),
+    book_id: Optional[int] = None,
+    max_results: int = Query(500, ge=1, le=5000),
+    threshold: float = Query(0.7, ge=0.0, le=1.0),
+    min_similarity: float = Query(0.3, ge=0.0, le=1.0),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$")
+):
+    """Stream matches of one mode in rank order as NDJSON lines or server-sent events
+
+    Every match is flushed as soon as its batch is scored; the last record
+    has type "summary" with per-book counts and timings.
+    """
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown search mode: {mode}")
+
+    query_embedding = None
+    if mode == 'semantic':
+        query_embedding = (await EmbeddingModelRegistry.encode_queries_async([q]))[0]
+
+    records = _stream_records(mode, q, book_id, max_results, threshold, min_similarity, query_embedding)
+    if format == "sse":
+        return StreamingResponse(_server_sent_events(records), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return StreamingResponse(_ndjson(records), media_type="application/x-ndjson",
+                             headers={"X-Accel-Buffering": "no"})
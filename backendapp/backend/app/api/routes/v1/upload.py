@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Form, Query
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Form, Query, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 import os
 import shutil
 
 from app.config import get_db
-from app.services.ocr_service import MarathiOCRService
+from app.services.book_ingest_service import BookIngestService
+from app.services.ocr_job_service import DuplicateBookError, OCRJobService
+from app.services.search_cache import invalidate_book
+from app.services.search_service import SearchService
 from app.models.enums.vx_api_perms_enum import VxAPIPermsEnum
 from app.services.document_service import DocumentTypeService
 from app.utils.vx_api_perms_utils import VxAPIPermsUtils
@@ -16,8 +20,6 @@ router = APIRouter(
     responses={404: {"description": "Not Found"}}
 )
 
-ocr_service = MarathiOCRService()
-
 # FIXED: Enhanced getdocumenttype endpoint
 VxAPIPermsUtils.set_perm_get(path=router.prefix + '/getdocumenttype', perm=VxAPIPermsEnum.PUBLIC)
 @router.get("/getdocumenttype")
@@ -46,74 +48,68 @@ async def get_all_document_types(
         raise HTTPException(status_code=500, detail=f"Error retrieving document types: {str(e)}")
 
 # Keep existing endpoints...
-@router.post("/upload-book/")
+@router.post("/upload-book/", status_code=status.HTTP_202_ACCEPTED)
 async def upload_book(
     file: UploadFile = File(...),
     title: str = Form(...),
-    author: str = Form(...),
-    db: Session = Depends(get_db)
+    author: str = Form(...)
 ):
-    """Upload and process PDF book"""
+    """Upload a PDF book and queue it for OCR. Poll /jobs/{job_id} for progress."""
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
+    # Claim the filename before writing, so a concurrent upload of the same name can't overwrite this file
+    try:
+        await run_in_threadpool(OCRJobService.reserve_filename, file.filename)
+    except DuplicateBookError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
     # Save uploaded file
     file_path = f"uploads/{file.filename}"
     os.makedirs("uploads", exist_ok=True)
     
+    try:
+        await run_in_threadpool(_save_upload, file, file_path)
+        job = OCRJobService.submit(title=title, author=author, filename=file.filename, file_path=file_path)
+    except BaseException:
+        # No stored book or job uses this path while the name is reserved
+        OCRJobService.release_filename(file.filename)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return {"message": "Book queued for processing", "job_id": job.job_id, "status": job.status.value}
+
+
+def _save_upload(file: UploadFile, file_path: str):
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
-    
-    try:
-        # Extract text using OCR
-        extracted_data = ocr_service.extract_text_from_pdf(file_path)
-        
-        # Save to database
-        from app.models.books import Book, Page, Word
-        
-        book = Book(
-            title=title,
-            author=author,
-            filename=file.filename,
-            total_pages=len(extracted_data)
-        )
-        db.add(book)
-        db.commit()
-        db.refresh(book)
-        
-        # Save pages and words
-        for page_data in extracted_data:
-            page = Page(
-                book_id=book.id,
-                page_number=page_data['page_number'],
-                content=page_data['text'],
-                confidence_score=page_data['confidence']
-            )
-            db.add(page)
-            db.commit()
-            db.refresh(page)
-            
-            # Save word positions
-            boxes = page_data['boxes']
-            for i, word in enumerate(boxes['text']):
-                if word.strip() and int(boxes['conf'][i]) > 30:
-                    word_obj = Word(
-                        page_id=page.id,
-                        word=word,
-                        x_position=boxes['left'][i],
-                        y_position=boxes['top'][i],
-                        width=boxes['width'][i],
-                        height=boxes['height'][i],
-                        confidence=float(boxes['conf'][i])
-                    )
-                    db.add(word_obj)
-            
-            db.commit()
-        
-        return {"message": "Book uploaded and processed successfully", "book_id": book.id}
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+
+
+VxAPIPermsUtils.set_perm_get(path=router.prefix + '/jobs', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.get("/jobs")
+async def list_ocr_jobs():
+    """List book OCR jobs known to this worker"""
+    return [job.to_dict() for job in OCRJobService.list()]
+
+
+VxAPIPermsUtils.set_perm_get(path=router.prefix + '/jobs/{job_id}', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.get("/jobs/{job_id}")
+async def get_ocr_job(job_id: str):
+    """Status and page progress of a book OCR job"""
+    job = OCRJobService.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+VxAPIPermsUtils.set_perm_delete(path=router.prefix + '/jobs/{job_id}', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.delete("/jobs/{job_id}")
+async def cancel_ocr_job(job_id: str):
+    """Cancel a queued or running book OCR job"""
+    job = OCRJobService.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 
 @router.get("/books")
@@ -131,3 +127,19 @@ async def get_books(db: Session = Depends(get_db)):
         }
         for book in books
     ]
+
+
+VxAPIPermsUtils.set_perm_delete(path=router.prefix + '/books/{book_id}', perm=VxAPIPermsEnum.AUTHENTICATED)
+@router.delete("/books/{book_id}")
+def delete_book(book_id: int, db: Session = Depends(get_db)):
+    """Delete a book with its pages and words, and drop it from the search index"""
+    from app.models.books import Book
+    if not db.query(Book.id).filter(Book.id == book_id).first():
+        raise HTTPException(status_code=404, detail="Book not found")
+    
+    BookIngestService.delete_book(db, book_id)
+    db.commit()
+    SearchService.remove_book_from_index(book_id)
+    invalidate_book(book_id)
+    
+    return {"message": "Book deleted successfully", "book_id": book_id}
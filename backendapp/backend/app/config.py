@@ -44,6 +44,84 @@ class Settings(BaseSettings):
     aws_secret_access_key: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
     aws_default_region: str = os.getenv("AWS_DEFAULT_REGION", "ap-south-1")
 
+    # Search / semantic index settings
+    embedding_model_name: str = os.getenv(
+        "EMBEDDING_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    )
+    embedding_warmup: bool = os.getenv("EMBEDDING_WARMUP", "False").lower() == "true"
+    embedding_max_workers: int = int(os.getenv("EMBEDDING_MAX_WORKERS", "2"))
+    # torch | onnx, see app/services/embedding_model.py
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    embedding_onnx_dir: str = os.getenv("EMBEDDING_ONNX_DIR", "models/paraphrase-multilingual-MiniLM-L12-v2-onnx-int8")
+    # Threads per inference (0 = runtime default, all cores)
+    embedding_intra_op_threads: int = int(os.getenv("EMBEDDING_INTRA_OP_THREADS", "0"))
+    # LRU of query text -> embedding, bounded by the size of the vectors (~1.5 KB each)
+    embedding_query_cache_mb: float = float(os.getenv("EMBEDDING_QUERY_CACHE_MB", "16"))
+    # Semantic index chunks: tokens per chunk (0 = the model's max sequence length) / tokens shared by neighbours
+    embedding_chunk_tokens: int = int(os.getenv("EMBEDDING_CHUNK_TOKENS", "0"))
+    embedding_chunk_overlap_tokens: int = int(os.getenv("EMBEDDING_CHUNK_OVERLAP_TOKENS", "32"))
+    # Ingest-time batching: padded tokens per batch / texts per batch
+    embedding_batch_tokens: int = int(os.getenv("EMBEDDING_BATCH_TOKENS", "8192"))
+    embedding_max_batch_size: int = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "128"))
+    vector_index_dir: str = os.getenv("VECTOR_INDEX_DIR", "search_index/vectors")
+    vector_index_nlist: int = int(os.getenv("VECTOR_INDEX_NLIST", "64"))
+    vector_index_nprobe: int = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+    # float32 | float16 | int8 | pq, see app/services/vector_index.py
+    vector_index_storage: str = os.getenv("VECTOR_INDEX_STORAGE", "float32")
+    vector_index_pq_m: int = int(os.getenv("VECTOR_INDEX_PQ_M", "48"))
+    vector_index_rescore_factor: int = int(os.getenv("VECTOR_INDEX_RESCORE_FACTOR", "10"))
+    # Fuzzy search: trigram candidates scored per query term / vocabulary terms kept per query term
+    fuzzy_max_candidates: int = int(os.getenv("FUZZY_MAX_CANDIDATES", "1000"))
+    fuzzy_max_expansions: int = int(os.getenv("FUZZY_MAX_EXPANSIONS", "50"))
+    # Search result cache: in-process LRU, shared through Redis when REDIS_URL is set
+    search_cache_enabled: bool = os.getenv("SEARCH_CACHE_ENABLED", "True").lower() == "true"
+    search_cache_max_entries: int = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+    search_cache_ttl_seconds: int = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "600"))
+    # Full ranked lists of text queries, reused by their later result pages; kept in-process only
+    search_ranking_cache_max_entries: int = int(os.getenv("SEARCH_RANKING_CACHE_MAX_ENTRIES", "256"))
+    redis_url: str = os.getenv("REDIS_URL", "")
+    # Unified search: per-mode time budgets and matches per mode fed into rank fusion
+    search_mode_budget_ms: int = int(os.getenv("SEARCH_MODE_BUDGET_MS", "2000"))
+    search_semantic_budget_ms: int = int(os.getenv("SEARCH_SEMANTIC_BUDGET_MS", "4000"))
+    search_fusion_depth: int = int(os.getenv("SEARCH_FUSION_DEPTH", "50"))
+
+    # Book ingestion
+    ingest_page_batch_size: int = int(os.getenv("INGEST_PAGE_BATCH_SIZE", "50"))
+    ingest_commit_per_batch: bool = os.getenv("INGEST_COMMIT_PER_BATCH", "False").lower() == "true"
+    # "rows": one Word row per OCR token, "packed": binary word boxes on the Page
+    word_storage_mode: str = os.getenv("WORD_STORAGE_MODE", "rows")
+
+    # OCR engine
+    # subprocess | api (in-process libtesseract, needs tesserocr), see app/services/tesseract_engine.py
+    ocr_engine: str = os.getenv("OCR_ENGINE", "subprocess")
+    ocr_dpi: int = int(os.getenv("OCR_DPI", "300"))
+    # Two-pass OCR: books are first OCR'd at this DPI to become searchable quickly, then pages below
+    # OCR_REFINE_CONFIDENCE are OCR'd again at OCR_DPI in the background. 0 = one pass at OCR_DPI
+    ocr_first_pass_dpi: int = int(os.getenv("OCR_FIRST_PASS_DPI", "200"))
+    ocr_refine_confidence: float = float(os.getenv("OCR_REFINE_CONFIDENCE", "75"))
+    # Page image steps before Tesseract, any of: contrast, border, deskew, binarize, denoise
+    # (always run in that order), see app/services/image_preprocessing.py
+    ocr_preprocess_steps: str = os.getenv("OCR_PREPROCESS_STEPS", "contrast")
+    ocr_deskew_max_angle: float = float(os.getenv("OCR_DESKEW_MAX_ANGLE", "5"))
+    ocr_workers: int = int(os.getenv("OCR_WORKERS", "0"))  # 0 = one per CPU core
+    ocr_window_size: int = int(os.getenv("OCR_WINDOW_SIZE", "0"))  # 0 = 2 pages per worker
+    
+    # Born-digital PDFs: pages with a usable embedded text layer are not OCR'd
+    ocr_text_layer_enabled: bool = os.getenv("OCR_TEXT_LAYER_ENABLED", "True").lower() == "true"
+    ocr_text_layer_min_chars: int = int(os.getenv("OCR_TEXT_LAYER_MIN_CHARS", "40"))
+    ocr_text_layer_min_valid_ratio: float = float(os.getenv("OCR_TEXT_LAYER_MIN_VALID_RATIO", "0.95"))
+    ocr_text_layer_min_word_ratio: float = float(os.getenv("OCR_TEXT_LAYER_MIN_WORD_RATIO", "0.8"))
+
+    # OCR result cache
+    ocr_cache_enabled: bool = os.getenv("OCR_CACHE_ENABLED", "True").lower() == "true"
+    ocr_cache_dir: str = os.getenv("OCR_CACHE_DIR", "search_index/ocr_cache")
+    ocr_cache_max_mb: int = int(os.getenv("OCR_CACHE_MAX_MB", "2048"))
+
+    # Background OCR jobs
+    ocr_job_workers: int = int(os.getenv("OCR_JOB_WORKERS", "2"))
+    ocr_job_max_attempts: int = int(os.getenv("OCR_JOB_MAX_ATTEMPTS", "3"))
+    ocr_job_retention_hours: int = int(os.getenv("OCR_JOB_RETENTION_HOURS", "24"))
+
     # Application Environment
     environment: str = os.getenv("ENVIRONMENT", "development")
     debug: bool = os.getenv("DEBUG", "True").lower() == "true"
@@ -21,7 +21,7 @@ from app.core.core_exceptions import UnauthorizedException, InvalidRequestExcept
 # Import routers
 from app.api.routes.v1 import auth, blocks, districts, gram_sevaks
 from app.api.routes.v1 import  preset, profile, document_status, government_docs
-from app.api.routes.v1 import upload,document_validation,enhanced_profile,health
+from app.api.routes.v1 import upload,document_validation,enhanced_profile,health,search
 # Try to import additional routers with error handling
 import importlib
 
@@ -151,6 +151,7 @@ def create_app() -> FastAPI:
     app.include_router(document_status.router)
     app.include_router(government_docs.router)
     app.include_router(upload.router)
+    app.include_router(search.router)
     app.include_router(document_validation.router)
     app.include_router(enhanced_profile.router)
     app.include_router(health.router)  # ADD THIS LINE
@@ -12,7 +12,7 @@ from app.models.users_hierarchy import District, Block, GramPanchayat
 from app.models.gr_yojana import GR, Yojana
 
 # Import books models
-from app.models.books import Book, Page, Word
+from app.models.books import Book, Page, Word, PagePosting
 
 # Import users model first (since other models reference it)
 from app.models.users import User
@@ -35,6 +35,7 @@ __all__ = [
     "Book",
     "Page",
     "Word",
+    "PagePosting",
     "User",
     "DocumentType",
     "UserDocument", 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Index, Boolean, DateTime, Text, Float, func
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, Boolean, DateTime, Text, Float, JSON, LargeBinary, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
@@ -14,8 +14,8 @@ class Book(Base, TimestampMixin):
     
     # Use consistent Mapped style throughout
     id: Mapped[int] = mapped_column(primary_key=True, index=True, autoincrement=True)
-    title: Mapped[str] = mapped_column(String(255), index=True, nullable=False)
-    department_id: Mapped[Optional[int]] = mapped_column(ForeignKey('departments.id'), index=True)
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    department_id: Mapped[Optional[int]] = mapped_column(ForeignKey('departments.id'))
     file_path: Mapped[str] = mapped_column(String(500))
     is_processed: Mapped[bool] = mapped_column(Boolean, default=False)
     created_by: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey('users.id'))
@@ -68,9 +68,20 @@ class Page(Base):
     language_detected: Mapped[Optional[str]] = mapped_column(String(10))  # 'mar', 'eng', 'mixed'
     processing_time: Mapped[Optional[float]] = mapped_column(Float)
     
+    # Start offset of every line in content, filled by the text index
+    line_offsets: Mapped[Optional[list]] = mapped_column(JSON)
+    
+    # Blocks, lines and words of the OCR layout with offsets into content, see app/services/page_layout.py
+    layout: Mapped[Optional[dict]] = mapped_column(JSON)
+    
+    # Packed word boxes (WORD_STORAGE_MODE=packed), see app/services/word_box_codec.py
+    word_boxes: Mapped[Optional[bytes]] = mapped_column(LargeBinary)
+    word_tokens: Mapped[Optional[list]] = mapped_column(JSON)
+    
     # Relationships
     book = relationship("Book", back_populates="pages")
     words = relationship("Word", back_populates="page", cascade="all, delete-orphan")
+    postings = relationship("PagePosting", back_populates="page", cascade="all, delete-orphan")
     
     # Table arguments for better performance
     __table_args__ = (
@@ -85,7 +96,7 @@ class Word(Base):
     # Use consistent Mapped style
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     page_id: Mapped[int] = mapped_column(Integer, ForeignKey("pages.id"), nullable=False)
-    word: Mapped[str] = mapped_column(String(100), index=True, nullable=False)
+    word: Mapped[str] = mapped_column(String(100), nullable=False)
     x_position: Mapped[Optional[int]] = mapped_column(Integer)
     y_position: Mapped[Optional[int]] = mapped_column(Integer)
     width: Mapped[Optional[int]] = mapped_column(Integer)
@@ -105,4 +116,24 @@ class Word(Base):
         Index('ix_words_word', 'word'),
         Index('ix_words_position', 'x_position', 'y_position'),
         Index('ix_words_marathi', 'is_marathi'),
-    )
\ No newline at end of file
+    )
+
+class PagePosting(Base):
+    """Inverted index entry: one row per (term, page) with positional postings"""
+    __tablename__ = "page_postings"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    term: Mapped[str] = mapped_column(String(100), nullable=False)
+    page_id: Mapped[int] = mapped_column(Integer, ForeignKey("pages.id"), nullable=False)
+    book_id: Mapped[int] = mapped_column(Integer, ForeignKey("books.id"), nullable=False)
+    term_frequency: Mapped[int] = mapped_column(Integer, nullable=False)
+    # [[token_position, line_index, char_start, char_end], ...] in token order
+    positions: Mapped[list] = mapped_column(JSON, nullable=False)
+    
+    # Relationships
+    page = relationship("Page", back_populates="postings")
+    
+    __table_args__ = (
+        Index('ix_page_postings_term_book', 'term', 'book_id'),
+        Index('ix_page_postings_page_id', 'page_id'),
+    )
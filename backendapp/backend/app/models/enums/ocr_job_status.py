@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class OCRJobStatus(Enum):
+    """
+        Lifecycle of a background book OCR / ingestion job
+    """
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    COMPLETED = 'COMPLETED'
+    FAILED = 'FAILED'
+    CANCELLED = 'CANCELLED'
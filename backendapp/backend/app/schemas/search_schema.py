@@ -0,0 +1,16 @@
+from typing import List, Optional
+
+from pydantic import Field
+from typing_extensions import Annotated
+
+from app.schemas.base import CamelCaseModel
+
+# Queries per batch search request
+MAX_BATCH_QUERIES = 64
+
+
+class SemanticBatchSearchRequest(CamelCaseModel):
+    queries: List[Annotated[str, Field(min_length=1)]] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+    book_id: Optional[int] = None
+    top_k: int = Field(10, ge=1, le=100)
+    min_similarity: float = Field(0.3, ge=0.0, le=1.0)
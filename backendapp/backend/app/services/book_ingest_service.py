@@ -0,0 +1,228 @@
+# book_ingest_service.py
+import logging
+import time
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.books import Book, Page, PagePosting, Word
+from app.services.search_cache import invalidate_book
+from app.services.text_index_service import TextIndexService
+from app.services.word_box_codec import pack_word_boxes
+
+logger = logging.getLogger(__name__)
+
+# Words below this OCR confidence are not stored
+MIN_WORD_CONFIDENCE = 30
+
+WORD_STORAGE_PACKED = 'packed'
+
+
+class BookIngestService:
+    """
+        Set-based persistence of OCR output.
+
+        Pages, words and postings are written with one executemany INSERT per
+        batch of pages (SQLAlchemy "insertmanyvalues"), page ids come back from
+        INSERT .. RETURNING, and the whole book is one transaction unless
+        INGEST_COMMIT_PER_BATCH is enabled.
+
+        With WORD_STORAGE_MODE=packed the word boxes of a page are stored as one
+        binary blob on the Page instead of one indexed `words` row per token;
+        positional search then finds pages through the postings table.
+    """
+
+    @staticmethod
+    def _word_rows(boxes: Dict) -> List[Dict]:
+        """Word boxes worth storing, shaped like Word rows without page_id"""
+        rows = []
+        for i, word in enumerate(boxes['text']):
+            if word.strip() and int(float(boxes['conf'][i])) > MIN_WORD_CONFIDENCE:
+                rows.append({
+                    'word': word[:100],
+                    'x_position': boxes['left'][i],
+                    'y_position': boxes['top'][i],
+                    'width': boxes['width'][i],
+                    'height': boxes['height'][i],
+                    'confidence': float(boxes['conf'][i])
+                })
+        return rows
+
+    @staticmethod
+    def _page_fields(page_data: Dict, offsets: List[int], word_count: int) -> Dict:
+        """Page columns derived from one page of OCR output"""
+        return {
+            'content': page_data['text'],
+            'confidence_score': page_data['confidence'],
+            'line_offsets': offsets,
+            'layout': page_data.get('layout'),
+            'word_count': word_count,
+            'character_count': len(page_data['text'])
+        }
+
+    @staticmethod
+    def insert_pages(db: Session, book_id: int, pages_data: List[Dict], word_storage: Optional[str] = None) -> List[int]:
+        """Insert one batch of OCR pages with their words and postings, return the page ids in order"""
+        packed = (word_storage or settings.word_storage_mode) == WORD_STORAGE_PACKED
+        analyzed = [TextIndexService.analyze(page_data['text']) for page_data in pages_data]
+        words_by_page = [BookIngestService._word_rows(page_data['boxes']) for page_data in pages_data]
+
+        page_rows = []
+        for page_data, words, (offsets, word_count, _) in zip(pages_data, words_by_page, analyzed):
+            row = {
+                'book_id': book_id,
+                'page_number': page_data['page_number'],
+                **BookIngestService._page_fields(page_data, offsets, word_count)
+            }
+            if packed:
+                row['word_boxes'], row['word_tokens'] = pack_word_boxes(words)
+            page_rows.append(row)
+
+        page_ids = list(db.scalars(
+            insert(Page).returning(Page.id, sort_by_parameter_order=True),
+            page_rows
+        ))
+
+        word_rows = []
+        posting_rows = []
+        for page_id, words, (_, _, positions_by_term) in zip(page_ids, words_by_page, analyzed):
+            if not packed:
+                word_rows.extend(dict(word, page_id=page_id) for word in words)
+            posting_rows.extend(TextIndexService.posting_rows(page_id, book_id, positions_by_term))
+
+        if word_rows:
+            db.execute(insert(Word), word_rows)
+        if posting_rows:
+            db.execute(insert(PagePosting), posting_rows)
+
+        return page_ids
+
+    @staticmethod
+    def update_pages(db: Session, book_id: int, pages_data: List[Dict]) -> List[int]:
+        """
+            Replace pages of a book in place with new OCR output (e.g. a higher DPI pass),
+            keeping their ids. Content, layout, words and postings are rewritten; a page is
+            only replaced when the new OCR confidence is higher. Words keep the storage
+            (rows or packed) the page already uses. Returns the ids of the replaced pages;
+            the caller commits.
+        """
+        by_number = {page_data['page_number']: page_data for page_data in pages_data}
+        pages = db.query(Page).filter(Page.book_id == book_id, Page.page_number.in_(by_number)).all()
+
+        replaced = []
+        word_rows = []
+        posting_rows = []
+        for page in pages:
+            page_data = by_number[page.page_number]
+            if page_data['confidence'] <= (page.confidence_score or 0):
+                continue
+            offsets, word_count, positions_by_term = TextIndexService.analyze(page_data['text'])
+            for key, value in BookIngestService._page_fields(page_data, offsets, word_count).items():
+                setattr(page, key, value)
+
+            words = BookIngestService._word_rows(page_data['boxes'])
+            if page.word_boxes is not None:
+                page.word_boxes, page.word_tokens = pack_word_boxes(words)
+            else:
+                word_rows.extend(dict(word, page_id=page.id) for word in words)
+            posting_rows.extend(TextIndexService.posting_rows(page.id, book_id, positions_by_term))
+            replaced.append(page.id)
+
+        if replaced:
+            db.execute(delete(Word).where(Word.page_id.in_(replaced)))
+            db.execute(delete(PagePosting).where(PagePosting.page_id.in_(replaced)))
+            # Other worker processes re-read the book's fuzzy vocabulary when this changes
+            db.execute(update(Book).where(Book.id == book_id).values(updated_at=func.now()))
+        if word_rows:
+            db.execute(insert(Word), word_rows)
+        if posting_rows:
+            db.execute(insert(PagePosting), posting_rows)
+        return replaced
+
+    @staticmethod
+    def delete_book(db: Session, book_id: int) -> None:
+        """
+            Delete a book with its pages, words and postings in four set-based
+            DELETEs, children first, without loading any of them into the session.
+            The caller commits.
+        """
+        book_pages = select(Page.id).where(Page.book_id == book_id)
+        for statement in (
+                delete(Word).where(Word.page_id.in_(book_pages)),
+                delete(PagePosting).where(PagePosting.book_id == book_id),
+                delete(Page).where(Page.book_id == book_id),
+                delete(Book).where(Book.id == book_id)
+        ):
+            db.execute(statement, execution_options={'synchronize_session': False})
+
+    @staticmethod
+    def ingest_book(
+            db: Session,
+            title: str,
+            author: Optional[str],
+            filename: str,
+            file_path: str,
+            extracted_data: Iterable[Dict],
+            batch_size: Optional[int] = None,
+            word_storage: Optional[str] = None
+    ) -> Tuple[Book, List[int]]:
+        """Persist a whole OCR'd book. Returns the book and its page ids in page order.
+
+        `extracted_data` may be a generator (e.g. MarathiOCRService.iter_pages);
+        pages are written as soon as a batch is complete. If it raises (an OCR
+        error, a cancelled job), nothing of the book is left in the database,
+        also with INGEST_COMMIT_PER_BATCH.
+        """
+        batch_size = batch_size or settings.ingest_page_batch_size
+        start_time = time.perf_counter()
+
+        book_id = None
+        committed = False
+        try:
+            book = Book(
+                title=title,
+                author=author,
+                filename=filename,
+                file_path=file_path,
+                total_pages=0,
+                is_processed=False
+            )
+            db.add(book)
+            db.flush()
+            book_id = book.id
+
+            page_ids = []
+            pages = iter(extracted_data)
+            while True:
+                batch = list(islice(pages, batch_size))
+                if not batch:
+                    break
+                page_ids.extend(BookIngestService.insert_pages(db, book_id, batch, word_storage))
+                if settings.ingest_commit_per_batch:
+                    db.commit()
+                    committed = True
+
+            book.total_pages = len(page_ids)
+            book.is_processed = True
+            db.commit()
+        except Exception:
+            db.rollback()
+            if committed:
+                # Earlier batches are already committed; don't leave a half-filled book behind
+                try:
+                    BookIngestService.delete_book(db, book_id)
+                    db.commit()
+                    # Searches run during the ingest may have cached its pages
+                    invalidate_book(book_id)
+                except Exception:
+                    logger.exception(f"Could not delete partially ingested book {book_id}")
+                    db.rollback()
+            raise
+
+        logger.info(
+            f"Ingested book {book_id}: {len(page_ids)} pages in {time.perf_counter() - start_time:.2f}s"
+        )
+        return book, page_ids
@@ -0,0 +1,317 @@
+# embedding_model.py
+import asyncio
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import psutil
+
+from app.config import settings
+from app.services.text_chunker import whitespace_token_offsets
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a query for embedding: NFC, whitespace collapsed"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+class QueryEmbeddingCache:
+    """
+        LRU of normalized query text -> embedding, bounded by the bytes of the
+        vectors it holds. Cached vectors are shared and must not be mutated.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(query)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(query)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, vector: np.ndarray):
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            previous = self._entries.pop(query, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[query] = vector
+            self._bytes += vector.nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def get_metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "entries": len(self._entries),
+            "size_mb": round(self._bytes / (1024 * 1024), 2),
+            "max_size_mb": round(self.max_bytes / (1024 * 1024), 2),
+        }
+
+
+class EmbeddingModelRegistry:
+    """
+        Process-wide holder of the sentence embedding model.
+
+        The model is loaded once per process, either lazily on the first encode
+        or eagerly through `warm_up()` from the startup event. Inference from
+        async code goes through a small bounded thread pool so the event loop
+        is never blocked by the model.
+
+        EMBEDDING_BACKEND picks the runtime: "torch" runs SentenceTransformer
+        on PyTorch, "onnx" runs the export in EMBEDDING_ONNX_DIR (see
+        scripts/export_embedding_onnx.py) on ONNX Runtime, which starts faster,
+        uses less memory and encodes queries faster on CPU.
+    """
+
+    BACKENDS = ("torch", "onnx")
+
+    _model = None
+    _lock = threading.Lock()
+    _executor: Optional[ThreadPoolExecutor] = None
+    _query_cache = QueryEmbeddingCache(int(settings.embedding_query_cache_mb * 1024 * 1024))
+
+    _metrics: Dict[str, Any] = {
+        "loaded": False,
+        "load_time_seconds": None,
+        "load_rss_delta_mb": None,
+        "encode_calls": 0,
+        "encoded_texts": 0,
+        "encode_time_seconds": 0.0,
+    }
+
+    @classmethod
+    def get_model(cls):
+        if cls._model is None:
+            with cls._lock:
+                if cls._model is None:
+                    cls._model = cls._load_model()
+        return cls._model
+
+    @staticmethod
+    def _create_model():
+        backend = settings.embedding_backend
+        threads = settings.embedding_intra_op_threads
+        if backend == "onnx":
+            from app.services.onnx_embedding import OnnxSentenceEncoder
+
+            model = OnnxSentenceEncoder(settings.embedding_onnx_dir, intra_op_threads=threads)
+            if model.model_name != settings.embedding_model_name:
+                logger.warning(
+                    f"ONNX export in {settings.embedding_onnx_dir} is of {model.model_name}, "
+                    f"not {settings.embedding_model_name}; stored embeddings may not match"
+                )
+            return model
+
+        if backend != "torch":
+            raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EmbeddingModelRegistry.BACKENDS}")
+
+        from sentence_transformers import SentenceTransformer
+
+        if threads > 0:
+            import torch
+
+            torch.set_num_threads(threads)
+        return SentenceTransformer(settings.embedding_model_name)
+
+    @classmethod
+    def _load_model(cls):
+        process = psutil.Process()
+        rss_before = process.memory_info().rss
+        start_time = time.perf_counter()
+
+        model = cls._create_model()
+
+        load_time = time.perf_counter() - start_time
+        cls._metrics.update({
+            "loaded": True,
+            "load_time_seconds": round(load_time, 3),
+            "load_rss_delta_mb": round((process.memory_info().rss - rss_before) / (1024 * 1024), 1),
+        })
+        logger.info(
+            f"Loaded embedding model {settings.embedding_model_name} ({settings.embedding_backend}) in {load_time:.2f}s"
+        )
+        return model
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(
+                        max_workers=settings.embedding_max_workers,
+                        thread_name_prefix="embedding"
+                    )
+        return cls._executor
+
+    @classmethod
+    def encode(cls, texts: List[str], **kwargs) -> np.ndarray:
+        """Blocking encode. Use from worker threads or background jobs."""
+        model = cls.get_model()
+        start_time = time.perf_counter()
+        embeddings = model.encode(texts, **kwargs)
+
+        cls._metrics["encode_calls"] += 1
+        cls._metrics["encoded_texts"] += len(texts)
+        cls._metrics["encode_time_seconds"] += time.perf_counter() - start_time
+        return embeddings
+
+    @classmethod
+    def token_lengths(cls, texts: List[str]) -> List[int]:
+        """Model token count of every text (characters when the model has no tokenizer)"""
+        tokenizer = getattr(cls.get_model(), "tokenizer", None)
+        if tokenizer is None:
+            return [len(text) for text in texts]
+        return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+    @classmethod
+    def token_offsets(cls, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        """Character (start, end) of every model token of every text (whitespace words without a tokenizer)"""
+        tokenizer = getattr(cls.get_model(), "tokenizer", None)
+        if tokenizer is None:
+            return [whitespace_token_offsets(text) for text in texts]
+        return [
+            [tuple(offset) for offset in offsets]
+            for offsets in tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        ]
+
+    @classmethod
+    def max_seq_length(cls) -> int:
+        return getattr(cls.get_model(), "max_seq_length", None) or 512
+
+    @classmethod
+    def chunk_token_budget(cls) -> int:
+        """Text tokens per chunk: EMBEDDING_CHUNK_TOKENS, at most what the model reads"""
+        # Leave room for the start and end tokens the model adds
+        budget = cls.max_seq_length() - 2
+        if settings.embedding_chunk_tokens > 0:
+            budget = min(budget, settings.embedding_chunk_tokens)
+        return budget
+
+    @classmethod
+    def encode_batched(cls, texts: List[str]) -> np.ndarray:
+        """Encode many texts for indexing with as little padding as possible
+
+        Texts are sorted by token length and cut into batches holding at most
+        EMBEDDING_BATCH_TOKENS padded tokens (and EMBEDDING_MAX_BATCH_SIZE texts),
+        so short chunks go in large batches and a long chunk never pads a batch
+        of short ones. Embeddings are returned in input order.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        max_length = cls.max_seq_length()
+        lengths = [min(length, max_length) + 2 for length in cls.token_lengths(texts)]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+
+        batches = []
+        batch = []
+        for i in order:
+            # Sorted ascending, so the current text sets the padded length of the batch
+            if batch and (
+                    (len(batch) + 1) * lengths[i] > settings.embedding_batch_tokens
+                    or len(batch) >= settings.embedding_max_batch_size
+            ):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        batches.append(batch)
+
+        embeddings = None
+        for batch in batches:
+            encoded = cls.encode([texts[i] for i in batch], batch_size=len(batch))
+            if embeddings is None:
+                embeddings = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            embeddings[batch] = encoded
+        return embeddings
+
+    @classmethod
+    async def encode_async(cls, texts: List[str], **kwargs) -> np.ndarray:
+        """Encode on the bounded model executor without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls._get_executor(), lambda: cls.encode(texts, **kwargs))
+
+    @classmethod
+    def _cached_queries(cls, queries: List[str]) -> Dict[str, Optional[np.ndarray]]:
+        """Normalized query -> cached embedding, or None for a cache miss"""
+        vectors = {}
+        for query in queries:
+            if query not in vectors:
+                vectors[query] = cls._query_cache.get(query)
+        return vectors
+
+    @classmethod
+    def _encode_missing(cls, vectors: Dict[str, Optional[np.ndarray]]):
+        missing = [query for query, vector in vectors.items() if vector is None]
+        if missing:
+            for query, vector in zip(missing, cls.encode(missing, batch_size=len(missing))):
+                cls._query_cache.put(query, vector)
+                vectors[query] = vector
+
+    @classmethod
+    def encode_queries(cls, queries: List[str]) -> np.ndarray:
+        """Embeddings of search queries, one row per query, through the query cache
+
+        Queries are normalized first, so spacing and Unicode composition variants
+        share one entry. All cache misses are encoded together in one batch.
+        """
+        normalized = [normalize_query(query) for query in queries]
+        vectors = cls._cached_queries(normalized)
+        cls._encode_missing(vectors)
+        return np.stack([vectors[query] for query in normalized])
+
+    @classmethod
+    async def encode_queries_async(cls, queries: List[str]) -> np.ndarray:
+        """`encode_queries` with the misses encoded on the model executor"""
+        normalized = [normalize_query(query) for query in queries]
+        vectors = cls._cached_queries(normalized)
+        if any(vector is None for vector in vectors.values()):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(cls._get_executor(), cls._encode_missing, vectors)
+        return np.stack([vectors[query] for query in normalized])
+
+    @classmethod
+    async def warm_up(cls):
+        """Load the model and run one tiny inference so the first request is not slow"""
+        await cls.encode_async(["warm up"])
+
+    @classmethod
+    def shutdown(cls):
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False)
+            cls._executor = None
+
+    @classmethod
+    def get_metrics(cls) -> Dict[str, Any]:
+        return {
+            **cls._metrics,
+            "model_name": settings.embedding_model_name,
+            "backend": settings.embedding_backend,
+            "intra_op_threads": settings.embedding_intra_op_threads or None,
+            "encode_time_seconds": round(cls._metrics["encode_time_seconds"], 3),
+            "executor_max_workers": settings.embedding_max_workers,
+            "query_cache": cls._query_cache.get_metrics(),
+            "process_rss_mb": round(psutil.Process().memory_info().rss / (1024 * 1024), 1),
+        }
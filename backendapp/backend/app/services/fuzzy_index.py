@@ -0,0 +1,128 @@
+# fuzzy_index.py
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.books import Book, PagePosting
+
+logger = logging.getLogger(__name__)
+
+
+def _trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyTermIndex:
+    """
+        In-memory trigram index over the distinct terms of `page_postings`.
+
+        A fuzzy query term is expanded to the vocabulary terms sharing the most
+        trigrams with it; only those candidates are scored with SequenceMatcher,
+        so the cost depends on the vocabulary size, not on the number of pages.
+        The expansions are then resolved to pages through the postings.
+
+        Terms are loaded per book. A refresh reads the terms of every book that
+        is new or whose `updated_at` changed since the last refresh (other
+        worker processes see ingests and re-OCRs this way), plus the books
+        passed to invalidate_book in this process. Terms of deleted books stay
+        in the vocabulary until the next restart; they simply resolve to no postings.
+    """
+
+    def __init__(self, max_candidates: int):
+        self.max_candidates = max_candidates
+        self._terms: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+        self._by_trigram: Dict[str, List[int]] = defaultdict(list)
+        # book_id -> Book.updated_at when its terms were read
+        self._book_stamps: Dict[int, Optional[datetime]] = {}
+        self._stale_books: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def invalidate_book(self, book_id: int):
+        """Read the terms of `book_id` again on the next refresh"""
+        with self._lock:
+            self._stale_books.add(book_id)
+
+    def refresh(self, db: Session):
+        """Add the terms of books ingested, re-OCR'd or invalidated since the last refresh"""
+        stamps = dict(db.query(Book.id, Book.updated_at).all())
+        with self._lock:
+            changed = {
+                book_id for book_id, stamp in stamps.items()
+                if book_id in self._stale_books or book_id not in self._book_stamps
+                or self._book_stamps[book_id] != stamp
+            }
+            self._stale_books.clear()
+            if not changed:
+                return
+
+            start_time = time.perf_counter()
+            terms_query = db.query(PagePosting.term)
+            if len(changed) < len(stamps):
+                terms_query = terms_query.filter(PagePosting.book_id.in_(changed))
+
+            added = 0
+            for (term,) in terms_query.distinct().all():
+                if term in self._term_ids:
+                    continue
+                term_id = self._term_ids[term] = len(self._terms)
+                self._terms.append(term)
+                for trigram in _trigrams(term):
+                    self._by_trigram[trigram].append(term_id)
+                added += 1
+
+            self._book_stamps.update((book_id, stamps[book_id]) for book_id in changed)
+            if added:
+                logger.info(
+                    f"Fuzzy index: +{added} terms from {len(changed)} books ({len(self._terms)} total) "
+                    f"in {time.perf_counter() - start_time:.2f}s"
+                )
+
+    def expand(self, term: str, threshold: float, max_expansions: int) -> List[Tuple[str, float]]:
+        """Vocabulary terms with SequenceMatcher ratio >= threshold, best first"""
+        query_trigrams = _trigrams(term)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._by_trigram.get(trigram, ()))
+
+        expansions = []
+        matcher = SequenceMatcher(None, b=term)
+        for term_id, _ in shared.most_common(self.max_candidates):
+            candidate = self._terms[term_id]
+            # ratio() is bounded by 2 * min(len) / (len(a) + len(b))
+            if 2 * min(len(candidate), len(term)) < threshold * (len(candidate) + len(term)):
+                continue
+            matcher.set_seq1(candidate)
+            if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+                continue
+            similarity = matcher.ratio()
+            if similarity >= threshold:
+                expansions.append((candidate, similarity))
+
+        expansions.sort(key=lambda item: (-item[1], item[0]))
+        return expansions[:max_expansions]
+
+
+_fuzzy_index: Optional[FuzzyTermIndex] = None
+_fuzzy_index_lock = threading.Lock()
+
+
+def get_fuzzy_index() -> FuzzyTermIndex:
+    """Process-wide fuzzy term index, filled from page_postings on first refresh"""
+    global _fuzzy_index
+    if _fuzzy_index is None:
+        with _fuzzy_index_lock:
+            if _fuzzy_index is None:
+                _fuzzy_index = FuzzyTermIndex(max_candidates=settings.fuzzy_max_candidates)
+    return _fuzzy_index
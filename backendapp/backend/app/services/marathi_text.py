@@ -0,0 +1,50 @@
+# marathi_text.py
+import re
+import unicodedata
+from typing import List, Tuple
+
+# Devanagari letters, vowel signs, virama and digits plus any other word character.
+# ZWNJ/ZWJ may appear inside a word (e.g. eyelash ra) so they do not split tokens.
+# Danda (U+0964) and double danda (U+0965) are sentence punctuation and split tokens.
+TOKEN_PATTERN = re.compile(r'[\w\u0900-\u0963\u0966-\u097F\u200c\u200d]+')
+
+# Zero width joiner / non-joiner only affect glyph shaping, never the word itself
+_ZERO_WIDTH = dict.fromkeys(map(ord, '\u200b\u200c\u200d\ufeff'))
+
+# Devanagari digits (U+0966 - U+096F) are indexed as ASCII digits so "२०२४" matches "2024"
+_DEVANAGARI_DIGITS = {ord('\u0966') + i: str(i) for i in range(10)}
+
+
+def normalize_token(token: str) -> str:
+    """Canonical form of a token used as the index key"""
+    token = unicodedata.normalize('NFC', token)
+    token = token.translate(_ZERO_WIDTH).translate(_DEVANAGARI_DIGITS)
+    return token.casefold()
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """
+        Split text into normalised tokens.
+        Returns (token, char_start, char_end) with offsets into the original text.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        token = normalize_token(match.group())
+        if token:
+            tokens.append((token, match.start(), match.end()))
+    return tokens
+
+
+def query_terms(query: str) -> List[str]:
+    """Normalised terms of a search query, in order"""
+    return [token for token, _, _ in tokenize(query)]
+
+
+def line_offsets(text: str) -> List[int]:
+    """Character offset of the start of every line in text"""
+    offsets = [0]
+    position = text.find('\n')
+    while position != -1:
+        offsets.append(position + 1)
+        position = text.find('\n', position + 1)
+    return offsets
@@ -0,0 +1,134 @@
+# ocr_cache.py
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+
+class OCRCache:
+    """
+        Content-addressed, on-disk cache of per-page OCR results.
+
+        Entries are keyed by the SHA-256 of the PDF bytes, the page number and
+        everything that changes the OCR output (DPI, Tesseract config, pipeline
+        version), so re-uploads of the same circular skip rasterizing and
+        Tesseract entirely. Files are gzipped JSON; when the directory grows
+        past `max_bytes` the least recently used entries (by mtime, touched on
+        every hit) are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self._metrics = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def page_key(pdf_hash: str, page_number: int, **params: Any) -> str:
+        material = json.dumps([pdf_hash, page_number, sorted(params.items())])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        # Two-level fan out keeps directories small
+        return os.path.join(self.cache_dir, key[:2], key + ".json.gz")
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            self._metrics["misses"] += 1
+            return None
+
+        self._metrics["hits"] += 1
+        return data
+
+    def put(self, key: str, data: Dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._metrics["writes"] += 1
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json.gz"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return entries, total
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of its budget"""
+        entries, total = self._scan()
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._metrics["evictions"] += 1
+        self._size = total
+
+    def get_metrics(self) -> Dict[str, Any]:
+        lookups = self._metrics["hits"] + self._metrics["misses"]
+        return {
+            **self._metrics,
+            "hit_ratio": round(self._metrics["hits"] / lookups, 3) if lookups else None,
+            "size_mb": round(self._size / (1024 * 1024), 1) if self._size is not None else None,
+            "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+        }
+
+
+_ocr_cache: Optional[OCRCache] = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """Process-wide OCR cache, or None when OCR_CACHE_ENABLED is false"""
+    global _ocr_cache
+    if not settings.ocr_cache_enabled:
+        return None
+    if _ocr_cache is None:
+        with _ocr_cache_lock:
+            if _ocr_cache is None:
+                _ocr_cache = OCRCache(settings.ocr_cache_dir, settings.ocr_cache_max_mb * 1024 * 1024)
+    return _ocr_cache
@@ -0,0 +1,379 @@
+# ocr_job_service.py
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.exc import OperationalError
+
+from app.config import SessionLocal, settings
+from app.models.books import Book
+from app.models.enums.ocr_job_status import OCRJobStatus
+from app.services.book_ingest_service import BookIngestService
+from app.services.ocr_service import MarathiOCRService
+from app.services.search_cache import invalidate_book
+from app.services.search_service import SearchService
+
+logger = logging.getLogger(__name__)
+
+
+class OCRJobCancelled(Exception):
+    pass
+
+
+class DuplicateBookError(Exception):
+    """A book, or an unfinished job, already uses the uploaded filename"""
+    pass
+
+
+# Failures worth another attempt: the database connection dropped, or an OCR
+# worker process died and took the pool down. Anything else (a corrupt PDF, a
+# constraint violation) fails the same way every time.
+TRANSIENT_ERRORS = (OperationalError, BrokenProcessPool)
+
+
+@dataclass
+class OCRJob:
+    job_id: str
+    title: str
+    author: Optional[str]
+    filename: str
+    file_path: str
+    status: OCRJobStatus = OCRJobStatus.QUEUED
+    pages_done: int = 0
+    total_pages: Optional[int] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    book_id: Optional[int] = None
+    embedding_stats: Optional[Dict] = None
+    # How every page was read: from the PDF text layer or by OCR, and why
+    page_decisions: List[Dict] = field(default_factory=list)
+    # Background re-OCR of low-confidence pages at OCR_DPI once the book is searchable
+    refinement: Optional[Dict] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (OCRJobStatus.COMPLETED, OCRJobStatus.FAILED, OCRJobStatus.CANCELLED)
+
+    @property
+    def is_refining(self) -> bool:
+        return self.refinement is not None and \
+            self.refinement["status"] in (OCRJobStatus.QUEUED.value, OCRJobStatus.RUNNING.value)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "title": self.title,
+            "filename": self.filename,
+            "status": self.status.value,
+            "pages_done": self.pages_done,
+            "total_pages": self.total_pages,
+            "progress": round(self.pages_done / self.total_pages, 3) if self.total_pages else 0.0,
+            "attempts": self.attempts,
+            "error": self.error,
+            "book_id": self.book_id,
+            "embedding_stats": self.embedding_stats,
+            "ingest_report": {
+                "text_layer_pages": sum(1 for page in self.page_decisions if page["source"] == "text_layer"),
+                "ocr_pages": sum(1 for page in self.page_decisions if page["source"] == "ocr"),
+                "pages": self.page_decisions
+            },
+            "refinement": self.refinement,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat()
+        }
+
+
+class OCRJobService:
+    """
+        Background OCR + ingestion of uploaded books.
+
+        Jobs run on a bounded pool of OCR_JOB_WORKERS threads. The heavy work
+        (rasterising and Tesseract) happens in the shared OCR process pool, so
+        these threads only orchestrate and the API event loop stays free. Job state is kept in
+        this process; with several uvicorn workers, poll the worker that
+        accepted the upload (sticky sessions) or run a single ingestion worker.
+    """
+
+    _jobs: Dict[str, OCRJob] = {}
+    # Filenames of uploads being saved, claimed until their job is submitted
+    _reserved: Set[str] = set()
+    _lock = threading.Lock()
+    _executor: Optional[ThreadPoolExecutor] = None
+    _ocr_service = MarathiOCRService()
+
+    # Seconds to wait before retry n is 2 ** n
+    RETRY_BACKOFF_BASE = 2
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(
+                        max_workers=settings.ocr_job_workers,
+                        thread_name_prefix="ocr-job"
+                    )
+        return cls._executor
+
+    @classmethod
+    def reserve_filename(cls, filename: str):
+        """
+            Claim `filename` for an upload before its file is written. Raises
+            DuplicateBookError if a stored book, an unfinished job or another
+            upload already has it. `submit` takes the claim over; call
+            `release_filename` if the upload is abandoned before that.
+        """
+        with cls._lock:
+            cls._check_pending_filename(filename)
+            cls._reserved.add(filename)
+        try:
+            cls._check_stored_filename(filename)
+        except Exception:
+            cls.release_filename(filename)
+            raise
+
+    @classmethod
+    def release_filename(cls, filename: str):
+        with cls._lock:
+            cls._reserved.discard(filename)
+
+    @classmethod
+    def _check_pending_filename(cls, filename: str):
+        if filename in cls._reserved:
+            raise DuplicateBookError(f"{filename} is already being uploaded")
+        if any(job.filename == filename and not job.is_finished for job in cls._jobs.values()):
+            raise DuplicateBookError(f"{filename} is already being processed")
+
+    @staticmethod
+    def _check_stored_filename(filename: str):
+        db = SessionLocal()
+        try:
+            exists = db.query(Book.id).filter(Book.filename == filename).first() is not None
+        finally:
+            db.close()
+        if exists:
+            raise DuplicateBookError(f"A book with filename {filename} already exists")
+
+    @classmethod
+    def submit(cls, title: str, author: Optional[str], filename: str, file_path: str) -> OCRJob:
+        """Queue a book for OCR; a reservation of `filename` by reserve_filename passes to the job"""
+        job = OCRJob(
+            job_id=uuid.uuid4().hex,
+            title=title,
+            author=author,
+            filename=filename,
+            file_path=file_path
+        )
+        with cls._lock:
+            cls._reserved.discard(filename)
+            cls._check_pending_filename(filename)
+            cls._prune_finished()
+            cls._jobs[job.job_id] = job
+
+        cls._get_executor().submit(cls._run, job)
+        return job
+
+    @classmethod
+    def get(cls, job_id: str) -> Optional[OCRJob]:
+        return cls._jobs.get(job_id)
+
+    @classmethod
+    def list(cls) -> List[OCRJob]:
+        return sorted(cls._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    @classmethod
+    def cancel(cls, job_id: str) -> Optional[OCRJob]:
+        """Request cancellation. A queued job never starts; a running job stops at the next page."""
+        job = cls._jobs.get(job_id)
+        if job is None:
+            return None
+        if not job.is_finished or job.is_refining:
+            job.cancel_event.set()
+            if job.status == OCRJobStatus.QUEUED:
+                cls._update(job, status=OCRJobStatus.CANCELLED)
+        return job
+
+    @classmethod
+    def shutdown(cls):
+        for job in list(cls._jobs.values()):
+            job.cancel_event.set()
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False)
+            cls._executor = None
+
+    @classmethod
+    def _prune_finished(cls):
+        cutoff = datetime.utcnow() - timedelta(hours=settings.ocr_job_retention_hours)
+        for job_id in [job_id for job_id, job in cls._jobs.items() if job.is_finished and job.updated_at < cutoff]:
+            del cls._jobs[job_id]
+
+    @staticmethod
+    def _update(job: OCRJob, **changes):
+        for key, value in changes.items():
+            setattr(job, key, value)
+        job.updated_at = datetime.utcnow()
+
+    @classmethod
+    def _run(cls, job: OCRJob):
+        while not job.is_finished:
+            if job.cancel_event.is_set():
+                cls._update(job, status=OCRJobStatus.CANCELLED)
+                break
+
+            cls._update(job, status=OCRJobStatus.RUNNING, attempts=job.attempts + 1, pages_done=0, error=None,
+                        page_decisions=[])
+            try:
+                book_id = cls._process(job)
+                cls._update(job, status=OCRJobStatus.COMPLETED, book_id=book_id)
+            except OCRJobCancelled:
+                cls._update(job, status=OCRJobStatus.CANCELLED)
+            except TRANSIENT_ERRORS as e:
+                logger.exception(f"OCR job {job.job_id} failed on attempt {job.attempts}")
+                if job.attempts >= settings.ocr_job_max_attempts:
+                    cls._update(job, status=OCRJobStatus.FAILED, error=str(e))
+                else:
+                    cls._update(job, status=OCRJobStatus.QUEUED, error=str(e))
+                    job.cancel_event.wait(cls.RETRY_BACKOFF_BASE ** job.attempts)
+            except Exception as e:
+                logger.exception(f"OCR job {job.job_id} failed")
+                cls._update(job, status=OCRJobStatus.FAILED, error=str(e))
+
+        if job.status == OCRJobStatus.CANCELLED and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+
+    @staticmethod
+    def _page_decision(page_data: Dict) -> Dict:
+        decision = {
+            'page_number': page_data['page_number'],
+            'source': page_data.get('source', 'ocr'),
+            'confidence': round(page_data['confidence'], 1)
+        }
+        probe = page_data.get('text_layer') or {'reason': 'text layer disabled'}
+        decision.update((key, value) for key, value in probe.items() if key != 'usable')
+        return decision
+
+    @classmethod
+    def _process(cls, job: OCRJob) -> int:
+        def on_page(pages_done: int, total_pages: int):
+            if job.cancel_event.is_set():
+                raise OCRJobCancelled()
+            cls._update(job, pages_done=pages_done, total_pages=total_pages)
+
+        def recorded(pages):
+            for page_data in pages:
+                job.page_decisions.append(cls._page_decision(page_data))
+                yield page_data
+
+        # A book with this filename may have been stored while the job was queued; fail before any OCR
+        cls._check_stored_filename(job.filename)
+
+        start_time = time.perf_counter()
+        # Pages stream from the OCR pool straight into the bulk insert batches
+        first_pass_dpi = settings.ocr_first_pass_dpi or settings.ocr_dpi
+        pages = recorded(cls._ocr_service.iter_pages(job.file_path, progress_callback=on_page, dpi=first_pass_dpi))
+
+        db = SessionLocal()
+        try:
+            book, _ = BookIngestService.ingest_book(
+                db=db,
+                title=job.title,
+                author=job.author,
+                filename=job.filename,
+                file_path=job.file_path,
+                extracted_data=pages
+            )
+            book_id = book.id
+
+            # Embed chunks once at ingest so semantic queries only embed the query text.
+            # The book is already committed, so an indexing error must not retry the OCR.
+            try:
+                cls._update(job, embedding_stats=SearchService(db).index_book(book_id))
+            except Exception:
+                logger.exception(f"Semantic indexing failed for book {book_id}")
+            invalidate_book(book_id)
+        finally:
+            db.close()
+
+        text_layer_pages = sum(1 for page in job.page_decisions if page['source'] == 'text_layer')
+        logger.info(
+            f"OCR job {job.job_id} finished in {time.perf_counter() - start_time:.1f}s, "
+            f"{text_layer_pages} of {len(job.page_decisions)} pages read from the text layer"
+        )
+
+        if first_pass_dpi < settings.ocr_dpi:
+            low_confidence = [
+                page['page_number'] for page in job.page_decisions
+                if page['source'] == 'ocr' and page['confidence'] < settings.ocr_refine_confidence
+            ]
+            if low_confidence:
+                cls._update(job, refinement={
+                    "status": OCRJobStatus.QUEUED.value,
+                    "pages": low_confidence,
+                    "pages_done": 0,
+                    "replaced": 0
+                })
+                cls._get_executor().submit(cls._refine, job, book_id)
+        return book_id
+
+    @classmethod
+    def _refine(cls, job: OCRJob, book_id: int):
+        """
+            Second OCR pass over the low-confidence pages of an ingested book, at OCR_DPI with
+            stronger preprocessing. Pages are replaced in place batch by batch, so the book
+            stays searchable throughout; cancelling keeps the pages refined so far.
+        """
+        refinement = dict(job.refinement, status=OCRJobStatus.RUNNING.value)
+        cls._update(job, refinement=refinement)
+
+        def on_page(pages_done: int, total_pages: int):
+            if job.cancel_event.is_set():
+                raise OCRJobCancelled()
+            refinement["pages_done"] = pages_done
+
+        start_time = time.perf_counter()
+        pages = cls._ocr_service.iter_pages(
+            job.file_path, progress_callback=on_page, page_numbers=refinement["pages"], refine=True
+        )
+        db = SessionLocal()
+        try:
+            while True:
+                batch = list(islice(pages, settings.ingest_page_batch_size))
+                if not batch:
+                    break
+                refinement["replaced"] += len(BookIngestService.update_pages(db, book_id, batch))
+                db.commit()
+                invalidate_book(book_id)
+            refinement["status"] = OCRJobStatus.COMPLETED.value
+        except OCRJobCancelled:
+            refinement["status"] = OCRJobStatus.CANCELLED.value
+        except Exception as e:
+            logger.exception(f"Re-OCR of book {book_id} failed")
+            db.rollback()
+            refinement.update(status=OCRJobStatus.FAILED.value, error=str(e))
+
+        try:
+            if refinement["replaced"]:
+                # Chunks of unchanged pages keep their embeddings (deduplicated by text hash)
+                SearchService(db).index_book(book_id)
+                invalidate_book(book_id)
+        except Exception:
+            logger.exception(f"Semantic indexing failed for book {book_id}")
+        finally:
+            db.close()
+
+        cls._update(job, refinement=refinement)
+        logger.info(
+            f"Re-OCR of book {book_id}: {refinement['replaced']} of {len(refinement['pages'])} pages improved "
+            f"in {time.perf_counter() - start_time:.1f}s ({refinement['status']})"
+        )
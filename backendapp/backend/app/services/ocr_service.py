@@ -1,67 +1,292 @@
 # ocr_service.py
-import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
+import logging
+import multiprocessing
 import re
-from typing import List, Dict
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 import os
+import threading
+
+from app.config import settings
+from app.services.image_preprocessing import ImagePreprocessor, unrotate_boxes
+from app.services.ocr_cache import get_ocr_cache
+from app.services.page_layout import build_page_layout
+from app.services.pdf_text_layer import probe_text_layer, read_text_layer
+from app.services.tesseract_engine import create_tesseract_engine
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever preprocessing or text reconstruction changes, so cached pages are not reused
+OCR_PIPELINE_VERSION = 4
+
+# Anything that is not Devanagari, printable ASCII or whitespace
+_NON_MARATHI = re.compile(r'[^\u0900-\u097F\u0020-\u007E\s]')
+
+# Times one iter_pages run replaces a broken pool before giving up; a page that
+# crashes its worker every time would otherwise take the pool down forever
+MAX_POOL_RESTARTS = 3
+
+_page_pool: Optional[ProcessPoolExecutor] = None
+_page_pool_lock = threading.Lock()
+
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    """Process pool shared by every OCR job in this process, one worker per core by default"""
+    global _page_pool
+    if _page_pool is None:
+        with _page_pool_lock:
+            if _page_pool is None:
+                _page_pool = ProcessPoolExecutor(
+                    max_workers=settings.ocr_workers or os.cpu_count(),
+                    # spawn: forking a process that runs threads (uvicorn, job pool) is unsafe
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _page_pool
+
+
+def _reset_page_pool(broken: ProcessPoolExecutor):
+    """
+        Drop a pool that a dead worker (OOM on a large page, a Tesseract crash) left
+        broken; the next _get_page_pool() starts a fresh one. Only `broken` itself is
+        dropped, so jobs that noticed the same crash don't discard each other's new pool.
+    """
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is broken:
+            _page_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_page_pool():
+    global _page_pool
+    if _page_pool is not None:
+        _page_pool.shutdown(wait=False, cancel_futures=True)
+        _page_pool = None
+
+
+def _ocr_pdf_page(pdf_path: str, page_number: int, dpi: int, use_text_layer: bool, engine: str,
+                  refine: bool) -> Dict:
+    """Worker process entry point: read a single page from its text layer, or rasterize and OCR it"""
+    service = MarathiOCRService(engine)
+    probe = None
+    if use_text_layer:
+        boxes = read_text_layer(pdf_path, page_number, settings.ocr_dpi)
+        probe = probe_text_layer(boxes)
+        if probe['usable']:
+            return service.text_layer_page(boxes, page_number, probe)
+    
+    image = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+    page_data = service.ocr_image(image, page_number, dpi=dpi, refine=refine)
+    page_data['text_layer'] = probe
+    return page_data
+
 
 class MarathiOCRService:
-    def __init__(self):
+    def __init__(self, engine: Optional[str] = None):
         # Configure Tesseract for Marathi
         self.tesseract_config = r'--oem 3 --psm 6 -l mar+eng'
+        self.engine_name = engine or settings.ocr_engine
+        self.engine = create_tesseract_engine(self.engine_name, self.tesseract_config)
+        self.preprocess_steps = [step.strip() for step in settings.ocr_preprocess_steps.split(',') if step.strip()]
+        self._preprocessors = {
+            strong: ImagePreprocessor(self.preprocess_steps, settings.ocr_deskew_max_angle, strong=strong)
+            for strong in (False, True)
+        }
         
-    def extract_text_from_pdf(self, pdf_path: str) -> List[Dict]:
-        """Extract text from each page of PDF"""
-        pages = convert_from_path(pdf_path, dpi=300)
-        extracted_data = []
+    def cache_params(self, dpi: int, use_text_layer: bool, refine: bool) -> Dict:
+        """Everything besides the PDF bytes that changes the OCR output of a page"""
+        return {
+            'version': OCR_PIPELINE_VERSION,
+            'dpi': dpi,
+            'box_dpi': settings.ocr_dpi,
+            'config': self.tesseract_config,
+            'preprocess': self.preprocess_steps,
+            'deskew_max_angle': settings.ocr_deskew_max_angle,
+            'engine': self.engine_name,
+            'text_layer': use_text_layer,
+            'refine': refine
+        }
+    
+    def ocr_image(self, image: Image.Image, page_number: int, dpi: Optional[int] = None,
+                  refine: bool = False) -> Dict:
+        """OCR one rasterized page
         
-        for page_num, page in enumerate(pages, 1):
-            # Preprocess image for better OCR
-            page = self.preprocess_image(page)
-            
-            # Extract text
-            text = pytesseract.image_to_string(page, config=self.tesseract_config)
-            
-            # Extract with bounding boxes for positional search
-            boxes = pytesseract.image_to_data(page, config=self.tesseract_config, output_type=pytesseract.Output.DICT)
-            
-            extracted_data.append({
-                'page_number': page_num,
-                'text': self.clean_marathi_text(text),
-                'boxes': boxes,
-                'confidence': self.calculate_confidence(boxes)
-            })
-            
-        return extracted_data
+        Word boxes are returned in pixels at OCR_DPI whatever the DPI (`dpi`,
+        when known) and preprocessing of this pass, so passes can be mixed.
+        `refine` applies the stronger preprocessing of the second pass.
+        """
+        width = image.width
+        # Preprocess image for better OCR
+        image, preprocessing = self.preprocess(image, strong=refine)
+        
+        # Single Tesseract pass: word boxes, from which text, layout and confidence are derived
+        boxes = self.engine.image_to_data(image)
+        if 'rotation' in preprocessing:
+            # Deskewed pages: boxes back onto the page as rasterized, so they match the stored PDF
+            unrotate_boxes(boxes, preprocessing['rotation'], image.size)
+        scale = width / image.width * (settings.ocr_dpi / dpi if dpi else 1)
+        if scale != 1:
+            self.scale_boxes(boxes, scale)
+        text, layout = build_page_layout(boxes, self.clean_marathi_word)
+        
+        return {
+            'page_number': page_number,
+            'text': text,
+            'layout': layout,
+            'boxes': boxes,
+            'confidence': self.calculate_confidence(boxes),
+            'source': 'ocr',
+            'preprocessing': preprocessing
+        }
     
-    def preprocess_image(self, image: Image.Image) -> Image.Image:
-        """Enhance image quality for better OCR"""
-        # Convert to grayscale
-        image = image.convert('L')
+    def text_layer_page(self, boxes: Dict, page_number: int, probe: Dict) -> Dict:
+        """Page data from the embedded text layer of a born-digital page, shaped like ocr_image output"""
+        text, layout = build_page_layout(boxes, self.clean_marathi_word)
+        return {
+            'page_number': page_number,
+            'text': text,
+            'layout': layout,
+            'boxes': boxes,
+            # Text layer words are exact, not recognised
+            'confidence': 100.0,
+            'source': 'text_layer',
+            'text_layer': probe
+        }
+    
+    def iter_pages(self, pdf_path: str,
+                   progress_callback: Optional[Callable[[int, int], None]] = None,
+                   dpi: Optional[int] = None, page_numbers: Optional[List[int]] = None,
+                   refine: bool = False) -> Iterator[Dict]:
+        """Stream OCR results page by page, in page order
         
-        # Increase contrast
-        from PIL import ImageEnhance
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(2.0)
+        Pages are rasterized one at a time inside the worker processes and at
+        most `OCR_WINDOW_SIZE` pages are in flight, so peak memory depends on
+        the window and not on the length of the book. Pages of born-digital
+        PDFs with a usable text layer are read from it instead of being
+        rasterized; `source` and `text_layer` of each page record the decision.
+        `progress_callback(pages_done, total_pages)` is called after every page;
+        raising from it aborts the extraction.
         
-        # Resize if too small
-        width, height = image.size
-        if width < 1000:
-            scale = 1000 / width
-            image = image.resize((int(width * scale), int(height * scale)))
+        A worker that dies mid-page breaks the whole pool; it is replaced and
+        the unfinished pages are submitted again, up to MAX_POOL_RESTARTS times.
+        
+        Pages are rasterized at `dpi` (default OCR_DPI). `page_numbers` limits
+        the run to those pages; `refine` is the second pass of two-pass OCR,
+        which skips the text layer and preprocesses more strongly.
+        """
+        if page_numbers is None:
+            page_numbers = range(1, pdfinfo_from_path(pdf_path)['Pages'] + 1)
+        total_pages = len(page_numbers)
+        dpi = dpi or settings.ocr_dpi
+        use_text_layer = settings.ocr_text_layer_enabled and not refine
+        window = settings.ocr_window_size or 2 * (settings.ocr_workers or os.cpu_count())
+        
+        cache = get_ocr_cache()
+        pdf_hash = cache.file_hash(pdf_path) if cache else None
+        
+        def run(page_number: int) -> Tuple[Future, ProcessPoolExecutor]:
+            args = (pdf_path, page_number, dpi, use_text_layer, self.engine_name, refine)
+            pool = _get_page_pool()
+            try:
+                return pool.submit(_ocr_pdf_page, *args), pool
+            except BrokenProcessPool:
+                # Another job's page crashed the pool since it was last used
+                _reset_page_pool(pool)
+                pool = _get_page_pool()
+                return pool.submit(_ocr_pdf_page, *args), pool
+        
+        def submit(page_number: int) -> List:
+            """[page_number, future, pool, cache key] of one page"""
+            if cache is None:
+                return [page_number, *run(page_number), None]
+            
+            key = cache.page_key(pdf_hash, page_number, **self.cache_params(dpi, use_text_layer, refine))
+            cached = cache.get(key)
+            if cached is None:
+                return [page_number, *run(page_number), key]
             
-        return image
+            # Already OCR'd: hand back a resolved future so ordering logic stays the same
+            future = Future()
+            future.set_result(cached)
+            return [page_number, future, None, None]
+        
+        in_flight = deque()
+        pending = iter(page_numbers)
+        pages_done = 0
+        restarts = 0
+        try:
+            while pages_done < total_pages:
+                while len(in_flight) < window:
+                    page_number = next(pending, None)
+                    if page_number is None:
+                        break
+                    in_flight.append(submit(page_number))
+                
+                page_number, future, pool, cache_key = in_flight[0]
+                try:
+                    page_data = future.result()
+                except BrokenProcessPool:
+                    restarts += 1
+                    if restarts > MAX_POOL_RESTARTS:
+                        raise
+                    logger.warning(f"OCR worker died on {pdf_path} around page {page_number}, restarting the pool")
+                    _reset_page_pool(pool)
+                    # Every page that had not finished on the broken pool runs again on the new one
+                    for entry in in_flight:
+                        if entry[2] is pool and (entry[1].cancelled() or entry[1].exception() is not None):
+                            entry[1], entry[2] = run(entry[0])
+                    continue
+                
+                in_flight.popleft()
+                if cache_key:
+                    cache.put(cache_key, page_data)
+                pages_done += 1
+                if progress_callback:
+                    progress_callback(pages_done, total_pages)
+                yield page_data
+        finally:
+            # Abort or early exit: drop the pages that have not started yet
+            for _, future, _, _ in in_flight:
+                future.cancel()
     
-    def clean_marathi_text(self, text: str) -> str:
-        """Clean and normalize Marathi text"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
+    def extract_text_from_pdf(self, pdf_path: str,
+                              progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
+        """Extract text from each page of PDF"""
+        return list(self.iter_pages(pdf_path, progress_callback))
+    
+    def preprocess(self, image: Image.Image, strong: bool = False) -> Tuple[Image.Image, Dict]:
+        """Enhance image quality for better OCR, with the time spent in every step
         
-        # Remove non-Marathi/English characters (keep Devanagari range)
-        text = re.sub(r'[^\u0900-\u097F\u0020-\u007E\s]', '', text)
+        Runs the OCR_PREPROCESS_STEPS of ImagePreprocessor; `strong` is used to
+        re-OCR low-confidence pages.
+        """
+        return self._preprocessors[strong].run(image)
+    
+    def preprocess_image(self, image: Image.Image, strong: bool = False) -> Image.Image:
+        """Enhance image quality for better OCR"""
+        return self.preprocess(image, strong)[0]
+    
+    @staticmethod
+    def scale_boxes(boxes: Dict, scale: float):
+        """Scale the pixel coordinates of image_to_data output in place"""
+        for key in ('left', 'top', 'width', 'height'):
+            boxes[key] = [round(int(value) * scale) for value in boxes[key]]
+    
+    def clean_marathi_word(self, word: str) -> str:
+        """Clean one OCR word: drop non-Marathi/English characters (keep Devanagari range)"""
+        return _NON_MARATHI.sub('', word).strip()
+    
+    def clean_marathi_text(self, text: str) -> str:
+        """Clean and normalize Marathi text, keeping its line and paragraph breaks"""
+        text = _NON_MARATHI.sub('', text)
         
-        return text
+        # Collapse whitespace within lines, and runs of empty lines to one
+        lines = [' '.join(line.split()) for line in text.strip().split('\n')]
+        return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines))
     
     def calculate_confidence(self, boxes: Dict) -> float:
         """Calculate average confidence score"""
@@ -0,0 +1,112 @@
+# onnx_embedding.py
+import json
+import os
+from typing import Dict, List, Union
+
+import numpy as np
+
+# Files of an export made by scripts/export_embedding_onnx.py
+ONNX_MODEL_FILE = "model.onnx"
+ENCODER_CONFIG_FILE = "encoder.json"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class _Tokenizer:
+    """
+        `tokenizers` tokenizer behind the small part of the transformers call
+        API the search stack uses. Loading transformers would import PyTorch,
+        which is what this backend avoids.
+    """
+
+    def __init__(self, path: str, max_length: int, pad_token: str):
+        from tokenizers import Tokenizer
+
+        self._tokenizer = Tokenizer.from_file(path)
+        self._tokenizer.no_padding()
+        self._tokenizer.no_truncation()
+        # Model inputs are cut at the model's maximum length
+        self._truncating = Tokenizer.from_file(path)
+        self._truncating.no_padding()
+        self._truncating.enable_truncation(max_length=max_length)
+        self.pad_token_id = self._tokenizer.token_to_id(pad_token)
+
+    def __call__(self, texts: List[str], add_special_tokens: bool = True,
+                 return_offsets_mapping: bool = False) -> Dict[str, list]:
+        """Token ids (and character offsets) of every text, unpadded and untruncated"""
+        encodings = self._tokenizer.encode_batch(texts, add_special_tokens=add_special_tokens)
+        tokens = {"input_ids": [encoding.ids for encoding in encodings]}
+        if return_offsets_mapping:
+            tokens["offset_mapping"] = [encoding.offsets for encoding in encodings]
+        return tokens
+
+    def batch(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Model inputs padded to the longest text of the batch"""
+        ids = [encoding.ids for encoding in self._truncating.encode_batch(texts)]
+        input_ids = np.full((len(ids), max(map(len, ids))), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros_like(input_ids)
+        for row, token_ids in enumerate(ids):
+            input_ids[row, :len(token_ids)] = token_ids
+            attention_mask[row, :len(token_ids)] = 1
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+
+class OnnxSentenceEncoder:
+    """
+        Sentence encoder running an ONNX export of a mean-pooling
+        SentenceTransformer model (e.g. paraphrase-multilingual-MiniLM-L12-v2)
+        on ONNX Runtime, usually with dynamic int8 quantized weights.
+
+        Exposes the parts of the SentenceTransformer API the search stack uses
+        (`encode`, `tokenizer`, `max_seq_length`), so EmbeddingModelRegistry can
+        hold either. The transformer runs in the ONNX graph; pooling is done
+        here with the attention mask, exactly as the SentenceTransformer
+        pooling layer does, so embeddings stay comparable with PyTorch ones.
+    """
+
+    def __init__(self, model_dir: str, intra_op_threads: int = 0):
+        import onnxruntime as ort
+
+        with open(os.path.join(model_dir, ENCODER_CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.model_name = self.config["model_name"]
+        self.max_seq_length = self.config["max_seq_length"]
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        # One graph runs at a time per session call; parallelism is within operators
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = [model_input.name for model_input in self.session.get_inputs()]
+        self.tokenizer = _Tokenizer(
+            os.path.join(model_dir, TOKENIZER_FILE), self.max_seq_length, self.config.get("pad_token", "<pad>")
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.session.get_outputs()[0].shape[-1]
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, normalize_embeddings: bool = False,
+               **kwargs) -> np.ndarray:
+        """Embeddings as a float32 array, one row per sentence (a 1-d array for a single string)"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            tokens = self.tokenizer.batch(sentences[start:start + batch_size])
+            feeds = {name: tokens[name] for name in self._input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real tokens only
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
+        if normalize_embeddings and len(embeddings):
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if single else embeddings
@@ -0,0 +1,91 @@
+# page_layout.py
+"""
+Structured page text built from Tesseract's block/par/line numbering.
+
+The page text keeps the OCR layout: words of a line are joined by a space,
+lines by '\\n' and paragraphs/blocks by an empty line. Next to it the layout
+records where every block, line and word sits in that text:
+
+    {"version": 1,
+     "blocks": [{"start": 0, "end": 57, "box": [left, top, width, height],
+                 "lines": [{"start": 0, "end": 23, "par": 1, "box": [...],
+                            "words": [[start, end, left, top, width, height], ...]}]}]}
+
+Offsets are [start, end) character offsets into Page.content, so a line,
+block or word is a plain slice once it has been located.
+"""
+from typing import Callable, Dict, List, Tuple
+
+LAYOUT_VERSION = 1
+
+# Image boxes are [left, top, width, height]
+Box = List[int]
+
+
+def _union(boxes: List[Box]) -> Box:
+    left = min(box[0] for box in boxes)
+    top = min(box[1] for box in boxes)
+    right = max(box[0] + box[2] for box in boxes)
+    bottom = max(box[1] + box[3] for box in boxes)
+    return [left, top, right - left, bottom - top]
+
+
+def build_page_layout(boxes: Dict, clean_word: Callable[[str], str]) -> Tuple[str, Dict]:
+    """
+        Page text and its layout from image_to_data output, in one pass.
+        Words are passed through `clean_word`; words it empties are dropped.
+    """
+    words_by_line = {}
+    for i, word in enumerate(boxes['text']):
+        # Only level 5 rows are words; the others are page/block/paragraph/line boxes
+        if int(boxes['level'][i]) != 5:
+            continue
+        word = clean_word(word)
+        if not word:
+            continue
+        key = (int(boxes['block_num'][i]), int(boxes['par_num'][i]), int(boxes['line_num'][i]))
+        box = [int(boxes['left'][i]), int(boxes['top'][i]), int(boxes['width'][i]), int(boxes['height'][i])]
+        words_by_line.setdefault(key, []).append((word, box))
+
+    parts = []
+    position = 0
+    blocks = []
+    previous_key = None
+    for key, words in words_by_line.items():
+        if previous_key is not None:
+            separator = '\n' if key[:2] == previous_key[:2] else '\n\n'
+            parts.append(separator)
+            position += len(separator)
+        if previous_key is None or key[0] != previous_key[0]:
+            blocks.append({'start': position, 'lines': []})
+
+        line = {'start': position, 'par': key[1], 'words': []}
+        for k, (word, box) in enumerate(words):
+            if k:
+                parts.append(' ')
+                position += 1
+            parts.append(word)
+            line['words'].append([position, position + len(word)] + box)
+            position += len(word)
+        line['end'] = position
+        line['box'] = _union([word[2:] for word in line['words']])
+        blocks[-1]['lines'].append(line)
+        previous_key = key
+
+    for block in blocks:
+        block['end'] = block['lines'][-1]['end']
+        block['box'] = _union([line['box'] for line in block['lines']])
+    return ''.join(parts), {'version': LAYOUT_VERSION, 'blocks': blocks}
+
+
+def words_in_range(layout: Dict, start: int, end: int) -> List[List[int]]:
+    """Words ([start, end, left, top, width, height]) overlapping [start, end), in reading order"""
+    words = []
+    for block in layout['blocks']:
+        if block['end'] <= start or block['start'] >= end:
+            continue
+        for line in block['lines']:
+            if line['end'] <= start or line['start'] >= end:
+                continue
+            words.extend(word for word in line['words'] if word[1] > start and word[0] < end)
+    return words
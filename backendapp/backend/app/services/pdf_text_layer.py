@@ -0,0 +1,97 @@
+# pdf_text_layer.py
+"""
+Embedded text layer of born-digital PDF pages.
+
+Text and word boxes come from poppler's `pdftotext -bbox-layout` (poppler is
+already needed by pdf2image) and are returned in the shape of Tesseract's
+image_to_data output, so the rest of the pipeline treats them like OCR words.
+Boxes are scaled from PDF points to pixels at the OCR DPI.
+"""
+import re
+import subprocess
+import xml.etree.ElementTree as ET
+from typing import Dict, Optional
+
+from app.config import settings
+
+_XHTML = '{http://www.w3.org/1999/xhtml}'
+
+# Seconds allowed for pdftotext on one page
+PDFTOTEXT_TIMEOUT = 60
+
+# Characters a real Marathi/English text layer is made of: Devanagari, printable ASCII, whitespace
+_VALID_CHAR = re.compile(r'[\u0900-\u097F\u0020-\u007E\s\u200C\u200D]')
+
+# A plausible word: letters/digits, optionally joined by - / . , ' & and wrapped in brackets or punctuation.
+# Text drawn with legacy (non-Unicode) Devanagari fonts extracts as ASCII like "xzkeiapk;r ea=h",
+# which mostly fails this.
+_WORD_CHARS = r'[0-9A-Za-z\u0900-\u0963\u0966-\u097F\u200C\u200D]+'
+_PLAUSIBLE_WORD = re.compile(
+    rf"^[(\[\"'\u2018\u201C]?{_WORD_CHARS}(?:[-/.,'&]{_WORD_CHARS})*[)\]\"'\u2019\u201D.,;:!?\u0964\u0965]*$"
+)
+
+_BOX_KEYS = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+             'left', 'top', 'width', 'height', 'conf', 'text')
+
+
+def read_text_layer(pdf_path: str, page_number: int, dpi: int) -> Optional[Dict]:
+    """
+        Words of one page's text layer as image_to_data-shaped boxes.
+        PDF flows become blocks, pdftotext blocks paragraphs. None when the
+        page cannot be read (pdftotext missing, damaged or encrypted file).
+    """
+    try:
+        output = subprocess.run(
+            ['pdftotext', '-f', str(page_number), '-l', str(page_number), '-bbox-layout', pdf_path, '-'],
+            capture_output=True, check=True, timeout=PDFTOTEXT_TIMEOUT
+        ).stdout
+        root = ET.fromstring(output)
+    except (OSError, subprocess.SubprocessError, ET.ParseError):
+        return None
+
+    scale = dpi / 72
+    boxes = {key: [] for key in _BOX_KEYS}
+    for block_num, flow in enumerate(root.iter(f'{_XHTML}flow'), 1):
+        for par_num, block in enumerate(flow.iter(f'{_XHTML}block'), 1):
+            for line_num, line in enumerate(block.iter(f'{_XHTML}line'), 1):
+                for word_num, word in enumerate(line.iter(f'{_XHTML}word'), 1):
+                    left, top = float(word.get('xMin')), float(word.get('yMin'))
+                    right, bottom = float(word.get('xMax')), float(word.get('yMax'))
+                    row = (5, page_number, block_num, par_num, line_num, word_num,
+                           round(left * scale), round(top * scale),
+                           round((right - left) * scale), round((bottom - top) * scale),
+                           100, word.text or '')
+                    for key, value in zip(_BOX_KEYS, row):
+                        boxes[key].append(value)
+    return boxes
+
+
+def probe_text_layer(boxes: Optional[Dict]) -> Dict:
+    """
+        Whether a page's text layer can replace OCR, with the numbers behind the decision.
+
+        The layer must hold at least OCR_TEXT_LAYER_MIN_CHARS characters (scanned pages
+        have none, or only a stamp or page number), nearly all of them Devanagari or
+        ASCII (glyphs without a Unicode mapping extract as private-use or replacement
+        characters), and mostly plausible words (legacy-font text is ASCII noise).
+    """
+    if boxes is None:
+        return {'usable': False, 'reason': 'unreadable', 'chars': 0}
+
+    words = [word for word in boxes['text'] if word.strip()]
+    chars = sum(len(word) for word in words)
+    probe = {'usable': False, 'chars': chars}
+    if chars < settings.ocr_text_layer_min_chars:
+        probe['reason'] = 'no text layer'
+        return probe
+
+    valid_ratio = sum(len(_VALID_CHAR.findall(word)) for word in words) / chars
+    word_ratio = sum(1 for word in words if _PLAUSIBLE_WORD.match(word)) / len(words)
+    probe.update(valid_ratio=round(valid_ratio, 3), word_ratio=round(word_ratio, 3))
+    if valid_ratio < settings.ocr_text_layer_min_valid_ratio:
+        probe['reason'] = 'unmapped glyphs'
+    elif word_ratio < settings.ocr_text_layer_min_word_ratio:
+        probe['reason'] = 'garbled text'
+    else:
+        probe.update(usable=True, reason='text layer')
+    return probe
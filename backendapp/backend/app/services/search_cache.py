@@ -0,0 +1,221 @@
+# search_cache.py
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+from app.services.fuzzy_index import get_fuzzy_index
+
+logger = logging.getLogger(__name__)
+
+# Generation of results that are not restricted to one book
+GLOBAL_SCOPE = "all"
+
+
+class SearchResultCache:
+    """
+        Two-tier cache of SearchService result pages.
+
+        Entries are keyed by (mode, normalized query, book_id, parameters) and
+        live in a bounded in-process LRU, backed by Redis when REDIS_URL is set
+        so every uvicorn worker shares them. Both tiers expire after `ttl`.
+
+        Invalidation is by generation: every key embeds the generation of its
+        scope (the book for book-scoped searches, "all" otherwise). Ingesting or
+        deleting a book bumps that book's generation and the global one, so old
+        entries are never read again and simply age out. With Redis the
+        generations are Redis counters, so an ingest in one worker invalidates
+        all of them.
+
+        Cached results are shared between callers and must not be mutated.
+
+        `namespace` separates the Redis keys and generations of independent
+        caches. With `share_values` off, entries stay in this process and
+        only the generations go through Redis, so invalidation still reaches
+        every worker.
+    """
+
+    def __init__(self, max_entries: int, ttl: int, redis_url: Optional[str] = None, namespace: str = "search",
+                 share_values: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.share_values = share_values
+        self.key_prefix = f"{namespace}:"
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._redis = self._connect(redis_url) if redis_url else None
+        self._metrics = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "redis_errors": 0,
+            "saved_seconds": 0.0,
+        }
+
+    @staticmethod
+    def _connect(redis_url: str):
+        import redis
+
+        return redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    # -------------------- Keys -------------------- #
+
+    def _generation(self, scope: str) -> int:
+        if self._redis is not None:
+            try:
+                return int(self._redis.get(f"{self.key_prefix}gen:{scope}") or 0)
+            except Exception:
+                self._metrics["redis_errors"] += 1
+        return self._generations.get(scope, 0)
+
+    def key(self, mode: str, query: str, book_id: Optional[int], **params: Any) -> str:
+        scope = str(book_id) if book_id else GLOBAL_SCOPE
+        material = json.dumps(
+            [mode, query, book_id, sorted(params.items()), self._generation(scope)],
+            ensure_ascii=False, default=str
+        )
+        return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+    # -------------------- Lookups -------------------- #
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value, cost = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._metrics["local_hits"] += 1
+                    self._metrics["saved_seconds"] += cost
+                    return value
+                del self._entries[key]
+
+        if self._redis is not None and self.share_values:
+            try:
+                raw = self._redis.get(self.key_prefix + key)
+            except Exception:
+                self._metrics["redis_errors"] += 1
+                raw = None
+            if raw is not None:
+                entry = json.loads(raw)
+                self._store_local(key, entry["v"], entry["t"])
+                self._metrics["redis_hits"] += 1
+                self._metrics["saved_seconds"] += entry["t"]
+                return entry["v"]
+
+        self._metrics["misses"] += 1
+        return None
+
+    def put(self, key: str, value: Dict, cost: float):
+        """Store a result page; `cost` is the seconds it took to compute"""
+        self._store_local(key, value, cost)
+        if self._redis is not None and self.share_values:
+            try:
+                payload = json.dumps({"t": cost, "v": value}, ensure_ascii=False, default=str)
+                self._redis.set(self.key_prefix + key, payload, ex=self.ttl)
+            except Exception:
+                self._metrics["redis_errors"] += 1
+
+    def _store_local(self, key: str, value: Dict, cost: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value, cost)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict]) -> Dict:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        start_time = time.perf_counter()
+        value = compute()
+        self.put(key, value, time.perf_counter() - start_time)
+        return value
+
+    # -------------------- Invalidation -------------------- #
+
+    def invalidate_book(self, book_id: int):
+        """Drop cached results that may include `book_id`: its own scope and every unscoped search"""
+        for scope in (str(book_id), GLOBAL_SCOPE):
+            with self._lock:
+                self._generations[scope] = self._generations.get(scope, 0) + 1
+            if self._redis is not None:
+                try:
+                    self._redis.incr(f"{self.key_prefix}gen:{scope}")
+                except Exception:
+                    self._metrics["redis_errors"] += 1
+        self._metrics["invalidations"] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        hits = self._metrics["local_hits"] + self._metrics["redis_hits"]
+        lookups = hits + self._metrics["misses"]
+        return {
+            **self._metrics,
+            "saved_seconds": round(self._metrics["saved_seconds"], 3),
+            "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "redis": self._redis is not None,
+            "shared_values": self._redis is not None and self.share_values,
+        }
+
+
+_search_cache: Optional[SearchResultCache] = None
+_ranking_cache: Optional[SearchResultCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """Process-wide search result cache, or None when SEARCH_CACHE_ENABLED is false"""
+    global _search_cache
+    if not settings.search_cache_enabled:
+        return None
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = SearchResultCache(
+                    max_entries=settings.search_cache_max_entries,
+                    ttl=settings.search_cache_ttl_seconds,
+                    redis_url=settings.redis_url or None,
+                )
+    return _search_cache
+
+
+def get_ranking_cache() -> Optional[SearchResultCache]:
+    """
+        Process-wide cache of intermediate rankings (corpus statistics, ranked
+        rank keys), or None when SEARCH_CACHE_ENABLED is false. It is kept apart
+        from the result cache so result hit ratios only count results, and its
+        entries, one rank key per matching page, never go to Redis.
+    """
+    global _ranking_cache
+    if not settings.search_cache_enabled:
+        return None
+    if _ranking_cache is None:
+        with _search_cache_lock:
+            if _ranking_cache is None:
+                _ranking_cache = SearchResultCache(
+                    max_entries=settings.search_ranking_cache_max_entries,
+                    ttl=settings.search_cache_ttl_seconds,
+                    redis_url=settings.redis_url or None,
+                    namespace="ranking",
+                    share_values=False,
+                )
+    return _ranking_cache
+
+
+def invalidate_book(book_id: int):
+    """Call after a book is ingested, re-indexed or deleted"""
+    get_fuzzy_index().invalidate_book(book_id)
+    for cache in (get_search_cache(), get_ranking_cache()):
+        if cache is not None:
+            cache.invalidate_book(book_id)
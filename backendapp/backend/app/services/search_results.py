@@ -0,0 +1,83 @@
+# search_results.py
+import base64
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.core_exceptions import InvalidRequestException
+from app.models.books import Page
+
+
+class SearchCursor:
+    """
+        Opaque keyset cursor for SearchService results.
+
+        A cursor is the sort key of the last match returned, plus the mode and a
+        fingerprint of the query and its parameters so it cannot be replayed
+        against a different search. The next page starts strictly after that
+        key, so no offset is skipped over and later pages cost the same as the first.
+    """
+
+    @staticmethod
+    def fingerprint(mode: str, *params) -> str:
+        material = json.dumps([mode, *params], ensure_ascii=False, default=str)
+        return hashlib.sha1(material.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def encode(mode: str, fingerprint: str, key: list) -> str:
+        payload = json.dumps({"m": mode, "f": fingerprint, "k": key}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode(cursor: Optional[str], mode: str, fingerprint: str) -> Optional[list]:
+        """Sort key stored in the cursor, or None for the first page"""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            mode_, fingerprint_, key = payload["m"], payload["f"], payload["k"]
+        except (ValueError, KeyError, TypeError):
+            raise InvalidRequestException("Invalid search cursor")
+        if mode_ != mode or fingerprint_ != fingerprint or not isinstance(key, list):
+            raise InvalidRequestException("Search cursor does not belong to this query")
+        return key
+
+
+def match_entry(page: Page, match_type: str, score: float, **fields) -> Dict:
+    """One search match in the shape shared by every mode"""
+    return {
+        'book_id': page.book.id,
+        'book_title': page.book.title,
+        'book_author': page.book.author,
+        'page_id': page.id,
+        'page_number': page.page_number,
+        'score': score,
+        'match_type': match_type,
+        **fields
+    }
+
+
+def result_page(mode: str, fingerprint: str, matches: List[Dict], next_key: Optional[list]) -> Dict:
+    return {
+        'mode': mode,
+        'matches': matches,
+        'count': len(matches),
+        'next_cursor': SearchCursor.encode(mode, fingerprint, next_key) if next_key is not None else None
+    }
+
+
+def paginate(keyed_matches: Iterable[Tuple[list, Dict]], limit: int) -> Tuple[List[Dict], Optional[list]]:
+    """
+        Take `limit` matches from a stream of (sort key, match) in rank order.
+        Returns the matches and the key to resume after, or None when the stream is exhausted.
+        The stream is consumed lazily, so matches past the page are never built.
+    """
+    matches = []
+    last_key = None
+    for key, match in keyed_matches:
+        if len(matches) == limit:
+            return matches, last_key
+        matches.append(match)
+        last_key = key
+    return matches, None
@@ -1,344 +1,581 @@
 # search_service.py
+from bisect import bisect_right
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
-from sentence_transformers import SentenceTransformer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+import numpy as np
 import re
-from app.models.books import Book, Page, Word  # ✅ Fixed import
+import time
+from app.config import settings
+from app.core.core_exceptions import InvalidRequestException
+from app.models.books import Book, Page, PagePosting, Word  # ✅ Fixed import
+from app.services.embedding_model import EmbeddingModelRegistry
+from app.services.fuzzy_index import get_fuzzy_index
+from app.services.marathi_text import line_offsets, query_terms
+from app.services.page_layout import words_in_range
+from app.services.search_cache import get_search_cache
+from app.services.search_results import SearchCursor, match_entry, paginate, result_page
+from app.services.text_chunker import chunk_text
+from app.services.text_index_service import TextIndexService
+from app.services.vector_index import chunk_hash, get_vector_index
+from app.services.word_box_codec import unpack_word_boxes
+
+logger = logging.getLogger(__name__)
 
 class SearchService:
+    # Characters of page text shown on each side of a semantic match
+    SEMANTIC_CONTEXT_CHARS = 200
+    
     def __init__(self, db: Session):
         self.db = db
-        self.semantic_model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
     
-    def _extract_context_lines(self, content: str, query: str, min_lines: int = 3) -> Dict:
-        """Extract context lines around the match"""
-        lines = content.split('\n')
-        matched_lines = []
-        
-        for i, line in enumerate(lines):
-            if query.lower() in line.lower():
-                # Get context around the match
-                start_idx = max(0, i - min_lines//2)
-                end_idx = min(len(lines), i + min_lines//2 + 1)
-                
-                # Ensure we have at least min_lines
-                if end_idx - start_idx < min_lines:
-                    if start_idx == 0:
-                        end_idx = min(len(lines), start_idx + min_lines)
-                    else:
-                        start_idx = max(0, end_idx - min_lines)
-                
-                context_lines = lines[start_idx:end_idx]
-                matched_lines.append({
-                    'line_number': i + 1,
-                    'matched_line': line,
-                    'context': '\n'.join(context_lines),
-                    'context_start': start_idx + 1,
-                    'context_end': end_idx
-                })
+    @staticmethod
+    def _line_context(page: Page, line_idx: int, before: int = 1, after: int = 1) -> Dict:
+        """Slice a line and its surrounding lines out of the page content by offset"""
+        content = page.content
+        offsets = page.line_offsets or line_offsets(content)
         
-        return matched_lines
+        def line_end(i: int) -> int:
+            return offsets[i + 1] - 1 if i + 1 < len(offsets) else len(content)
+        
+        start_idx = max(0, line_idx - before)
+        end_idx = min(len(offsets), line_idx + after + 1)
+        return {
+            'line_start': offsets[line_idx],
+            'matched_line': content[offsets[line_idx]:line_end(line_idx)],
+            'context': content[offsets[start_idx]:line_end(end_idx - 1)],
+            'context_start': start_idx + 1,
+            'context_end': end_idx
+        }
     
-    def exact_search(self, query: str, book_id: Optional[int] = None, limit: int = 50) -> List[Dict]:
-        """1. Enhanced exact text search with context"""
-        query_filter = self.db.query(Page).filter(Page.content.contains(query))
-        
-        if book_id:
-            query_filter = query_filter.filter(Page.book_id == book_id)
-        
-        # Join with Book to get book details
-        query_filter = query_filter.join(Book).limit(limit)
-        results = query_filter.all()
-        
-        enhanced_results = []
-        books_found = {}  # Track books and their matches
-        
-        for result in results:
-            book_key = f"{result.book.id}-{result.book.title}"
-            if book_key not in books_found:
-                books_found[book_key] = {
-                    'book_id': result.book.id,
-                    'book_title': result.book.title,
-                    'book_author': result.book.author,
-                    'total_pages': result.book.total_pages,
-                    'matches': []
-                }
-            
-            # Extract context lines
-            context_matches = self._extract_context_lines(result.content, query)
-            
-            for match in context_matches:
-                books_found[book_key]['matches'].append({
-                    'page_number': result.page_number,
-                    'line_number': match['line_number'],
-                    'matched_line': match['matched_line'],
-                    'context': match['context'],
-                    'context_range': f"Lines {match['context_start']}-{match['context_end']}",
-                    'confidence_score': result.confidence_score,
-                    'match_type': 'exact'
-                })
+    def _load_pages(self, page_ids) -> Dict[int, Page]:
+        return {
+            page.id: page
+            for page in self.db.query(Page).join(Book).filter(Page.id.in_(page_ids)).all()
+        }
+    
+    def _keyed_line_matches(self, hits: List[Dict], after: Optional[list],
+                            build: Callable[[Page, Dict], Iterator[Tuple[int, Dict]]]) -> Iterator[Tuple[list, Dict]]:
+        """(sort key, match) for every matched line of the ranked page hits, resuming after `after`
+
+        The sort key is the page's rank key from the text index followed by the line index,
+        so matches are ordered globally by relevance and then in reading order.
+        """
+        pages = self._load_pages([hit['page_id'] for hit in hits])
+        for hit in hits:
+            page = pages.get(hit['page_id'])
+            if page is None:
+                continue
+            for line_idx, match in build(page, hit):
+                key = hit['rank_key'] + [line_idx]
+                if after is not None and key <= after:
+                    continue
+                yield key, match
+    
+    @staticmethod
+    def _page_window(limit: int) -> int:
+        # One extra page for the peeked match, one for a cursor page without lines left
+        return limit + 2
+    
+    # -------------------- Cached entry points -------------------- #
+    
+    def _cached(self, mode: str, query: str, book_id: Optional[int], compute: Callable[[], Dict], **params) -> Dict:
+        """Serve a result page from the search result cache, computing it on a miss"""
+        cache = get_search_cache()
+        if cache is None:
+            return compute()
+        return cache.get_or_compute(cache.key(mode, query, book_id, **params), compute)
+    
+    def exact_search(self, query: str, book_id: Optional[int] = None, limit: int = 50,
+                     cursor: Optional[str] = None) -> Dict:
+        return self._cached('exact', ' '.join(query_terms(query)), book_id,
+                            lambda: self._exact_search(query, book_id, limit, cursor),
+                            limit=limit, cursor=cursor)
+    
+    def fuzzy_search(self, query: str, book_id: Optional[int] = None, threshold: float = 0.7, limit: int = 50,
+                     cursor: Optional[str] = None) -> Dict:
+        return self._cached('fuzzy', ' '.join(query_terms(query)), book_id,
+                            lambda: self._fuzzy_search(query, book_id, threshold, limit, cursor),
+                            threshold=threshold, limit=limit, cursor=cursor)
+    
+    def phrase_search(self, phrase: str, book_id: Optional[int] = None, limit: int = 50,
+                      cursor: Optional[str] = None) -> Dict:
+        return self._cached('phrase', ' '.join(query_terms(phrase)), book_id,
+                            lambda: self._phrase_search(phrase, book_id, limit, cursor),
+                            limit=limit, cursor=cursor)
+    
+    def positional_search(self, query: str, book_id: Optional[int] = None, limit: int = 50,
+                          cursor: Optional[str] = None) -> Dict:
+        return self._cached('positional', ' '.join(sorted(set(query_terms(query)))), book_id,
+                            lambda: self._positional_search(query, book_id, limit, cursor),
+                            limit=limit, cursor=cursor)
+    
+    def semantic_search(self, query: str, book_id: Optional[int] = None, top_k: int = 20, min_similarity: float = 0.3,
+                        query_embedding: Optional[np.ndarray] = None, cursor: Optional[str] = None) -> Dict:
+        def compute():
+            return self._semantic_search(query, book_id, top_k, min_similarity, query_embedding, cursor)
         
-        # Convert to list format with book grouping
-        for book_data in books_found.values():
-            enhanced_results.append(book_data)
+        return self._cached('semantic', ' '.join(query.split()), book_id, compute,
+                            top_k=top_k, min_similarity=min_similarity, cursor=cursor)
+    
+    # -------------------- Streaming -------------------- #
+    
+    # Keyset batch sizes while streaming: small first so the first hits go out at once
+    STREAM_FIRST_BATCH = 10
+    STREAM_MAX_BATCH = 200
+    
+    def _mode_page(self, mode: str, query: str, book_id: Optional[int], limit: int, cursor: Optional[str],
+                   threshold: float, min_similarity: float, query_embedding: Optional[np.ndarray]) -> Dict:
+        if mode == 'exact':
+            return self._exact_search(query, book_id, limit, cursor)
+        if mode == 'phrase':
+            return self._phrase_search(query, book_id, limit, cursor)
+        if mode == 'fuzzy':
+            return self._fuzzy_search(query, book_id, threshold, limit, cursor)
+        if mode == 'positional':
+            return self._positional_search(query, book_id, limit, cursor)
+        if mode == 'semantic':
+            return self._semantic_search(query, book_id, limit, min_similarity, query_embedding, cursor)
+        raise InvalidRequestException(f"Unknown search mode: {mode}")
+    
+    def stream_matches(self, mode: str, query: str, book_id: Optional[int] = None, max_results: int = 500,
+                       threshold: float = 0.7, min_similarity: float = 0.3,
+                       query_embedding: Optional[np.ndarray] = None) -> Iterator[Dict]:
+        """Matches of one mode in rank order, fetched in doubling keyset batches
         
-        return enhanced_results
+        Only one batch is held at a time and the cache is bypassed, so memory
+        stays flat however many matches the query has.
+        """
+        batch_size = self.STREAM_FIRST_BATCH
+        cursor = None
+        emitted = 0
+        while emitted < max_results:
+            page = self._mode_page(mode, query, book_id, min(batch_size, max_results - emitted), cursor,
+                                   threshold, min_similarity, query_embedding)
+            for match in page['matches']:
+                yield match
+            emitted += page['count']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+            batch_size = min(batch_size * 2, self.STREAM_MAX_BATCH)
+    
+    # -------------------- Search modes -------------------- #
     
-    def fuzzy_search(self, query: str, book_id: Optional[int] = None, threshold: float = 0.7, limit: int = 50) -> List[Dict]:
-        """2. Enhanced fuzzy/approximate search with context"""
-        from difflib import SequenceMatcher
+    def _exact_search(self, query: str, book_id: Optional[int] = None, limit: int = 50,
+                     cursor: Optional[str] = None) -> Dict:
+        """1. Enhanced exact text search with context
         
-        query_filter = self.db.query(Page).join(Book)
-        if book_id:
-            query_filter = query_filter.filter(Page.book_id == book_id)
-            
-        all_pages = query_filter.limit(limit * 2).all()  # Get more pages for fuzzy matching
-        books_found = {}
+        Pages containing every query term, ranked by BM25 from the inverted index,
+        one match per matched line. `cursor` is the `next_cursor` of the previous page.
+        """
+        terms = query_terms(query)
+        fingerprint = SearchCursor.fingerprint('exact', terms, book_id)
+        after = SearchCursor.decode(cursor, 'exact', fingerprint)
+        hits = TextIndexService.search(self.db, terms, book_id=book_id, limit=self._page_window(limit),
+                                       start=after[:-1] if after else None)
         
-        for page in all_pages:
-            lines = page.content.split('\n')
-            book_key = f"{page.book.id}-{page.book.title}"
-            
-            if book_key not in books_found:
-                books_found[book_key] = {
-                    'book_id': page.book.id,
-                    'book_title': page.book.title,
-                    'book_author': page.book.author,
-                    'total_pages': page.book.total_pages,
-                    'matches': []
-                }
-            
-            for line_idx, line in enumerate(lines):
-                words = line.split()
-                for word in words:
-                    similarity = SequenceMatcher(None, query.lower(), word.lower()).ratio()
-                    if similarity >= threshold:
-                        # Get context around this line
-                        start_idx = max(0, line_idx - 1)
-                        end_idx = min(len(lines), line_idx + 3)  # At least 3 lines
-                        context_lines = lines[start_idx:end_idx]
-                        
-                        books_found[book_key]['matches'].append({
-                            'page_number': page.page_number,
-                            'line_number': line_idx + 1,
-                            'matched_line': line,
-                            'matched_word': word,
-                            'similarity': similarity,
-                            'context': '\n'.join(context_lines),
-                            'context_range': f"Lines {start_idx + 1}-{end_idx}",
-                            'confidence_score': page.confidence_score,
-                            'match_type': 'fuzzy'
-                        })
-                        break  # One match per line is enough
-        
-        # Sort by similarity and limit results
-        enhanced_results = []
-        for book_data in books_found.values():
-            # Sort matches by similarity
-            book_data['matches'].sort(key=lambda x: x['similarity'], reverse=True)
-            # Limit matches per book
-            book_data['matches'] = book_data['matches'][:10]
-            enhanced_results.append(book_data)
-        
-        return enhanced_results
+        def build(page: Page, hit: Dict):
+            # One match per line, context comes straight from the line offsets
+            for line_idx in sorted({span[0] for span in hit['spans']}):
+                context = self._line_context(page, line_idx)
+                yield line_idx, match_entry(
+                    page, 'exact', hit['score'],
+                    line_number=line_idx + 1,
+                    matched_line=context['matched_line'],
+                    context=context['context'],
+                    context_range=f"Lines {context['context_start']}-{context['context_end']}",
+                    confidence_score=page.confidence_score
+                )
+        
+        matches, next_key = paginate(self._keyed_line_matches(hits, after, build), limit)
+        return result_page('exact', fingerprint, matches, next_key)
     
-    def phrase_search(self, phrase: str, book_id: Optional[int] = None, limit: int = 50) -> List[Dict]:
-        """3. Enhanced phrase search with context"""
-        query_filter = self.db.query(Page).join(Book).filter(Page.content.ilike(f'%{phrase}%'))
+    def _fuzzy_search(self, query: str, book_id: Optional[int] = None, threshold: float = 0.7, limit: int = 50,
+                     cursor: Optional[str] = None) -> Dict:
+        """2. Enhanced fuzzy/approximate search with context
         
-        if book_id:
-            query_filter = query_filter.filter(Page.book_id == book_id)
-            
-        results = query_filter.limit(limit).all()
-        books_found = {}
-        
-        for result in results:
-            book_key = f"{result.book.id}-{result.book.title}"
-            if book_key not in books_found:
-                books_found[book_key] = {
-                    'book_id': result.book.id,
-                    'book_title': result.book.title,
-                    'book_author': result.book.author,
-                    'total_pages': result.book.total_pages,
-                    'matches': []
-                }
+        Every query term is expanded to similar OCR terms through the trigram
+        vocabulary index, and the expansions are resolved to pages via the postings,
+        so the whole corpus is searched. `cursor` is the `next_cursor` of the previous page.
+        """
+        terms = query_terms(query)
+        fingerprint = SearchCursor.fingerprint('fuzzy', terms, book_id, threshold)
+        after = SearchCursor.decode(cursor, 'fuzzy', fingerprint)
+        if not terms:
+            return result_page('fuzzy', fingerprint, [], None)
+        
+        fuzzy_index = get_fuzzy_index()
+        fuzzy_index.refresh(self.db)
+        expansions = {
+            term: dict(fuzzy_index.expand(term, threshold, settings.fuzzy_max_expansions))
+            for term in set(terms)
+        }
+        
+        hits = TextIndexService.fuzzy_search(self.db, expansions, book_id=book_id, limit=self._page_window(limit),
+                                             start=after[:-1] if after else None)
+        
+        def build(page: Page, hit: Dict):
+            # One match per line is enough: keep the most similar word of each line
+            best_by_line = {}
+            for line_idx, char_start, char_end, similarity in hit['spans']:
+                if similarity > best_by_line.get(line_idx, (0.0,))[0]:
+                    best_by_line[line_idx] = (similarity, char_start, char_end)
             
-            # Find all occurrences of the phrase in the page
-            lines = result.content.split('\n')
-            for line_idx, line in enumerate(lines):
-                if phrase.lower() in line.lower():
-                    # Get extended context (at least 3 lines)
-                    start_idx = max(0, line_idx - 1)
-                    end_idx = min(len(lines), line_idx + 3)
-                    context_lines = lines[start_idx:end_idx]
-                    
-                    # Highlight the phrase in the matched line
-                    highlighted_line = line.replace(phrase, f"**{phrase}**")
-                    
-                    books_found[book_key]['matches'].append({
-                        'page_number': result.page_number,
-                        'line_number': line_idx + 1,
-                        'matched_line': highlighted_line,
-                        'phrase': phrase,
-                        'context': '\n'.join(context_lines),
-                        'context_range': f"Lines {start_idx + 1}-{end_idx}",
-                        'confidence_score': result.confidence_score,
-                        'match_type': 'phrase'
-                    })
-        
-        enhanced_results = []
-        for book_data in books_found.values():
-            enhanced_results.append(book_data)
-        
-        return enhanced_results
+            for line_idx, (similarity, char_start, char_end) in sorted(best_by_line.items()):
+                # Get context around this line (at least 3 lines)
+                context = self._line_context(page, line_idx, before=1, after=2)
+                yield line_idx, match_entry(
+                    page, 'fuzzy', hit['score'],
+                    line_number=line_idx + 1,
+                    matched_line=context['matched_line'],
+                    matched_word=page.content[char_start:char_end],
+                    similarity=similarity,
+                    context=context['context'],
+                    context_range=f"Lines {context['context_start']}-{context['context_end']}",
+                    confidence_score=page.confidence_score
+                )
+        
+        matches, next_key = paginate(self._keyed_line_matches(hits, after, build), limit)
+        return result_page('fuzzy', fingerprint, matches, next_key)
     
-    def positional_search(self, query: str, book_id: Optional[int] = None, limit: int = 50) -> List[Dict]:
-        """4. Enhanced positional search with context"""
-        words_query = self.db.query(Word).filter(Word.word.ilike(f'%{query}%')).join(Page).join(Book)
+    def _phrase_search(self, phrase: str, book_id: Optional[int] = None, limit: int = 50,
+                      cursor: Optional[str] = None) -> Dict:
+        """3. Enhanced phrase search with context
         
-        if book_id:
-            words_query = words_query.filter(Page.book_id == book_id)
-            
-        word_results = words_query.limit(limit).all()
-        books_found = {}
-        
-        for word in word_results:
-            book_key = f"{word.page.book.id}-{word.page.book.title}"
-            if book_key not in books_found:
-                books_found[book_key] = {
-                    'book_id': word.page.book.id,
-                    'book_title': word.page.book.title,
-                    'book_author': word.page.book.author,
-                    'total_pages': word.page.book.total_pages,
-                    'matches': []
-                }
-            
-            # Get surrounding context from the page
-            page_lines = word.page.content.split('\n')
-            word_line = None
-            line_idx = 0
-            
-            # Find which line contains this word
-            for i, line in enumerate(page_lines):
-                if word.word in line:
-                    word_line = line
-                    line_idx = i
-                    break
+        Uses the positional postings so the phrase terms must be consecutive tokens.
+        `cursor` is the `next_cursor` of the previous page.
+        """
+        terms = query_terms(phrase)
+        fingerprint = SearchCursor.fingerprint('phrase', terms, book_id)
+        after = SearchCursor.decode(cursor, 'phrase', fingerprint)
+        hits = TextIndexService.search(self.db, terms, book_id=book_id, phrase=True,
+                                       limit=self._page_window(limit), start=after[:-1] if after else None)
+        
+        def build(page: Page, hit: Dict):
+            spans_by_line = {}
+            for line_idx, char_start, char_end in hit['spans']:
+                spans_by_line.setdefault(line_idx, []).append((char_start, char_end))
             
-            if word_line:
-                # Get context around the word
-                start_idx = max(0, line_idx - 1)
-                end_idx = min(len(page_lines), line_idx + 3)
-                context_lines = page_lines[start_idx:end_idx]
+            for line_idx, spans in sorted(spans_by_line.items()):
+                # Get extended context (at least 3 lines)
+                context = self._line_context(page, line_idx, before=1, after=2)
                 
-                books_found[book_key]['matches'].append({
-                    'page_number': word.page.page_number,
-                    'line_number': line_idx + 1,
-                    'matched_word': word.word,
-                    'matched_line': word_line,
-                    'position': {'x': word.x_position, 'y': word.y_position},
-                    'dimensions': {'width': word.width, 'height': word.height},
-                    'confidence': word.confidence,
-                    'context': '\n'.join(context_lines),
-                    'context_range': f"Lines {start_idx + 1}-{end_idx}",
-                    'match_type': 'positional'
+                # Highlight every occurrence of the phrase in the matched line
+                line = context['matched_line']
+                line_start = context['line_start']
+                highlighted_line = ''
+                position = 0
+                for char_start, char_end in spans:
+                    char_start -= line_start
+                    if char_start < position:
+                        # Overlapping occurrence, already highlighted
+                        continue
+                    char_end = min(char_end - line_start, len(line))
+                    highlighted_line += line[position:char_start] + f"**{line[char_start:char_end]}**"
+                    position = char_end
+                highlighted_line += line[position:]
+                
+                yield line_idx, match_entry(
+                    page, 'phrase', hit['score'],
+                    line_number=line_idx + 1,
+                    matched_line=highlighted_line,
+                    phrase=phrase,
+                    context=context['context'],
+                    context_range=f"Lines {context['context_start']}-{context['context_end']}",
+                    confidence_score=page.confidence_score
+                )
+        
+        matches, next_key = paginate(self._keyed_line_matches(hits, after, build), limit)
+        return result_page('phrase', fingerprint, matches, next_key)
+    
+    def _load_word_boxes(self, pages: List[Page]) -> Dict[int, List[Dict]]:
+        """Word boxes per page, from the packed page blob or, for row storage, the words table"""
+        boxes = {}
+        row_page_ids = []
+        for page in pages:
+            if page.word_boxes is not None:
+                boxes[page.id] = unpack_word_boxes(page.word_boxes, page.word_tokens or [])
+            else:
+                row_page_ids.append(page.id)
+                boxes[page.id] = []
+        
+        if row_page_ids:
+            for word in self.db.query(Word).filter(Word.page_id.in_(row_page_ids)).order_by(Word.id).all():
+                boxes[word.page_id].append({
+                    'word': word.word,
+                    'x_position': word.x_position,
+                    'y_position': word.y_position,
+                    'width': word.width,
+                    'height': word.height,
+                    'confidence': word.confidence
                 })
+        return boxes
+    
+    def _positional_search(self, query: str, book_id: Optional[int] = None, limit: int = 50,
+                          cursor: Optional[str] = None) -> Dict:
+        """4. Enhanced positional search with context
+        
+        Candidate pages come from the token -> page postings, so the `words`
+        table is never scanned and packed word storage is served the same way.
+        Every posting is tied to its word box through the page layout: the
+        posting's character offset falls inside one layout word, whose box is
+        the stored one with the same coordinates. Words at or below
+        MIN_WORD_CONFIDENCE have no stored box and are not matches. Pages
+        without a layout (OCR'd before layouts were kept) match without a box.
         
-        enhanced_results = []
-        for book_data in books_found.values():
-            # Sort by confidence
-            book_data['matches'].sort(key=lambda x: x['confidence'], reverse=True)
-            enhanced_results.append(book_data)
+        Matches are in reading order (page, then token); `score` is the OCR
+        confidence of the box scaled to 0-1.
+        """
+        terms = set(query_terms(query))
+        fingerprint = SearchCursor.fingerprint('positional', sorted(terms), book_id)
+        after = SearchCursor.decode(cursor, 'positional', fingerprint)
+        if not terms:
+            return result_page('positional', fingerprint, [], None)
         
-        return enhanced_results
+        window = self._page_window(limit)
+        
+        def candidate_pages() -> Iterator[List[int]]:
+            """Ids of pages with a posting for any term, in id order, a window at a time"""
+            last_page_id = None
+            while True:
+                postings_query = self.db.query(PagePosting.page_id).filter(PagePosting.term.in_(terms))
+                if book_id:
+                    postings_query = postings_query.filter(PagePosting.book_id == book_id)
+                if last_page_id is not None:
+                    postings_query = postings_query.filter(PagePosting.page_id > last_page_id)
+                elif after:
+                    postings_query = postings_query.filter(PagePosting.page_id >= after[0])
+                page_ids = [
+                    page_id for (page_id,) in
+                    postings_query.distinct().order_by(PagePosting.page_id).limit(window).all()
+                ]
+                if page_ids:
+                    yield page_ids
+                if len(page_ids) < window:
+                    return
+                last_page_id = page_ids[-1]
+        
+        def keyed_matches():
+            # A page can end up without matches (all its words below the confidence
+            # cut-off), so windows are fetched until the result page is full
+            for page_ids in candidate_pages():
+                spans_by_page = {page_id: [] for page_id in page_ids}
+                for page_id, positions in self.db.query(PagePosting.page_id, PagePosting.positions) \
+                        .filter(PagePosting.page_id.in_(page_ids), PagePosting.term.in_(terms)).all():
+                    spans_by_page[page_id].extend(positions)
+                
+                pages = self._load_pages(page_ids)
+                word_boxes = self._load_word_boxes(list(pages.values()))
+                for page_id in page_ids:
+                    page = pages.get(page_id)
+                    if page is None:
+                        continue
+                    for key, match in self._positional_matches(page, sorted(spans_by_page[page_id]),
+                                                               word_boxes[page_id]):
+                        if after is None or key > after:
+                            yield key, match
+        
+        matches, next_key = paginate(keyed_matches(), limit)
+        return result_page('positional', fingerprint, matches, next_key)
     
-    def semantic_search(self, query: str, book_id: Optional[int] = None, top_k: int = 20, min_similarity: float = 0.3) -> List[Dict]:
-        """5. Enhanced semantic search with context"""
-        query_filter = self.db.query(Page).join(Book)
-        if book_id:
-            query_filter = query_filter.filter(Page.book_id == book_id)
+    @classmethod
+    def _positional_matches(cls, page: Page, spans: List[list], boxes: List[Dict]) -> Iterator[Tuple[list, Dict]]:
+        """(sort key, match) of every posting span ([token, line, char_start, char_end]) of a page, in token order"""
+        words = [
+            word for block in (page.layout or {}).get('blocks', [])
+            for line in block['lines'] for word in line['words']
+        ]
+        word_starts = [word[0] for word in words]
+        # Stored boxes carry the OCR confidence; the layout has every word, stored or not
+        stored = {(box['x_position'], box['y_position'], box['width'], box['height']): box for box in boxes}
+        
+        seen_words = set()
+        for token_position, line_idx, char_start, char_end in spans:
+            box = None
+            if page.layout:
+                i = bisect_right(word_starts, char_start) - 1
+                if i < 0 or words[i][1] <= char_start or i in seen_words:
+                    # Not inside a word, or a second term of a word already matched
+                    continue
+                seen_words.add(i)
+                box = stored.get(tuple(words[i][2:]))
+                if box is None:
+                    continue
             
-        all_pages = query_filter.all()
-        
-        if not all_pages:
-            return []
-        
-        # Split pages into chunks for better semantic matching
-        page_chunks = []
-        page_metadata = []
-        
-        for page in all_pages:
-            lines = page.content.split('\n')
-            # Create overlapping chunks of 3-5 lines
-            for i in range(0, len(lines), 3):
-                chunk_lines = lines[i:i+5]  # 5 lines per chunk with overlap
-                if len(chunk_lines) >= 2:  # Minimum 2 lines
-                    chunk_text = '\n'.join(chunk_lines)
-                    page_chunks.append(chunk_text)
-                    page_metadata.append({
-                        'page': page,
-                        'chunk_start_line': i + 1,
-                        'chunk_end_line': min(i + 5, len(lines)),
-                        'chunk_lines': chunk_lines
-                    })
-        
-        if not page_chunks:
-            return []
-        
-        # Get embeddings
-        query_embedding = self.semantic_model.encode([query])
-        chunk_embeddings = self.semantic_model.encode(page_chunks)
-        
-        # Calculate similarities
-        from sklearn.metrics.pairwise import cosine_similarity
-        similarities = cosine_similarity(query_embedding, chunk_embeddings)[0]
-        
-        # Get top results
-        top_indices = similarities.argsort()[-top_k:][::-1]
-        
-        books_found = {}
-        for idx in top_indices:
-            similarity_score = similarities[idx]
-            if similarity_score > min_similarity:
-                metadata = page_metadata[idx]
-                page = metadata['page']
-                
-                book_key = f"{page.book.id}-{page.book.title}"
-                if book_key not in books_found:
-                    books_found[book_key] = {
-                        'book_id': page.book.id,
-                        'book_title': page.book.title,
-                        'book_author': page.book.author,
-                        'total_pages': page.book.total_pages,
-                        'matches': []
-                    }
-                
-                # Get extended context around the semantic match
-                all_lines = page.content.split('\n')
-                start_idx = max(0, metadata['chunk_start_line'] - 2)
-                end_idx = min(len(all_lines), metadata['chunk_end_line'] + 2)
-                extended_context = all_lines[start_idx:end_idx]
-                
-                books_found[book_key]['matches'].append({
+            context = cls._line_context(page, line_idx, before=1, after=2)
+            confidence = box['confidence'] if box else page.confidence_score
+            yield [page.id, token_position], match_entry(
+                page, 'positional', (confidence or 0) / 100,
+                line_number=line_idx + 1,
+                matched_word=box['word'] if box else page.content[char_start:char_end],
+                matched_line=context['matched_line'],
+                position={'x': box['x_position'], 'y': box['y_position']} if box else None,
+                dimensions={'width': box['width'], 'height': box['height']} if box else None,
+                confidence=box['confidence'] if box else None,
+                context=context['context'],
+                context_range=f"Lines {context['context_start']}-{context['context_end']}"
+            )
+    
+    @staticmethod
+    def _chunk_pages(pages: List[Page]) -> List[Dict]:
+        """Token-budgeted chunks of every page, see text_chunker.chunk_text
+        
+        Chunks fill the model's input (EMBEDDING_CHUNK_TOKENS) without being
+        truncated by it, and neighbours share EMBEDDING_CHUNK_OVERLAP_TOKENS.
+        """
+        budget = EmbeddingModelRegistry.chunk_token_budget()
+        contents = [page.content or '' for page in pages]
+        chunks = []
+        for page, content, offsets in zip(pages, contents, EmbeddingModelRegistry.token_offsets(contents)):
+            for chunk in chunk_text(content, offsets, budget, settings.embedding_chunk_overlap_tokens):
+                chunk.update({
+                    'page_id': page.id,
                     'page_number': page.page_number,
-                    'matched_chunk': page_chunks[idx],
-                    'context': '\n'.join(extended_context),
-                    'context_range': f"Lines {start_idx + 1}-{end_idx}",
-                    'similarity_score': float(similarity_score),
-                    'chunk_range': f"Lines {metadata['chunk_start_line']}-{metadata['chunk_end_line']}",
-                    'confidence_score': page.confidence_score,
-                    'match_type': 'semantic'
+                    'text_hash': chunk_hash(chunk['text'])
                 })
+                chunks.append(chunk)
+        return chunks
+    
+    def index_book(self, book_id: int) -> Dict:
+        """Embed all chunks of a book once and add them to the persistent vector index
+        
+        Identical chunk texts (running headers, GR boilerplate) are embedded once,
+        and texts already in the index, from this or any other book, reuse the stored
+        vector. The rest is encoded in length-sorted batches. Returns throughput stats.
+        """
+        start_time = time.perf_counter()
+        pages = self.db.query(Page).filter(Page.book_id == book_id).all()
+        chunks = self._chunk_pages(pages)
+        
+        stats = {'book_id': book_id, 'chunks': len(chunks), 'unique_chunks': 0, 'reused': 0, 'encoded': 0}
+        if chunks:
+            texts = {chunk['text_hash']: chunk['text'] for chunk in chunks}
+            vectors = get_vector_index().find_vectors(texts.keys())
+            missing = [text_hash for text_hash in texts if text_hash not in vectors]
+            if missing:
+                encoded = EmbeddingModelRegistry.encode_batched([texts[text_hash] for text_hash in missing])
+                vectors.update(zip(missing, encoded))
+            
+            embeddings = np.stack([vectors[chunk['text_hash']] for chunk in chunks])
+            get_vector_index().add_book(book_id, chunks, embeddings)
+            stats.update(unique_chunks=len(texts), reused=len(texts) - len(missing), encoded=len(missing))
+        
+        elapsed = time.perf_counter() - start_time
+        stats['seconds'] = round(elapsed, 3)
+        stats['chunks_per_second'] = round(len(chunks) / elapsed, 1) if elapsed > 0 else None
+        logger.info(
+            f"Embedded book {book_id}: {stats['chunks']} chunks, {stats['encoded']} encoded, "
+            f"{stats['reused']} reused, {stats['chunks_per_second']} chunks/s"
+        )
+        return stats
+    
+    @staticmethod
+    def remove_book_from_index(book_id: int):
+        get_vector_index().remove_book(book_id)
+    
+    @classmethod
+    def _semantic_match(cls, hit: Dict, page: Page) -> Dict:
+        content = page.content
+        fields = {}
+        # Slice the chunk and its surroundings straight out of the page by offset
+        start, end = hit['char_start'], hit['char_end']
+        matched_chunk = content[start:end]
+        offsets = page.line_offsets or line_offsets(content)
+        # The lines of the chunk plus one line on each side
+        before_idx = max(0, bisect_right(offsets, start) - 2)
+        after_idx = bisect_right(offsets, end - 1)
+        context_start = offsets[before_idx]
+        context_end = offsets[after_idx + 1] - 1 if after_idx + 1 < len(offsets) else len(content)
+        if (start - context_start > 2 * cls.SEMANTIC_CONTEXT_CHARS
+                or context_end - end > 2 * cls.SEMANTIC_CONTEXT_CHARS):
+            # Long lines (pages OCR'd before line breaks were kept): a character window instead
+            context_start = max(0, start - cls.SEMANTIC_CONTEXT_CHARS)
+            context_end = min(len(content), end + cls.SEMANTIC_CONTEXT_CHARS)
+            # Do not cut words at the edges of the context
+            if context_start > 0:
+                gap = re.search(r'\s', content[context_start:start])
+                if gap:
+                    context_start += gap.end()
+            if context_end < len(content):
+                tail = content[end:context_end]
+                gap = max(tail.rfind(' '), tail.rfind('\n'))
+                if gap != -1:
+                    context_end = end + gap
+        context = content[context_start:context_end]
+        first_line = bisect_right(offsets, context_start)
+        context_range = f"Lines {first_line}-{max(first_line, bisect_right(offsets, context_end - 1))}"
+        if page.layout:
+            fields['word_boxes'] = [
+                {'x': left, 'y': top, 'width': width, 'height': height}
+                for _, _, left, top, width, height in words_in_range(page.layout, start, end)
+            ]
+        
+        return match_entry(
+            page, 'semantic', hit['similarity'],
+            line_number=hit['chunk_start_line'],
+            matched_chunk=matched_chunk,
+            context=context,
+            context_range=context_range,
+            char_start=hit['char_start'],
+            char_end=hit['char_end'],
+            similarity_score=hit['similarity'],
+            chunk_range=f"Lines {hit['chunk_start_line']}-{hit['chunk_end_line']}",
+            confidence_score=page.confidence_score,
+            **fields
+        )
+    
+    def _semantic_search(self, query: str, book_id: Optional[int] = None, top_k: int = 20, min_similarity: float = 0.3,
+                        query_embedding: Optional[np.ndarray] = None, cursor: Optional[str] = None) -> Dict:
+        """5. Enhanced semantic search with context
+        
+        Returns `top_k` chunks per page of results, best similarity first.
+        Async callers should encode the query with `EmbeddingModelRegistry.encode_queries_async`
+        and pass it as `query_embedding` so the model never runs on the event loop.
+        """
+        fingerprint = SearchCursor.fingerprint('semantic', query.strip(), book_id, min_similarity)
+        after = SearchCursor.decode(cursor, 'semantic', fingerprint)
         
-        enhanced_results = []
-        for book_data in books_found.values():
-            # Sort by similarity score
-            book_data['matches'].sort(key=lambda x: x['similarity_score'], reverse=True)
-            # Limit matches per book to avoid overwhelming results
-            book_data['matches'] = book_data['matches'][:5]
-            enhanced_results.append(book_data)
+        # Only the query is embedded; chunk embeddings come from the persistent index
+        if query_embedding is None:
+            query_embedding = EmbeddingModelRegistry.encode_queries([query])[0]
+        hits = [
+            hit for hit in get_vector_index().search(query_embedding, top_k=top_k + 1, book_id=book_id, after=after)
+            if hit['similarity'] > min_similarity
+        ]
+        
+        # Load only the pages that actually matched
+        pages = self._load_pages({hit['page_id'] for hit in hits})
+        
+        def keyed_matches():
+            for hit in hits:
+                page = pages.get(hit['page_id'])
+                if page is None:
+                    # Page was deleted after it was indexed
+                    continue
+                yield get_vector_index().rank_key(hit), self._semantic_match(hit, page)
+        
+        matches, next_key = paginate(keyed_matches(), top_k)
+        return result_page('semantic', fingerprint, matches, next_key)
+    
+    def semantic_batch_search(self, queries: List[str], book_id: Optional[int] = None, top_k: int = 10,
+                              min_similarity: float = 0.3, query_embeddings: Optional[np.ndarray] = None) -> Dict:
+        """Semantic search for many queries in one call, first page of each
         
-        # Sort books by highest similarity score
-        enhanced_results.sort(key=lambda x: max(m['similarity_score'] for m in x['matches']), reverse=True)
+        Query embeddings come from the query cache, with all misses encoded in one
+        batch (async callers pass `query_embeddings` from `encode_queries_async`).
+        The index scores every query in one pass, and matched pages are loaded once.
+        """
+        if query_embeddings is None:
+            query_embeddings = EmbeddingModelRegistry.encode_queries(queries)
+        hit_lists = [
+            [hit for hit in hits if hit['similarity'] > min_similarity]
+            for hits in get_vector_index().search_batch(query_embeddings, top_k=top_k, book_id=book_id)
+        ]
+        pages = self._load_pages({hit['page_id'] for hits in hit_lists for hit in hits})
         
-        return enhanced_results
\ No newline at end of file
+        results = []
+        for query, hits in zip(queries, hit_lists):
+            matches = [self._semantic_match(hit, pages[hit['page_id']]) for hit in hits if hit['page_id'] in pages]
+            results.append({'query': query, 'matches': matches, 'count': len(matches)})
+        return {'mode': 'semantic_batch', 'results': results, 'count': len(results)}
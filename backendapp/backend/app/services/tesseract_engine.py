@@ -0,0 +1,94 @@
+# tesseract_engine.py
+import shlex
+import threading
+from typing import Dict, Tuple
+
+import pytesseract
+from PIL import Image
+from pytesseract.pytesseract import file_to_dict
+
+# "subprocess": pytesseract, "api": in-process libtesseract through tesserocr
+ENGINES = ('subprocess', 'api')
+
+# Header of Tesseract's TSV output; the C API returns the rows only
+TSV_HEADER = 'level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext\n'
+
+
+def parse_tesseract_config(config: str) -> Tuple[str, int, int, Dict[str, str]]:
+    """(lang, psm, oem, variables) of a tesseract command line config such as '--oem 3 --psm 6 -l mar+eng'"""
+    lang, psm, oem, variables = 'eng', 3, 3, {}
+    args = iter(shlex.split(config))
+    for arg in args:
+        if arg == '-l':
+            lang = next(args)
+        elif arg == '--psm':
+            psm = int(next(args))
+        elif arg == '--oem':
+            oem = int(next(args))
+        elif arg == '-c':
+            name, value = next(args).split('=', 1)
+            variables[name] = value
+    return lang, psm, oem, variables
+
+
+class SubprocessTesseract:
+    """
+        pytesseract: every call writes the image to a temp file and runs a
+        `tesseract` process, which loads the traineddata again.
+    """
+
+    def __init__(self, config: str):
+        self.config = config
+
+    def image_to_data(self, image: Image.Image) -> Dict:
+        return pytesseract.image_to_data(image, config=self.config, output_type=pytesseract.Output.DICT)
+
+
+class TesseractAPI:
+    """
+        libtesseract in this process (tesserocr). The traineddata is loaded
+        once per thread and the handle reused for every page; images are
+        passed in memory. A TessBaseAPI handle must not be shared between
+        threads, so each thread gets its own. OCR worker processes are
+        single threaded, so that is one handle per worker.
+
+        Output is Tesseract's own TSV, parsed as pytesseract parses it, so
+        it is interchangeable with SubprocessTesseract.
+    """
+
+    _local = threading.local()
+
+    def __init__(self, config: str):
+        self.lang, self.psm, self.oem, self.variables = parse_tesseract_config(config)
+        self._key = (self.lang, self.psm, self.oem, tuple(sorted(self.variables.items())))
+
+    def _api(self):
+        handles = getattr(self._local, 'handles', None)
+        if handles is None:
+            handles = self._local.handles = {}
+        api = handles.get(self._key)
+        if api is None:
+            import tesserocr
+
+            api = tesserocr.PyTessBaseAPI(lang=self.lang, psm=self.psm, oem=self.oem)
+            for name, value in self.variables.items():
+                api.SetVariable(name, value)
+            handles[self._key] = api
+        return api
+
+    def image_to_data(self, image: Image.Image) -> Dict:
+        api = self._api()
+        api.SetImage(image)
+        try:
+            # Recognizes the image and renders it like `tesseract ... tsv`
+            return file_to_dict(TSV_HEADER + api.GetTSVText(0), '\t', -1)
+        finally:
+            api.Clear()
+
+
+def create_tesseract_engine(engine: str, config: str):
+    if engine == 'api':
+        return TesseractAPI(config)
+    if engine == 'subprocess':
+        return SubprocessTesseract(config)
+    raise ValueError(f"Unknown OCR engine {engine!r}, expected one of {ENGINES}")
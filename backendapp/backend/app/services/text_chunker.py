@@ -0,0 +1,68 @@
+# text_chunker.py
+import re
+from bisect import bisect_right
+from typing import Dict, List, Sequence, Tuple
+
+from app.services.marathi_text import line_offsets
+
+# Fallback "tokens" when no model tokenizer is available
+_WHITESPACE_TOKEN = re.compile(r'\S+')
+
+
+def whitespace_token_offsets(text: str) -> List[Tuple[int, int]]:
+    return [match.span() for match in _WHITESPACE_TOKEN.finditer(text)]
+
+
+def chunk_spans(offsets: Sequence[Tuple[int, int]], max_tokens: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+        Token ranges [start, end) of at most `max_tokens` tokens covering every
+        token, consecutive ranges sharing about `overlap` tokens.
+
+        A range ends before the word that straddles the limit and starts at a
+        word start, unless the word alone is longer than half a range. A token
+        starts a word when there is a gap between it and the previous token.
+    """
+    n = len(offsets)
+    overlap = min(overlap, max_tokens // 2)
+    word_start = [k == 0 or offsets[k][0] > offsets[k - 1][1] for k in range(n)]
+
+    spans = []
+    start = 0
+    while start < n:
+        end = min(start + max_tokens, n)
+        if end < n and not word_start[end]:
+            cut = end - 1
+            while cut > start + max_tokens // 2 and not word_start[cut]:
+                cut -= 1
+            if word_start[cut] and cut > start:
+                end = cut
+        spans.append((start, end))
+        if end == n:
+            break
+
+        next_start = max(end - overlap, start + 1)
+        back = next_start
+        while back > start + 1 and not word_start[back]:
+            back -= 1
+        start = back if word_start[back] else next_start
+    return spans
+
+
+def chunk_text(text: str, offsets: Sequence[Tuple[int, int]], max_tokens: int, overlap: int) -> List[Dict]:
+    """
+        Chunks of `text` for embedding, from its tokenizer offsets.
+        Each chunk records its character range in `text` and the 1-based lines it spans.
+    """
+    lines = line_offsets(text)
+    chunks = []
+    for start, end in chunk_spans(offsets, max_tokens, overlap):
+        char_start, char_end = offsets[start][0], offsets[end - 1][1]
+        chunks.append({
+            'text': text[char_start:char_end],
+            'char_start': char_start,
+            'char_end': char_end,
+            'chunk_start_line': bisect_right(lines, char_start),
+            'chunk_end_line': bisect_right(lines, char_end - 1),
+            'tokens': end - start,
+        })
+    return chunks
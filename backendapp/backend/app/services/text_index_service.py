@@ -0,0 +1,325 @@
+# text_index_service.py
+import json
+import math
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.orm import Session
+
+from app.models.books import Page, PagePosting
+from app.services.marathi_text import line_offsets, tokenize
+from app.services.search_cache import get_ranking_cache
+
+# Matches PagePosting.term length
+MAX_TERM_LENGTH = 100
+
+
+class TextIndexService:
+    """
+        Positional inverted index over Page.content stored in `page_postings`.
+
+        Each (term, page) row keeps every occurrence as
+        [token_position, line_index, char_start, char_end], so exact and phrase
+        queries are answered from the postings alone and snippets are sliced
+        out of the page content by offset.
+
+        A query ranks every candidate page once: the corpus statistics and the
+        full ranked list of rank keys are kept in the ranking cache, whose keys
+        carry the generation bumped by invalidate_book. Later
+        result pages and stream batches of the same query only slice that list
+        and decode the positions of their own window.
+    """
+
+    # BM25 parameters
+    K1 = 1.2
+    B = 0.75
+
+    # -------------------- Indexing -------------------- #
+
+    @staticmethod
+    def analyze(content: str) -> Tuple[List[int], int, Dict[str, list]]:
+        """Tokenise page content into (line_offsets, word_count, positions by term)"""
+        offsets = line_offsets(content)
+        tokens = tokenize(content)
+
+        positions_by_term = defaultdict(list)
+        line_idx = 0
+        for position, (term, char_start, char_end) in enumerate(tokens):
+            while line_idx + 1 < len(offsets) and offsets[line_idx + 1] <= char_start:
+                line_idx += 1
+            positions_by_term[term[:MAX_TERM_LENGTH]].append([position, line_idx, char_start, char_end])
+
+        return offsets, len(tokens), positions_by_term
+
+    @staticmethod
+    def posting_rows(page_id: int, book_id: int, positions_by_term: Dict[str, list]) -> List[Dict]:
+        return [
+            {
+                'term': term,
+                'page_id': page_id,
+                'book_id': book_id,
+                'term_frequency': len(positions),
+                'positions': positions
+            }
+            for term, positions in positions_by_term.items()
+        ]
+
+    @staticmethod
+    def build_postings(page: Page) -> List[Dict]:
+        """Tokenise a page, fill its line offsets / word count and return posting rows"""
+        offsets, word_count, positions_by_term = TextIndexService.analyze(page.content)
+        page.line_offsets = offsets
+        page.word_count = word_count
+        return TextIndexService.posting_rows(page.id, page.book_id, positions_by_term)
+
+    @staticmethod
+    def index_pages(db: Session, pages: List[Page]):
+        """Add postings for already flushed pages. The caller commits."""
+        rows = []
+        for page in pages:
+            rows.extend(TextIndexService.build_postings(page))
+        if rows:
+            db.execute(insert(PagePosting), rows)
+
+    @staticmethod
+    def reindex_book(db: Session, book_id: int):
+        """Rebuild the postings of one book, e.g. for books ingested before the index existed"""
+        db.execute(delete(PagePosting).where(PagePosting.book_id == book_id))
+        pages = db.query(Page).filter(Page.book_id == book_id).all()
+        TextIndexService.index_pages(db, pages)
+        db.commit()
+
+    # -------------------- Querying -------------------- #
+
+    @staticmethod
+    def _load_postings(db: Session, terms: List[str], book_id: Optional[int], column=PagePosting.positions,
+                       page_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, object]]:
+        """page_id -> term -> `column` (positions or term frequency), only for pages containing every term"""
+        query = db.query(PagePosting.page_id, PagePosting.term, column) \
+            .filter(PagePosting.term.in_(set(terms)))
+        if book_id:
+            query = query.filter(PagePosting.book_id == book_id)
+        if page_ids is not None:
+            query = query.filter(PagePosting.page_id.in_(page_ids))
+
+        by_page = defaultdict(dict)
+        for page_id, term, value in query.all():
+            by_page[page_id][term] = value
+
+        required = set(terms)
+        return {page_id: postings for page_id, postings in by_page.items() if required <= postings.keys()}
+
+    @staticmethod
+    def _cached(kind: str, query: str, book_id: Optional[int], compute: Callable[[], Dict]) -> Dict:
+        """`compute()` through the ranking cache, when it is enabled"""
+        cache = get_ranking_cache()
+        if cache is None:
+            return compute()
+        return cache.get_or_compute(cache.key(kind, query, book_id), compute)
+
+    @staticmethod
+    def _corpus_stats(db: Session) -> Dict:
+        """Page count and mean page length of the whole corpus, for BM25"""
+        def compute():
+            return {
+                'total_pages': db.query(func.count(Page.id)).scalar() or 1,
+                'avg_length': float(db.query(func.avg(Page.word_count)).scalar() or 1.0)
+            }
+
+        return TextIndexService._cached('bm25:corpus', '', None, compute)
+
+    @staticmethod
+    def _bm25_scores(db: Session, terms: List[str], frequencies: Dict[int, Dict[str, int]]) -> Dict[int, float]:
+        """BM25 of every candidate page from its term frequencies"""
+        stats = TextIndexService._corpus_stats(db)
+        total_pages, avg_length = stats['total_pages'], stats['avg_length']
+        doc_freq = dict(
+            db.query(PagePosting.term, func.count(PagePosting.id))
+            .filter(PagePosting.term.in_(set(terms)))
+            .group_by(PagePosting.term)
+            .all()
+        )
+        page_lengths = dict(
+            db.query(Page.id, Page.word_count).filter(Page.id.in_(frequencies.keys())).all()
+        )
+
+        scores = {}
+        for page_id, term_frequencies in frequencies.items():
+            length = page_lengths.get(page_id) or avg_length
+            score = 0.0
+            for term in set(terms):
+                tf = term_frequencies[term]
+                df = doc_freq.get(term, 0)
+                idf = math.log(1 + (total_pages - df + 0.5) / (df + 0.5))
+                norm = TextIndexService.K1 * (1 - TextIndexService.B + TextIndexService.B * length / avg_length)
+                score += idf * tf * (TextIndexService.K1 + 1) / (tf + norm)
+            scores[page_id] = score
+        return scores
+
+    @staticmethod
+    def _ranked_range(rank_keys: List[list], start: Optional[list], limit: int) -> List[list]:
+        """
+            Keyset window over rank keys sorted ascending (page id last), beginning at `start`
+            inclusive. Only these `limit` pages are handed on for position decoding.
+        """
+        begin = bisect_left(rank_keys, list(start)) if start is not None else 0
+        return rank_keys[begin:begin + limit]
+
+    @staticmethod
+    def _phrase_spans(terms: List[str], postings: Dict[str, list]) -> List[Tuple[int, int, int]]:
+        """(line_index, char_start, char_end) of every occurrence of terms as consecutive tokens"""
+        following = [
+            {entry[0]: entry for entry in postings[term]}
+            for term in terms[1:]
+        ]
+        spans = []
+        for first in postings[terms[0]]:
+            last = first
+            for offset, positions in enumerate(following, start=1):
+                last = positions.get(first[0] + offset)
+                if last is None:
+                    break
+            else:
+                spans.append((first[1], first[2], last[3]))
+        return spans
+
+    @staticmethod
+    def fuzzy_search(db: Session, expansions: Dict[str, Dict[str, float]], book_id: Optional[int] = None,
+                     limit: int = 50, start: Optional[list] = None) -> List[Dict]:
+        """
+            Ranked page hits for fuzzy-expanded query terms.
+            `expansions` maps every query term to {vocabulary term: similarity}; a page must
+            contain an expansion of every query term and scores the sum of the best similarities.
+            Only term frequencies are read for ranking, positions only for the returned pages.
+            Pages are ordered by rank key (-score, -frequency, page_id) from `start` inclusive.
+            Returns [{'page_id', 'score', 'rank_key', 'spans': [(line_index, char_start, char_end, similarity), ...]}]
+        """
+        similarity = {}
+        for query_term, candidates in expansions.items():
+            for term, term_similarity in candidates.items():
+                similarity[term] = max(similarity.get(term, 0.0), term_similarity)
+        if not similarity or not all(expansions.values()):
+            return []
+
+        def rank():
+            query = db.query(PagePosting.page_id, PagePosting.term, PagePosting.term_frequency) \
+                .filter(PagePosting.term.in_(similarity.keys()))
+            if book_id:
+                query = query.filter(PagePosting.book_id == book_id)
+
+            best = defaultdict(dict)
+            frequency = defaultdict(int)
+            for page_id, term, term_frequency in query.all():
+                frequency[page_id] += term_frequency
+                for query_term, candidates in expansions.items():
+                    if term in candidates:
+                        best[page_id][query_term] = max(best[page_id].get(query_term, 0.0), candidates[term])
+
+            return {'rank_keys': sorted(
+                [-sum(matched.values()), -frequency[page_id], page_id]
+                for page_id, matched in best.items()
+                if len(matched) == len(expansions)
+            )}
+
+        expansions_key = json.dumps(sorted((term, sorted(candidates)) for term, candidates in expansions.items()),
+                                    ensure_ascii=False)
+        window = TextIndexService._ranked_range(
+            TextIndexService._cached('ranked:fuzzy', expansions_key, book_id, rank)['rank_keys'], start, limit
+        )
+        if not window:
+            return []
+
+        ranked = [rank_key[-1] for rank_key in window]
+        spans_by_page = defaultdict(list)
+        for page_id, term, positions in db.query(PagePosting.page_id, PagePosting.term, PagePosting.positions) \
+                .filter(PagePosting.page_id.in_(ranked), PagePosting.term.in_(similarity.keys())).all():
+            spans_by_page[page_id].extend(
+                (entry[1], entry[2], entry[3], similarity[term]) for entry in positions
+            )
+
+        return [
+            {
+                'page_id': rank_key[-1],
+                'score': -rank_key[0],
+                'rank_key': rank_key,
+                'spans': sorted(spans_by_page[rank_key[-1]])
+            }
+            for rank_key in window
+        ]
+
+    @staticmethod
+    def search(db: Session, terms: List[str], book_id: Optional[int] = None, phrase: bool = False,
+               limit: int = 50, start: Optional[list] = None) -> List[Dict]:
+        """
+            Ranked page hits for the query terms.
+            Every term must occur on the page; with `phrase` they must occur consecutively.
+            Pages are ordered by rank key (-score, page_id) from `start` inclusive.
+            Without `phrase` only term frequencies are read for ranking, and positions
+            are decoded for the returned pages alone.
+            Returns [{'page_id', 'score', 'rank_key', 'spans': [(line_index, char_start, char_end), ...]}]
+        """
+        terms = [term[:MAX_TERM_LENGTH] for term in terms]
+        if not terms:
+            return []
+
+        def rank():
+            if phrase:
+                # Consecutiveness can only be checked on the positions of every candidate
+                candidates = TextIndexService._load_postings(db, terms, book_id)
+                occurrences = {}
+                for page_id, postings in candidates.items():
+                    spans = TextIndexService._phrase_spans(terms, postings)
+                    if spans:
+                        occurrences[page_id] = len(spans)
+                frequencies = {
+                    page_id: {term: len(positions) for term, positions in candidates[page_id].items()}
+                    for page_id in occurrences
+                }
+            else:
+                frequencies = TextIndexService._load_postings(db, terms, book_id, column=PagePosting.term_frequency)
+
+            if not frequencies:
+                return {'rank_keys': []}
+
+            scores = TextIndexService._bm25_scores(db, terms, frequencies)
+            if phrase:
+                # Pages repeating the exact phrase rank above pages that only share the terms
+                for page_id, count in occurrences.items():
+                    scores[page_id] += math.log1p(count)
+            return {'rank_keys': sorted([-score, page_id] for page_id, score in scores.items())}
+
+        window = TextIndexService._ranked_range(
+            TextIndexService._cached('ranked:phrase' if phrase else 'ranked:exact', ' '.join(terms), book_id,
+                                     rank)['rank_keys'],
+            start, limit
+        )
+        if not window:
+            return []
+
+        ranked = [rank_key[-1] for rank_key in window]
+        postings = TextIndexService._load_postings(db, terms, book_id, page_ids=ranked)
+        if phrase:
+            spans_by_page = {
+                page_id: TextIndexService._phrase_spans(terms, postings[page_id]) if page_id in postings else []
+                for page_id in ranked
+            }
+        else:
+            spans_by_page = {
+                page_id: sorted(
+                    (entry[1], entry[2], entry[3])
+                    for term in set(terms) for entry in postings.get(page_id, {}).get(term, ())
+                )
+                for page_id in ranked
+            }
+
+        return [
+            {
+                'page_id': rank_key[-1],
+                'score': -rank_key[0],
+                'rank_key': rank_key,
+                'spans': spans_by_page[rank_key[-1]]
+            }
+            for rank_key in window
+        ]
@@ -0,0 +1,143 @@
+# unified_search_service.py
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import SessionLocal, settings
+from app.services.embedding_model import EmbeddingModelRegistry
+from app.services.search_service import SearchService
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = ('exact', 'phrase', 'fuzzy', 'positional', 'semantic')
+DEFAULT_MODES = ('exact', 'phrase', 'fuzzy', 'semantic')
+
+
+class UnifiedSearchService:
+    """
+        One search request fanned out over several SearchService modes.
+
+        DB-bound modes run concurrently in the threadpool, each with its own
+        session; semantic encodes the query on the embedding model executor
+        first. Every mode has a time budget: a mode that overruns is reported
+        as timed out and left out of the ranking instead of stalling the
+        response. Rankings are merged per page with reciprocal rank fusion,
+        so a page found by several modes appears once, ranked above pages
+        found by only one.
+    """
+
+    # Standard RRF constant; dampens the weight of the very top ranks
+    RRF_K = 60
+
+    @staticmethod
+    def _run_mode(mode: str, query: str, book_id: Optional[int], depth: int, threshold: float,
+                  min_similarity: float, query_embedding=None) -> Dict:
+        """Worker thread entry point: run one mode on a private session"""
+        db = SessionLocal()
+        try:
+            service = SearchService(db)
+            if mode == 'exact':
+                return service.exact_search(query, book_id, depth)
+            if mode == 'phrase':
+                return service.phrase_search(query, book_id, depth)
+            if mode == 'fuzzy':
+                return service.fuzzy_search(query, book_id, threshold, depth)
+            if mode == 'positional':
+                return service.positional_search(query, book_id, depth)
+            return service.semantic_search(query, book_id, depth, min_similarity, query_embedding)
+        finally:
+            db.close()
+
+    @classmethod
+    async def _timed_mode(cls, mode: str, query: str, book_id: Optional[int], depth: int, threshold: float,
+                          min_similarity: float) -> Dict:
+        start_time = time.perf_counter()
+        if mode == 'semantic':
+            budget = settings.search_semantic_budget_ms / 1000
+        else:
+            budget = settings.search_mode_budget_ms / 1000
+
+        async def run():
+            query_embedding = None
+            if mode == 'semantic':
+                query_embedding = (await EmbeddingModelRegistry.encode_queries_async([query]))[0]
+            return await run_in_threadpool(
+                cls._run_mode, mode, query, book_id, depth, threshold, min_similarity, query_embedding
+            )
+
+        try:
+            # The worker thread cannot be interrupted; it finishes in the background
+            result = await asyncio.wait_for(run(), timeout=budget)
+            status, matches = 'ok', result['matches']
+        except asyncio.TimeoutError:
+            status, matches = 'timeout', []
+        except Exception:
+            logger.exception(f"Search mode {mode} failed for query {query!r}")
+            status, matches = 'error', []
+
+        return {
+            'mode': mode,
+            'status': status,
+            'count': len(matches),
+            'elapsed_ms': round((time.perf_counter() - start_time) * 1000, 1),
+            'matches': matches
+        }
+
+    @classmethod
+    def fuse(cls, results: List[Dict], limit: int) -> List[Dict]:
+        """Reciprocal rank fusion of the per-mode match lists, one entry per page"""
+        fused = {}
+        for result in results:
+            rank = 0
+            for match in result['matches']:
+                entry = fused.get(match['page_id'])
+                if entry is not None and result['mode'] in entry['modes']:
+                    # Only a page's best match counts towards its rank in a mode
+                    continue
+                rank += 1
+                if entry is None:
+                    entry = fused[match['page_id']] = {
+                        'book_id': match['book_id'],
+                        'book_title': match['book_title'],
+                        'book_author': match['book_author'],
+                        'page_id': match['page_id'],
+                        'page_number': match['page_number'],
+                        'score': 0.0,
+                        'match_type': 'unified',
+                        'modes': {},
+                        'matches': []
+                    }
+                entry['score'] += 1.0 / (cls.RRF_K + rank)
+                entry['modes'][result['mode']] = rank
+                entry['matches'].append(match)
+
+        ranked = sorted(
+            fused.values(),
+            key=lambda entry: (-entry['score'], min(entry['modes'].values()), entry['page_id'])
+        )
+        return ranked[:limit]
+
+    @classmethod
+    async def search(cls, query: str, book_id: Optional[int] = None, modes=DEFAULT_MODES, limit: int = 20,
+                     threshold: float = 0.7, min_similarity: float = 0.3) -> Dict:
+        """Run `modes` concurrently and return the fused, page-deduplicated ranking"""
+        # Each mode contributes its first `depth` matches to the fusion
+        depth = max(limit, settings.search_fusion_depth)
+        results = await asyncio.gather(*(
+            cls._timed_mode(mode, query, book_id, depth, threshold, min_similarity)
+            for mode in dict.fromkeys(modes)
+        ))
+
+        fused = cls.fuse(results, limit)
+        return {
+            'mode': 'unified',
+            'modes': {
+                result['mode']: {key: result[key] for key in ('status', 'count', 'elapsed_ms')}
+                for result in results
+            },
+            'matches': fused,
+            'count': len(fused)
+        }
@@ -0,0 +1,699 @@
+# vector_index.py
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.vector_quantization import (
+    SCAN_BLOCK_ROWS, Int8Quantizer, ProductQuantizer, max_residual, rescore_scores, scan_score_matrix,
+    scan_scores
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within one process
+    fcntl = None
+
+STORAGE_FLOAT32 = 'float32'
+STORAGE_FLOAT16 = 'float16'
+STORAGE_INT8 = 'int8'
+STORAGE_PQ = 'pq'
+STORAGE_MODES = (STORAGE_FLOAT32, STORAGE_FLOAT16, STORAGE_INT8, STORAGE_PQ)
+
+FORMAT_VERSION = 1
+
+# Per-chunk metadata, one fixed-size record per row
+META_DTYPE = np.dtype([
+    ('book_id', '<i8'),
+    ('page_id', '<i8'),
+    ('page_number', '<i4'),
+    ('chunk_start_line', '<i4'),
+    ('chunk_end_line', '<i4'),
+    # Character range of the chunk in the page content
+    ('char_start', '<i4'),
+    ('char_end', '<i4'),
+])
+# Hex sha1 of the chunk text, see chunk_hash
+HASH_DTYPE = np.dtype('S40')
+
+_GENERATION_FILE = re.compile(r'^\w+\.(\d+)\.(bin|npz)$')
+
+
+def chunk_hash(text: str) -> str:
+    """Identity of a chunk's text for embedding reuse"""
+    # Whitespace never changes the tokens, so it does not change the embedding either
+    return hashlib.sha1(' '.join(text.split()).encode('utf-8')).hexdigest()
+
+
+class VectorIndex:
+    """
+        Persistent IVF (inverted file) index over page chunk embeddings, shared
+        by every worker process through memory-mapped files.
+
+        Vectors are L2-normalised so the inner product is the cosine similarity.
+        Once the index holds enough vectors, they are clustered into `nlist`
+        coarse cells and a query only scans the `nprobe` closest cells.
+
+        `storage` picks how vectors are held:
+          float32 / float16  the vectors themselves are scanned
+          int8 / pq          compact codes (1 byte per dimension, or `pq_m` bytes
+                             per vector) are scanned, and the best
+                             `rescore_factor * top_k` candidates are rescored
+                             against the float16 vectors. The float16 copy
+                             stays on disk, so these shrink the bytes a query
+                             scans, not the index files.
+
+        On-disk format, all in `index_dir`:
+          manifest.json      sidecar with the storage, dimensions, committed row
+                             count and tombstoned row ranges. It is replaced
+                             atomically and is the commit point of every write.
+          <column>.<gen>.bin one append-only file of fixed-size rows per column:
+                             vectors, meta (book, page, lines, characters), hashes,
+                             assignments (IVF cell) and codes/scales.
+          model.<gen>.npz    IVF centroids and PQ codebooks.
+
+        Every column is memory-mapped read-only, so all uvicorn workers share
+        one copy in the page cache and a worker only holds the small model and
+        a row mask. Adding a book appends rows to each column and commits a new
+        manifest; removing or replacing a book tombstones its old rows. Column
+        files are only rewritten, as a new generation, when the IVF is retrained
+        (the corpus doubled) or tombstones pass COMPACT_RATIO.
+
+        Writers hold an exclusive flock on the index; readers never lock. They
+        remap when the manifest changes and ignore anything past its row count,
+        so a half-written append is never seen.
+    """
+
+    # Minimum vectors per cell before clustering pays off (same rule of thumb FAISS uses)
+    MIN_POINTS_PER_LIST = 39
+    KMEANS_ITERATIONS = 10
+    # Product quantization needs a few vectors per sub-centroid to be trained
+    PQ_MIN_TRAIN = 4 * ProductQuantizer.CENTROIDS
+    # Share of tombstoned rows that triggers a compacting rewrite
+    COMPACT_RATIO = 0.5
+    # Slack for float32 rounding in the scores, far above that of a 384-dim inner product
+    SCORE_ROUNDING = 1e-4
+
+    MANIFEST = "manifest.json"
+    LOCK = ".lock"
+
+    def __init__(self, index_dir: str, nlist: int = 64, nprobe: int = 8, storage: str = STORAGE_FLOAT32,
+                 pq_m: int = 48, rescore_factor: int = 10):
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown vector storage {storage!r}, expected one of {STORAGE_MODES}")
+        self.index_dir = index_dir
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.storage = storage
+        self.pq_m = pq_m
+        self.rescore_factor = rescore_factor
+        self._lock = threading.RLock()
+
+        self._manifest = self._empty_manifest()
+        # (inode, mtime, size) of the manifest the columns were mapped from
+        self._stamp = None
+        self._columns: Dict[str, np.ndarray] = self._map_columns(self._manifest)
+        self._alive = np.empty(0, dtype=bool)
+        self._live = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._pq = ProductQuantizer(pq_m)
+        # text_hash -> row, built on first lookup
+        self._rows_by_hash: Optional[Dict[bytes, int]] = None
+
+        self._refresh()
+        if self._stamp is not None and not self._matches_settings():
+            # Storage setting or file format changed: re-encode from the stored vectors
+            with self._writing():
+                if not self._matches_settings():
+                    self._rewrite(retrain=True)
+
+    def _empty_manifest(self) -> Dict[str, Any]:
+        return {
+            'version': FORMAT_VERSION,
+            'generation': 0,
+            'storage': self.storage,
+            'dims': 0,
+            'rows': 0,
+            'tombstones': [],
+            'trained_size': 0,
+            # Sub-vectors of the stored PQ codes, 0 while there are none
+            'pq_m': 0,
+            # Largest distance of a stored code to its float16 vector, see max_residual
+            'scan_error': 0.0,
+        }
+
+    def _matches_settings(self) -> bool:
+        manifest = self._manifest
+        return manifest['version'] == FORMAT_VERSION and manifest['storage'] == self.storage \
+            and manifest['pq_m'] in (0, self.pq_m)
+
+    # -------------------- Files -------------------- #
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _column_path(self, name: str, generation: int) -> str:
+        return self._path(f"{name}.{generation}.bin")
+
+    def _model_path(self, generation: int) -> str:
+        return self._path(f"model.{generation}.npz")
+
+    @staticmethod
+    def _column_specs(manifest: Dict[str, Any]) -> Dict[str, tuple]:
+        """(dtype, row shape) of every column stored under `manifest`"""
+        storage, dims = manifest['storage'], manifest['dims']
+        specs = {
+            'vectors': (np.dtype(np.float32 if storage == STORAGE_FLOAT32 else np.float16), (dims,)),
+            'meta': (META_DTYPE, ()),
+            'hashes': (HASH_DTYPE, ()),
+            'assignments': (np.dtype(np.int32), ()),
+        }
+        if storage == STORAGE_INT8:
+            specs['codes'] = (np.dtype(np.int8), (dims,))
+            specs['scales'] = (np.dtype(np.float32), ())
+        elif storage == STORAGE_PQ and manifest['pq_m']:
+            specs['codes'] = (np.dtype(np.uint8), (manifest['pq_m'],))
+        return specs
+
+    def _map_column(self, manifest: Dict[str, Any], name: str, dtype: np.dtype, shape: tuple) -> np.ndarray:
+        rows = manifest['rows']
+        if rows == 0:
+            return np.empty((0, *shape), dtype=dtype)
+        # Files may run past `rows` (an uncommitted append); only committed rows are mapped
+        return np.memmap(self._column_path(name, manifest['generation']), dtype=dtype, mode='r',
+                         shape=(rows, *shape))
+
+    def _map_columns(self, manifest: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        return {
+            name: self._map_column(manifest, name, dtype, shape)
+            for name, (dtype, shape) in self._column_specs(manifest).items()
+        }
+
+    def _refresh(self):
+        """Remap the columns if a writer, in any process, committed a new manifest"""
+        for _ in range(3):
+            try:
+                stat = os.stat(self._path(self.MANIFEST))
+            except FileNotFoundError:
+                return
+            stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if stamp == self._stamp:
+                return
+            try:
+                self._load(stamp)
+                return
+            except FileNotFoundError:
+                # A rewrite replaced this generation while we read it; read the new manifest
+                continue
+
+    def _load(self, stamp: tuple):
+        with open(self._path(self.MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        columns = self._map_columns(manifest)
+        centroids, codebooks = None, None
+        if manifest['rows']:
+            with np.load(self._model_path(manifest['generation'])) as data:
+                centroids = data["centroids"] if data["centroids"].size else None
+                codebooks = data["pq_codebooks"] if data["pq_codebooks"].size else None
+
+        alive = np.ones(manifest['rows'], dtype=bool)
+        for start, end in manifest['tombstones']:
+            alive[start:end] = False
+
+        self._manifest = manifest
+        self._columns = columns
+        self._centroids = centroids
+        self._pq = ProductQuantizer(manifest['pq_m'] or self.pq_m, codebooks)
+        self._alive = alive
+        self._live = int(alive.sum())
+        self._rows_by_hash = None
+        self._stamp = stamp
+
+    # -------------------- Writing -------------------- #
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive writer section across threads and processes, starting from the latest manifest"""
+        with self._lock:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(self._path(self.LOCK), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    self._refresh()
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _commit(self, manifest: Dict[str, Any]):
+        path = self._path(self.MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._refresh()
+
+    def _append(self, manifest: Dict[str, Any], columns: Dict[str, np.ndarray]):
+        """Append rows to every column file, then commit `manifest` with the new row count"""
+        rows = manifest['rows']
+        added = len(columns['meta'])
+        for name, (dtype, shape) in self._column_specs(manifest).items():
+            row_bytes = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+            with open(self._column_path(name, manifest['generation']), "ab") as f:
+                # Drop what an interrupted append left past the committed rows
+                f.truncate(rows * row_bytes)
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self._commit(dict(manifest, rows=rows + added))
+
+    def _write_generation(self, vectors: np.ndarray, meta: np.ndarray, hashes: np.ndarray, retrain: bool):
+        """Write all rows as a new generation of column files (retrain, compaction, storage change)"""
+        if retrain:
+            centroids, pq = self._train(vectors)
+            trained_size = len(vectors)
+        else:
+            centroids, pq, trained_size = self._centroids, self._pq, self._manifest['trained_size']
+
+        codes, scan_error = self._encode(vectors, pq)
+        manifest = dict(
+            self._empty_manifest(),
+            generation=self._manifest['generation'] + 1,
+            dims=vectors.shape[1],
+            rows=len(vectors),
+            trained_size=trained_size,
+            pq_m=pq.m if self.storage == STORAGE_PQ and pq.is_trained else 0,
+            scan_error=scan_error,
+        )
+        columns = {
+            'vectors': vectors,
+            'meta': meta,
+            'hashes': hashes,
+            'assignments': self._assign(vectors, centroids),
+            **codes,
+        }
+        for name, (dtype, _) in self._column_specs(manifest).items():
+            with open(self._column_path(name, manifest['generation']), "wb") as f:
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        with open(self._model_path(manifest['generation']), "wb") as f:
+            np.savez(
+                f,
+                centroids=centroids if centroids is not None else np.empty((0, 0), dtype=np.float32),
+                pq_codebooks=pq.codebooks if pq.is_trained else np.empty(0, dtype=np.float32),
+            )
+
+        self._commit(manifest)
+        self._remove_stale_generations()
+
+    def _remove_stale_generations(self):
+        # Workers still mapping an old generation keep its pages until they remap
+        current = self._manifest['generation']
+        for name in os.listdir(self.index_dir):
+            match = _GENERATION_FILE.match(name)
+            if match and int(match.group(1)) != current:
+                os.remove(self._path(name))
+
+    def _rewrite(self, retrain: bool):
+        keep = np.flatnonzero(self._alive)
+        self._write_generation(
+            np.asarray(self._columns['vectors'][keep], dtype=np.float32),
+            np.asarray(self._columns['meta'][keep]),
+            np.asarray(self._columns['hashes'][keep]),
+            retrain,
+        )
+
+    def _maintain(self):
+        """Retrain or compact after a write when due"""
+        if self._live and self._needs_training():
+            self._rewrite(retrain=True)
+        elif self._manifest['rows'] - self._live > self.COMPACT_RATIO * self._manifest['rows']:
+            self._rewrite(retrain=False)
+
+    @staticmethod
+    def _meta(book_id: int, chunks: List[Dict]) -> np.ndarray:
+        return np.array([
+            (book_id, chunk['page_id'], chunk.get('page_number', 0), chunk['chunk_start_line'], chunk['chunk_end_line'],
+             chunk['char_start'], chunk['char_end'])
+            for chunk in chunks
+        ], dtype=META_DTYPE)
+
+    @staticmethod
+    def _hashes(chunks: List[Dict]) -> np.ndarray:
+        return np.array([chunk['text_hash'] for chunk in chunks], dtype=HASH_DTYPE)
+
+    # -------------------- Quantization -------------------- #
+
+    def _encode(self, vectors: np.ndarray, pq: ProductQuantizer):
+        """
+            Scan code columns for normalised float vectors, none when the vectors
+            are scanned directly, and how far the codes are from the float16
+            vectors they are rescored against.
+        """
+        if self.storage == STORAGE_INT8:
+            codes, scales = Int8Quantizer.encode(vectors)
+            columns, decoded = {'codes': codes, 'scales': scales}, Int8Quantizer.decode(codes, scales)
+        elif self.storage == STORAGE_PQ and pq.is_trained:
+            codes = pq.encode(vectors)
+            columns, decoded = {'codes': codes}, pq.decode(codes)
+        else:
+            return {}, 0.0
+        return columns, max_residual(vectors.astype(np.float16), decoded)
+
+    # -------------------- Clustering -------------------- #
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _train(self, vectors: np.ndarray):
+        """Spherical k-means centroids (and PQ codebooks when used) for `vectors`"""
+        n = len(vectors)
+        pq = ProductQuantizer(self.pq_m)
+        if self.storage == STORAGE_PQ and n >= self.PQ_MIN_TRAIN:
+            pq.train(vectors)
+
+        nlist = min(self.nlist, n // self.MIN_POINTS_PER_LIST)
+        if nlist < 2:
+            return None, pq
+
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(n, size=nlist, replace=False)].copy()
+
+        for _ in range(self.KMEANS_ITERATIONS):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for cell in range(nlist):
+                members = vectors[assignments == cell]
+                if len(members):
+                    centroids[cell] = members.mean(axis=0)
+            centroids = self._normalize(centroids)
+
+        return centroids, pq
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: Optional[np.ndarray]) -> np.ndarray:
+        if centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _needs_training(self) -> bool:
+        n = self._live
+        if self.storage == STORAGE_PQ and not self._pq.is_trained and n >= self.PQ_MIN_TRAIN:
+            return True
+        if self._centroids is None:
+            return n >= 2 * self.MIN_POINTS_PER_LIST
+        # Re-cluster once the corpus has doubled since the last training
+        return n >= 2 * self._manifest['trained_size']
+
+    # -------------------- Public API -------------------- #
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._live
+
+    def add_book(self, book_id: int, chunks: List[Dict], embeddings: np.ndarray):
+        """Add all chunks of a book. Any previous entries for the book are replaced."""
+        if not chunks:
+            return
+
+        vectors = self._normalize(embeddings)
+        with self._writing():
+            manifest = self._without_book(book_id) or self._manifest
+            if not manifest['rows']:
+                manifest = dict(manifest, dims=vectors.shape[1])
+            elif manifest['dims'] != vectors.shape[1]:
+                raise ValueError(f"Embedding size {vectors.shape[1]} does not match the index ({manifest['dims']})")
+
+            if manifest['generation'] == 0:
+                # First rows of a new index: write them as generation 1 with its model file
+                self._write_generation(vectors, self._meta(book_id, chunks), self._hashes(chunks), retrain=True)
+                return
+
+            codes, scan_error = self._encode(vectors, self._pq)
+            self._append(dict(manifest, scan_error=max(manifest['scan_error'], scan_error)), {
+                'vectors': vectors,
+                'meta': self._meta(book_id, chunks),
+                'hashes': self._hashes(chunks),
+                'assignments': self._assign(vectors, self._centroids),
+                **codes,
+            })
+            self._maintain()
+
+    def remove_book(self, book_id: int):
+        with self._writing():
+            manifest = self._without_book(book_id)
+            if manifest is not None:
+                self._commit(manifest)
+                self._maintain()
+
+    def _without_book(self, book_id: int) -> Optional[Dict[str, Any]]:
+        """The manifest with the book's live rows tombstoned, or None if it has none"""
+        rows = np.flatnonzero(self._alive & (self._columns['meta']['book_id'] == book_id))
+        if rows.size == 0:
+            return None
+        # A book's rows are appended together, so this is usually a single range
+        breaks = np.flatnonzero(np.diff(rows) > 1)
+        starts = np.concatenate([rows[:1], rows[breaks + 1]])
+        ends = np.concatenate([rows[breaks], rows[-1:]]) + 1
+        ranges = [[int(start), int(end)] for start, end in zip(starts, ends)]
+        return dict(self._manifest, tombstones=self._manifest['tombstones'] + ranges)
+
+    def find_vectors(self, text_hashes) -> Dict[str, np.ndarray]:
+        """Stored vectors of already indexed chunks, by the `text_hash` of their text"""
+        with self._lock:
+            self._refresh()
+            if self._rows_by_hash is None:
+                rows = np.flatnonzero(self._alive)
+                self._rows_by_hash = dict(zip(self._columns['hashes'][rows].tolist(), rows.tolist()))
+            found = {}
+            for text_hash in text_hashes:
+                row = self._rows_by_hash.get(text_hash.encode('ascii'))
+                if row is not None:
+                    found[text_hash] = row
+            if not found:
+                return {}
+            vectors = np.asarray(self._columns['vectors'][list(found.values())], dtype=np.float32)
+            return dict(zip(found.keys(), vectors))
+
+    def _scan(self, candidates: np.ndarray, query: np.ndarray):
+        """(scores, exact, error margin) of the candidates from the cheapest representation held"""
+        columns = self._columns
+        margin = self._manifest['scan_error'] + self.SCORE_ROUNDING
+        if 'scales' in columns:
+            return Int8Quantizer.scores(columns['codes'][candidates], columns['scales'][candidates], query), \
+                False, margin
+        if 'codes' in columns:
+            return self._pq.scores(columns['codes'][candidates], query), False, margin
+        return scan_scores(columns['vectors'][candidates], query), True, 0.0
+
+    def _score_matrix(self, rows: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """(rows x queries) scores from the representation `_scan` uses"""
+        columns = self._columns
+        if 'scales' in columns:
+            return Int8Quantizer.score_matrix(columns['codes'][rows], columns['scales'][rows], queries)
+        if 'codes' in columns:
+            return self._pq.score_matrix(columns['codes'][rows], queries)
+        return scan_score_matrix(columns['vectors'][rows], queries)
+
+    def _hit(self, row: int, similarity: float) -> Dict:
+        record = self._columns['meta'][row]
+        return {
+            'book_id': int(record['book_id']),
+            'page_id': int(record['page_id']),
+            'page_number': int(record['page_number']),
+            'chunk_start_line': int(record['chunk_start_line']),
+            'chunk_end_line': int(record['chunk_end_line']),
+            'char_start': int(record['char_start']),
+            'char_end': int(record['char_end']),
+            'similarity': float(similarity),
+        }
+
+    @staticmethod
+    def rank_key(hit: Dict) -> list:
+        """Sort key of a hit: best similarity first, then page and chunk for a stable order"""
+        return [-hit['similarity'], hit['page_id'], hit['chunk_start_line'], hit['char_start']]
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 20, book_id: Optional[int] = None,
+               after: Optional[list] = None) -> List[Dict]:
+        """Return the top_k chunks as dicts with the chunk metadata and a `similarity` score
+
+        With `after` (a `rank_key`), only chunks ranked strictly after it are returned,
+        which is how semantic results are paged. Chunk text is not stored; it is
+        `char_start`..`char_end` of the page content.
+        """
+        with self._lock:
+            self._refresh()
+            if not self._live:
+                return []
+
+            query = self._normalize(np.reshape(query_embedding, (1, -1)))[0]
+
+            if book_id is not None:
+                # A single book is small enough to scan exactly
+                candidates = np.flatnonzero(self._alive & (self._columns['meta']['book_id'] == book_id))
+            elif self._centroids is not None:
+                cell_scores = self._centroids @ query
+                probe = np.argsort(cell_scores)[-self.nprobe:]
+                candidates = np.flatnonzero(self._alive & np.isin(self._columns['assignments'], probe))
+            else:
+                candidates = np.flatnonzero(self._alive)
+
+            if candidates.size == 0:
+                return []
+
+            scores, exact, margin = self._scan(candidates, query)
+            ambiguous = 0
+            if after is not None:
+                # Anything that may still rank after the cursor once rescored
+                keep = scores.astype(np.float64) <= -after[0] + margin
+                candidates, scores = candidates[keep], scores[keep]
+                # Rows this close to the cursor may rescore before it; they must not use up the pool
+                ambiguous = int(np.count_nonzero(scores.astype(np.float64) >= -after[0] - margin))
+
+            if not exact and candidates.size:
+                # Rescore the best approximate candidates against the stored vectors. The pool
+                # differs from page to page, so a row must score the same whatever it is pooled with
+                pool = min(candidates.size, top_k * self.rescore_factor + ambiguous)
+                best = np.argpartition(-scores, pool - 1)[:pool]
+                candidates = np.sort(candidates[best])
+                scores = rescore_scores(self._columns['vectors'][candidates], query)
+
+            if after is not None and candidates.size:
+                # Strictly lower similarity is always after; exact ties fall back to the full key
+                keep = scores.astype(np.float64) < -after[0]
+                for i in np.flatnonzero(scores.astype(np.float64) == -after[0]):
+                    keep[i] = self.rank_key(self._hit(candidates[i], scores[i])) > list(after)
+                candidates, scores = candidates[keep], scores[keep]
+
+            if candidates.size == 0:
+                return []
+
+            k = min(top_k, scores.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            hits = [self._hit(candidates[i], scores[i]) for i in top]
+            hits.sort(key=self.rank_key)
+            return hits
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 20,
+                     book_id: Optional[int] = None) -> List[List[Dict]]:
+        """`search` for many queries at once: the top_k hits of every query, without paging
+
+        Candidate rows are read once and scored against all queries as one
+        (rows x queries) matrix product per block; each query keeps its best
+        rows as the blocks go by. With IVF the candidates are the union of
+        every query's probed cells, a superset of what `search` scans.
+        """
+        queries = self._normalize(np.atleast_2d(query_embeddings))
+        with self._lock:
+            self._refresh()
+            if not self._live or not len(queries):
+                return [[] for _ in queries]
+
+            if book_id is not None:
+                candidates = np.flatnonzero(self._alive & (self._columns['meta']['book_id'] == book_id))
+            elif self._centroids is not None:
+                probe = np.argsort(queries @ self._centroids.T, axis=1)[:, -self.nprobe:]
+                candidates = np.flatnonzero(self._alive & np.isin(self._columns['assignments'], np.unique(probe)))
+            else:
+                candidates = np.flatnonzero(self._alive)
+
+            if candidates.size == 0:
+                return [[] for _ in queries]
+
+            exact = 'codes' not in self._columns
+            pool = min(candidates.size, top_k if exact else top_k * self.rescore_factor)
+            best_rows = np.empty((len(queries), 0), dtype=np.int64)
+            best_scores = np.empty((len(queries), 0), dtype=np.float32)
+            for start in range(0, candidates.size, SCAN_BLOCK_ROWS):
+                rows = candidates[start:start + SCAN_BLOCK_ROWS]
+                best_scores = np.concatenate([best_scores, self._score_matrix(rows, queries).T], axis=1)
+                best_rows = np.concatenate([best_rows, np.broadcast_to(rows, (len(queries), rows.size))], axis=1)
+                if best_scores.shape[1] > pool:
+                    keep = np.argpartition(-best_scores, pool - 1, axis=1)[:, :pool]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+            if not exact:
+                # Rescore all pools against the stored vectors with one product over their union
+                union, inverse = np.unique(best_rows.ravel(), return_inverse=True)
+                exact_scores = scan_score_matrix(self._columns['vectors'][union], queries)
+                best_scores = exact_scores[inverse.reshape(best_rows.shape), np.arange(len(queries))[:, None]]
+
+            k = min(top_k, best_scores.shape[1])
+            results = []
+            for rows, scores in zip(best_rows, best_scores):
+                top = np.argpartition(-scores, k - 1)[:k]
+                hits = [self._hit(rows[i], scores[i]) for i in top]
+                hits.sort(key=self.rank_key)
+                results.append(hits)
+            return results
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Stats of the generation this worker has mapped; never loads or remaps it"""
+        with self._lock:
+            manifest = self._manifest
+
+            def size(array) -> int:
+                return array.nbytes if array is not None else 0
+
+            # Private to this worker; the mapped columns are shared through the page cache
+            resident = size(self._alive) + size(self._pq.codebooks) + size(self._centroids)
+            mapped = sum(size(column) for column in self._columns.values())
+            disk = sum(
+                os.path.getsize(self._path(name))
+                for name in os.listdir(self.index_dir)
+                if _GENERATION_FILE.match(name) or name == self.MANIFEST
+            ) if os.path.isdir(self.index_dir) else 0
+            return {
+                "storage": self.storage,
+                "vectors": self._live,
+                "rows": manifest['rows'],
+                "tombstoned": manifest['rows'] - self._live,
+                "generation": manifest['generation'],
+                "dimensions": manifest['dims'] or None,
+                "pq_trained": self._pq.is_trained if self.storage == STORAGE_PQ else None,
+                "scan_error": round(manifest['scan_error'], 4),
+                "resident_mb": round(resident / (1024 * 1024), 2),
+                "mapped_mb": round(mapped / (1024 * 1024), 2),
+                "disk_mb": round(disk / (1024 * 1024), 2),
+            }
+
+
+_vector_index: Optional[VectorIndex] = None
+_vector_index_lock = threading.Lock()
+
+
+def get_vector_index() -> VectorIndex:
+    """Process-wide vector index, loaded from disk on first use"""
+    global _vector_index
+    if _vector_index is None:
+        with _vector_index_lock:
+            if _vector_index is None:
+                _vector_index = VectorIndex(
+                    index_dir=settings.vector_index_dir,
+                    nlist=settings.vector_index_nlist,
+                    nprobe=settings.vector_index_nprobe,
+                    storage=settings.vector_index_storage,
+                    pq_m=settings.vector_index_pq_m,
+                    rescore_factor=settings.vector_index_rescore_factor,
+                )
+    return _vector_index
+
+
+def loaded_vector_index() -> Optional[VectorIndex]:
+    """The process-wide vector index if something already loaded it, without loading it"""
+    return _vector_index
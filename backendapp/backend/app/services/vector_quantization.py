@@ -0,0 +1,168 @@
+# vector_quantization.py
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Rows scored per block, bounds the float32 temporaries of a scan
+SCAN_BLOCK_ROWS = 16384
+
+
+def scan_scores(vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Inner products of float16/float32 rows with the query, upcast block by block"""
+    scores = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        block = vectors[start:start + SCAN_BLOCK_ROWS]
+        scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+    return scores
+
+
+def rescore_scores(vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+        Scores of float16/float32 rows that do not depend on the rows scored
+        with them: each row is summed on its own in float64. A BLAS product
+        blocks the rows differently for every candidate set, which moves the
+        last bits of a score from one page of results to the next.
+    """
+    query = np.asarray(query, dtype=np.float64)
+    scores = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float64)
+        scores[start:start + len(block)] = (block * query).sum(axis=1)
+    return scores
+
+
+def scan_score_matrix(vectors: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """(rows x queries) inner products, every query scored in one matrix product per block"""
+    scores = np.empty((len(vectors), len(queries)), dtype=np.float32)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        block = vectors[start:start + SCAN_BLOCK_ROWS]
+        scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ queries.T
+    return scores
+
+
+def max_residual(vectors: np.ndarray, decoded: np.ndarray) -> float:
+    """
+        Largest |x - decoded x| over the rows. By Cauchy-Schwarz no unit
+        query's score of a row moves by more than this between the two.
+    """
+    largest = 0.0
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        residual = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32) \
+            - decoded[start:start + SCAN_BLOCK_ROWS]
+        largest = max(largest, float(np.sqrt((residual ** 2).sum(axis=1).max(initial=0.0))))
+    return largest
+
+
+class Int8Quantizer:
+    """
+        Symmetric per-vector int8 quantization: x ~= codes * scale.
+
+        Unit vectors rarely exceed |0.3| in any coordinate of a 384-dim
+        embedding, so scaling each row by its own max keeps the full int8 range.
+    """
+
+    @staticmethod
+    def encode(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    @staticmethod
+    def decode(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * scales[:, None]
+
+    @staticmethod
+    def scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return scan_scores(codes, query) * scales
+
+    @staticmethod
+    def score_matrix(codes: np.ndarray, scales: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        return scan_score_matrix(codes, queries) * scales[:, None]
+
+
+class ProductQuantizer:
+    """
+        Product quantization (Jegou et al.): the vector is cut into `m` sub-vectors
+        and each is replaced by the id of its nearest of 256 sub-centroids, so a
+        384-dim vector costs `m` bytes. Queries are scored with a per-query lookup
+        table (asymmetric distance), i.e. `m` additions per vector instead of 384
+        multiply-adds.
+    """
+
+    CENTROIDS = 256
+    TRAIN_ITERATIONS = 15
+    MAX_TRAIN_SAMPLES = 20000
+
+    def __init__(self, m: int, codebooks: Optional[np.ndarray] = None):
+        self.m = m
+        # (m, 256, dims / m)
+        self.codebooks = codebooks
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None and self.codebooks.size > 0
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        n, dims = vectors.shape
+        if dims % self.m:
+            raise ValueError(f"Vector size {dims} is not divisible by PQ sub-vectors {self.m}")
+        return vectors.reshape(n, self.m, dims // self.m)
+
+    def train(self, vectors: np.ndarray):
+        rng = np.random.default_rng(0)
+        if len(vectors) > self.MAX_TRAIN_SAMPLES:
+            vectors = vectors[np.sort(rng.choice(len(vectors), self.MAX_TRAIN_SAMPLES, replace=False))]
+        sub_vectors = self._split(np.asarray(vectors, dtype=np.float32))
+        k = min(self.CENTROIDS, len(vectors))
+
+        codebooks = np.zeros((self.m, self.CENTROIDS, sub_vectors.shape[2]), dtype=np.float32)
+        for j in range(self.m):
+            data = sub_vectors[:, j, :]
+            centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+            for _ in range(self.TRAIN_ITERATIONS):
+                assignments = self._nearest(data, centroids)
+                counts = np.bincount(assignments, minlength=k)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignments, data)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks[j, :k] = centroids
+            # Unused slots repeat the first centroid so no code points at zeros
+            codebooks[j, k:] = centroids[0]
+        self.codebooks = codebooks
+
+    @staticmethod
+    def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin |x - c|^2 = argmin (|c|^2 - 2 x.c)
+        return np.argmin((centroids ** 2).sum(axis=1) - 2 * data @ centroids.T, axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        sub_vectors = self._split(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = self._nearest(sub_vectors[:, j, :], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        sub_vectors = self.codebooks[np.arange(self.m), codes]
+        return sub_vectors.reshape(len(codes), -1)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # lookup[j, c] = <query sub-vector j, centroid c of sub-space j>
+        lookup = np.einsum('jd,jcd->jc', self._split(query[None, :])[0], self.codebooks)
+        scores = np.empty(len(codes), dtype=np.float32)
+        columns = np.arange(self.m)
+        for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+            block = codes[start:start + SCAN_BLOCK_ROWS]
+            scores[start:start + len(block)] = lookup[columns, block].sum(axis=1)
+        return scores
+
+    def score_matrix(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """(rows x queries) scores from one lookup table per query"""
+        lookups = np.einsum('qjd,jcd->jqc', self._split(queries), self.codebooks)
+        scores = np.zeros((len(codes), len(queries)), dtype=np.float32)
+        for j in range(self.m):
+            scores += lookups[j][:, codes[:, j]].T
+        return scores
@@ -0,0 +1,65 @@
+# word_box_codec.py
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Format version, stored as the first byte of every packed blob
+PACKED_FORMAT_VERSION = 1
+
+# One 13 byte record per word. Coordinates are page pixels, which fit in
+# uint16 up to ~200 inches at 300 DPI; `token` indexes the page token list.
+WORD_BOX_DTYPE = np.dtype([
+    ('token', '<u4'),
+    ('x', '<u2'),
+    ('y', '<u2'),
+    ('width', '<u2'),
+    ('height', '<u2'),
+    ('confidence', 'u1'),
+])
+
+
+def pack_word_boxes(words: List[Dict]) -> Tuple[bytes, List[str]]:
+    """
+        Pack word boxes ({'word', 'x_position', 'y_position', 'width', 'height', 'confidence'})
+        into a compact binary array plus the page's token dictionary.
+    """
+    tokens: List[str] = []
+    token_ids: Dict[str, int] = {}
+    records = np.zeros(len(words), dtype=WORD_BOX_DTYPE)
+
+    for i, word in enumerate(words):
+        token_id = token_ids.get(word['word'])
+        if token_id is None:
+            token_id = token_ids[word['word']] = len(tokens)
+            tokens.append(word['word'])
+        records[i] = (
+            token_id,
+            min(max(word['x_position'], 0), 0xFFFF),
+            min(max(word['y_position'], 0), 0xFFFF),
+            min(max(word['width'], 0), 0xFFFF),
+            min(max(word['height'], 0), 0xFFFF),
+            min(max(round(word['confidence']), 0), 100),
+        )
+
+    return bytes([PACKED_FORMAT_VERSION]) + records.tobytes(), tokens
+
+
+def unpack_word_boxes(blob: bytes, tokens: List[str]) -> List[Dict]:
+    """Inverse of pack_word_boxes, returns dicts shaped like Word rows"""
+    if not blob:
+        return []
+    if blob[0] != PACKED_FORMAT_VERSION:
+        raise ValueError(f"Unsupported packed word box format {blob[0]}")
+
+    records = np.frombuffer(blob, dtype=WORD_BOX_DTYPE, offset=1)
+    return [
+        {
+            'word': tokens[record['token']],
+            'x_position': int(record['x']),
+            'y_position': int(record['y']),
+            'width': int(record['width']),
+            'height': int(record['height']),
+            'confidence': float(record['confidence'])
+        }
+        for record in records
+    ]
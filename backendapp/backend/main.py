@@ -6,6 +6,10 @@ from app.models.enums.vx_api_perms_enum import VxAPIPermsEnum
 from app.utils.vx_api_perms_utils import VxAPIPermsUtils
 from fastapi.responses import JSONResponse
 from app.api.routes.v1.health import router as health_router
+from app.config import settings
+from app.services.embedding_model import EmbeddingModelRegistry
+from app.services.ocr_job_service import OCRJobService
+from app.services.ocr_service import shutdown_page_pool
 import logging
 import os
 
@@ -34,11 +38,17 @@ async def startup_event():
     logger.info(f"Environment: {os.getenv('ENVIRONMENT', 'unknown')}")
     logger.info(f"Debug mode: {os.getenv('DEBUG', 'unknown')}")
     logger.info(f"Database URL configured: {'Yes' if os.getenv('DATABASE_URL') else 'No'}")
+    if settings.embedding_warmup:
+        logger.info("Warming up embedding model")
+        await EmbeddingModelRegistry.warm_up()
     logger.info("✅ Application startup complete")
 
 @app.on_event("shutdown") 
 async def shutdown_event():
     logger.info("🛑 Shutting down GramSevak Seva API")
+    OCRJobService.shutdown()
+    shutdown_page_pool()
+    EmbeddingModelRegistry.shutdown()
     
 # Handle common browser requests that cause 404s
 @app.get("/.well-known/gpc.json")
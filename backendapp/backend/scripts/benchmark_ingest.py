@@ -0,0 +1,152 @@
+# scripts/benchmark_ingest.py
+"""
+Benchmark book ingestion: the old row-by-row ORM path against BookIngestService
+
+Builds a synthetic OCR result (default 500 pages x 200 words) and reports
+rows/second for pages + words + postings written, for both row and packed
+word storage.
+
+Usage: python scripts/benchmark_ingest.py [--pages 500] [--words-per-page 200]
+                                          [--database-url sqlite:///ingest_bench.db]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--pages", type=int, default=500)
+parser.add_argument("--words-per-page", type=int, default=200)
+parser.add_argument("--batch-size", type=int, default=50)
+parser.add_argument("--database-url", default="sqlite:///ingest_bench.db")
+args = parser.parse_args()
+
+os.environ.setdefault("DATABASE_URL", args.database_url)
+os.environ["DEBUG"] = "False"
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.config import Base
+import app.models  # noqa: F401  (register all models)
+from app.models.books import Book, Page, PagePosting, Word
+from app.services.book_ingest_service import BookIngestService
+from app.services.text_index_service import TextIndexService
+
+VOCABULARY = [
+    "महाराष्ट्र", "शासन", "योजना", "ग्रामपंचायत", "निर्णय", "विभाग", "जिल्हा", "तालुका",
+    "अनुदान", "लाभार्थी", "अर्ज", "प्रमाणपत्र", "शेतकरी", "पाणी", "रस्ता", "शिक्षण",
+    "आरोग्य", "निधी", "मंजूर", "दिनांक", "GR", "2024", "क्रमांक", "अधिकारी",
+]
+
+
+def synthetic_book(pages: int, words_per_page: int):
+    rng = random.Random(42)
+    extracted = []
+    for page_number in range(1, pages + 1):
+        words = [rng.choice(VOCABULARY) for _ in range(words_per_page)]
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        extracted.append({
+            "page_number": page_number,
+            "text": "\n".join(lines),
+            "confidence": 90.0,
+            "boxes": {
+                "text": words,
+                "conf": [90] * len(words),
+                "left": [(i % 12) * 80 for i in range(len(words))],
+                "top": [(i // 12) * 40 for i in range(len(words))],
+                "width": [70] * len(words),
+                "height": [30] * len(words),
+            },
+        })
+    return extracted
+
+
+def legacy_ingest(db, extracted, filename):
+    """The original upload_book persistence loop: commit + refresh per page, one ORM object per word"""
+    book = Book(title="bench", author="bench", filename=filename, file_path=filename, total_pages=len(extracted))
+    db.add(book)
+    db.commit()
+    db.refresh(book)
+
+    for page_data in extracted:
+        page = Page(book_id=book.id, page_number=page_data["page_number"],
+                    content=page_data["text"], confidence_score=page_data["confidence"])
+        db.add(page)
+        db.commit()
+        db.refresh(page)
+        TextIndexService.index_pages(db, [page])
+
+        boxes = page_data["boxes"]
+        for i, word in enumerate(boxes["text"]):
+            if word.strip() and int(boxes["conf"][i]) > 30:
+                db.add(Word(page_id=page.id, word=word, x_position=boxes["left"][i], y_position=boxes["top"][i],
+                            width=boxes["width"][i], height=boxes["height"][i], confidence=float(boxes["conf"][i])))
+        db.commit()
+    return book
+
+
+def count_rows(db, book_id):
+    pages = db.query(func.count(Page.id)).filter(Page.book_id == book_id).scalar()
+    words = db.query(func.count(Word.id)).join(Page).filter(Page.book_id == book_id).scalar()
+    postings = db.query(func.count(PagePosting.id)).filter(PagePosting.book_id == book_id).scalar()
+    return pages + words + postings
+
+
+def word_storage_bytes(db, book_id):
+    """Approximate payload of the word boxes, excluding index overhead of the words table"""
+    packed = db.query(func.sum(func.length(Page.word_boxes))).filter(Page.book_id == book_id).scalar() or 0
+    # word text + 4 ints + float + page_id + id per row
+    row_words = db.query(func.count(Word.id), func.sum(func.length(Word.word))) \
+        .join(Page).filter(Page.book_id == book_id).one()
+    return packed + (row_words[0] * 7 * 8 + (row_words[1] or 0))
+
+
+def cleanup(db, book_id):
+    page_ids = [page_id for (page_id,) in db.query(Page.id).filter(Page.book_id == book_id)]
+    db.query(PagePosting).filter(PagePosting.book_id == book_id).delete(synchronize_session=False)
+    db.query(Word).filter(Word.page_id.in_(page_ids)).delete(synchronize_session=False)
+    db.query(Page).filter(Page.book_id == book_id).delete(synchronize_session=False)
+    db.query(Book).filter(Book.id == book_id).delete(synchronize_session=False)
+    db.commit()
+
+
+def main():
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    extracted = synthetic_book(args.pages, args.words_per_page)
+    suffix = int(time.time())
+
+    for name, run in [
+        ("legacy (row-by-row)", lambda db: legacy_ingest(db, extracted, f"bench-legacy-{suffix}.pdf")),
+        ("bulk", lambda db: BookIngestService.ingest_book(
+            db, "bench", "bench", f"bench-bulk-{suffix}.pdf", f"bench-bulk-{suffix}.pdf",
+            extracted, batch_size=args.batch_size, word_storage="rows")[0]),
+        ("bulk (packed words)", lambda db: BookIngestService.ingest_book(
+            db, "bench", "bench", f"bench-packed-{suffix}.pdf", f"bench-packed-{suffix}.pdf",
+            extracted, batch_size=args.batch_size, word_storage="packed")[0]),
+    ]:
+        db = Session()
+        try:
+            start = time.perf_counter()
+            book = run(db)
+            elapsed = time.perf_counter() - start
+            rows = count_rows(db, book.id)
+            word_bytes = word_storage_bytes(db, book.id)
+            print(f"{name:22s} {rows:8d} rows in {elapsed:7.2f}s  -> {rows / elapsed:10.0f} rows/s"
+                  f"  words/s {args.pages * args.words_per_page / elapsed:10.0f}"
+                  f"  word data {word_bytes / 1024:8.0f} KiB")
+            cleanup(db, book.id)
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# scripts/benchmark_ocr.py
+"""
+Benchmark the OCR worker path (MarathiOCRService.iter_pages) on a sample PDF
+
+Every configuration sends the first pages of the PDF through a process pool
+the way an upload does, rasterization and preprocessing included. The OCR
+cache and the text layer are disabled, so every page is OCR'd:
+
+  two-pass     the old worker: image_to_string + image_to_data per page
+  subprocess   iter_pages: one image_to_data pass, pytesseract engine
+  api          iter_pages: one image_to_data pass, in-process tesserocr engine
+
+Reports pages/s and compares each configuration's page text with the
+subprocess run. Then the two engines are timed page by page with one
+worker and one page in flight, where parallelism does not hide their
+fixed per-call cost: the first page (worker start-up, and for the api
+engine the traineddata load) is reported apart from the mean, p50 and
+p95 latency of the others.
+
+Usage: python scripts/benchmark_ocr.py sample.pdf [--pages 10] [--dpi 300] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# Add the parent directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytesseract
+from pdf2image import convert_from_path
+
+from app.config import settings
+from app.services.ocr_service import MarathiOCRService, shutdown_page_pool
+
+
+def two_pass_page(pdf_path, page_number, dpi):
+    """Pool worker before single-pass extraction: text and boxes from two Tesseract runs"""
+    service = MarathiOCRService("subprocess")
+    image = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+    image = service.preprocess_image(image)
+    text = pytesseract.image_to_string(image, config=service.tesseract_config)
+    boxes = pytesseract.image_to_data(image, config=service.tesseract_config, output_type=pytesseract.Output.DICT)
+    return {'page_number': page_number, 'text': service.clean_marathi_text(text),
+            'confidence': service.calculate_confidence(boxes)}
+
+
+def timed(name, pages, count):
+    start = time.perf_counter()
+    results = list(pages)
+    elapsed = time.perf_counter() - start
+    confidence = sum(r['confidence'] for r in results) / count
+    print(f"{name:12s} {count} pages in {elapsed:7.2f}s -> {count / elapsed:6.2f} pages/s"
+          f"  (mean confidence {confidence:.1f})")
+    return results
+
+
+def compare(name, results, reference):
+    same_words = sum(a['text'].split() == b['text'].split() for a, b in zip(results, reference))
+    print(f"{'':12s} identical page text {name} vs subprocess: {same_words}/{len(reference)}")
+
+
+def latency(name, service, pdf, dpi, page_numbers):
+    """Per-page latency of iter_pages with a single worker and one page in flight"""
+    shutdown_page_pool()
+    settings.ocr_workers = 1
+    settings.ocr_window_size = 1
+
+    pages = service.iter_pages(pdf, dpi=dpi, page_numbers=page_numbers)
+    times = []
+    start = time.perf_counter()
+    for _ in pages:
+        now = time.perf_counter()
+        times.append((now - start) * 1000)
+        start = now
+
+    first, rest = times[0], sorted(times[1:])
+    if not rest:
+        print(f"{name:12s} first page {first:7.0f} ms (use --pages 2 or more for latency)")
+        return
+    print(f"{name:12s} first page {first:7.0f} ms, then mean {statistics.mean(rest):7.0f} ms"
+          f"  p50 {rest[len(rest) // 2]:7.0f} ms  p95 {rest[min(len(rest) - 1, int(len(rest) * 0.95))]:7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=0, help="OCR pool workers (default OCR_WORKERS)")
+    args = parser.parse_args()
+
+    settings.ocr_cache_enabled = False
+    settings.ocr_text_layer_enabled = False
+    settings.ocr_workers = args.workers or settings.ocr_workers
+    workers = settings.ocr_workers or os.cpu_count()
+    page_numbers = list(range(1, args.pages + 1))
+    print(f"{args.pdf}: {args.pages} pages at {args.dpi} DPI, {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        old = timed("two-pass", pool.map(partial(two_pass_page, args.pdf, dpi=args.dpi), page_numbers), args.pages)
+
+    try:
+        service = MarathiOCRService("subprocess")
+        new = timed("subprocess", service.iter_pages(args.pdf, dpi=args.dpi, page_numbers=page_numbers), args.pages)
+        compare("two-pass", old, new)
+
+        try:
+            import tesserocr  # noqa: F401
+            api_service = MarathiOCRService("api")
+        except ImportError:
+            print("api engine: tesserocr is not installed")
+            api_service = None
+        if api_service:
+            api = timed("api", api_service.iter_pages(args.pdf, dpi=args.dpi, page_numbers=page_numbers), args.pages)
+            compare("api", api, new)
+
+        print("per-page latency, 1 worker:")
+        latency("subprocess", service, args.pdf, args.dpi, page_numbers)
+        if api_service:
+            latency("api", api_service, args.pdf, args.dpi, page_numbers)
+    finally:
+        shutdown_page_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# scripts/benchmark_vector_index.py
+"""
+Benchmark vector storage modes of the semantic index: recall, memory, latency
+
+Builds one VectorIndex per storage mode (float32, float16, int8, pq) over the
+same vectors and compares the top-k of every query with exact float32 cosine
+over the whole corpus (brute force, no IVF). Vectors are read from an .npy
+file of chunk embeddings, or generated as clustered random unit vectors.
+
+Then every storage mode is checked for cursor paging: a small index with one
+book removed is paged `after` the last hit until it runs out, and must return
+every live chunk exactly once. The script exits with status 1 if it does not.
+
+Usage: python scripts/benchmark_vector_index.py [--embeddings chunks.npy]
+                                                [--vectors 50000] [--dims 384]
+                                                [--queries 200] [--top-k 10]
+                                                [--nprobe 8] [--rescore-factor 10]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.services.vector_index import STORAGE_MODES, VectorIndex, chunk_hash
+
+
+def synthetic_vectors(n: int, dims: int, rng) -> np.ndarray:
+    """Unit vectors around a few hundred topics, roughly like sentence embeddings"""
+    topics = rng.normal(size=(max(8, n // 200), dims))
+    vectors = topics[rng.integers(len(topics), size=n)] + 0.8 * rng.normal(size=(n, dims))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def check_paging(storage: str, rng) -> bool:
+    """Page through an index with a removed book; True if every live chunk came back exactly once"""
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = VectorIndex(index_dir, nlist=4, nprobe=4, storage=storage, pq_m=16)
+        for book_id in range(5):
+            # Four chunks per page on the same line, like pages OCR'd without line breaks
+            chunks = [{'page_id': book_id * 1000 + i // 4, 'chunk_start_line': 1, 'chunk_end_line': 1,
+                       'char_start': i % 4 * 100, 'char_end': i % 4 * 100 + 100,
+                       'text_hash': chunk_hash(f"{book_id}:{i}")} for i in range(400)]
+            index.add_book(book_id, chunks, rng.normal(size=(400, 64)))
+        index.remove_book(2)
+
+        for query in rng.normal(size=(5, 64)):
+            seen, after = [], None
+            while True:
+                hits = index.search(query, top_k=20, after=after)
+                if not hits:
+                    break
+                seen.extend((hit['page_id'], hit['char_start']) for hit in hits)
+                after = VectorIndex.rank_key(hits[-1])
+            if len(seen) != len(index) or len(set(seen)) != len(seen):
+                print(f"{storage:8s} paging returned {len(seen)} hits, {len(set(seen))} distinct, "
+                      f"for {len(index)} chunks")
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings")
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=64)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--rescore-factor", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dims, rng)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.3 * rng.normal(size=queries.shape).astype(np.float32)
+
+    # 20 "books" so books are added the way ingestion adds them
+    books = np.array_split(np.arange(len(vectors)), 20)
+    chunks = [{'page_id': i, 'chunk_start_line': 1, 'chunk_end_line': 5,
+               'char_start': 0, 'char_end': 0, 'text_hash': chunk_hash(str(i))} for i in range(len(vectors))]
+
+    exact = [set(np.argsort(-(vectors @ q))[:args.top_k]) for q in queries]
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, recall@{args.top_k} "
+          f"against exact float32 cosine (nlist={args.nlist}, nprobe={args.nprobe})")
+    print("recall: against exact cosine; vs f32: overlap with the float32 index (same IVF cells)")
+    print(f"{'storage':8s} {'recall':>7s} {'vs f32':>7s} {'resident MB':>12s} {'disk MB':>8s} "
+          f"{'ms/query':>9s} {'build s':>8s}")
+
+    baseline = None
+
+    for storage in STORAGE_MODES:
+        with tempfile.TemporaryDirectory() as index_dir:
+            start = time.perf_counter()
+            index = VectorIndex(index_dir, nlist=args.nlist, nprobe=args.nprobe, storage=storage,
+                                rescore_factor=args.rescore_factor)
+            for book_id, rows in enumerate(books):
+                index.add_book(book_id, [chunks[i] for i in rows], vectors[rows])
+            build_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = [index.search(q, top_k=args.top_k) for q in queries]
+            query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            recall = np.mean([
+                len({hit['page_id'] for hit in hits} & truth) / args.top_k
+                for hits, truth in zip(results, exact)
+            ])
+            found = [{hit['page_id'] for hit in hits} for hits in results]
+            baseline = baseline or found
+            agreement = np.mean([len(a & b) / args.top_k for a, b in zip(found, baseline)])
+            metrics = index.get_metrics()
+            print(f"{storage:8s} {recall:7.3f} {agreement:7.3f} {metrics['resident_mb']:12.1f} "
+                  f"{metrics['disk_mb']:8.1f} {query_ms:9.2f} {build_time:8.1f}")
+
+    failed = [storage for storage in STORAGE_MODES if not check_paging(storage, rng)]
+    if failed:
+        print(f"paging FAILED with {', '.join(failed)}")
+        sys.exit(1)
+    print("paging: every live chunk returned exactly once in every storage mode")
+
+
+if __name__ == "__main__":
+    main()
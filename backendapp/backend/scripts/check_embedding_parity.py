@@ -0,0 +1,141 @@
+# scripts/check_embedding_parity.py
+"""
+Check that the ONNX embedding backend matches the PyTorch model
+
+Encodes the same texts with SentenceTransformer (PyTorch) and with the ONNX
+export in EMBEDDING_ONNX_DIR, then reports the cosine between the two
+embeddings of every text, how often each text's nearest neighbours agree,
+and the query latency and process memory of both backends. Exits non-zero
+when the lowest cosine is under --min-cosine.
+
+Texts come from --texts (one per line; page chunks work well), otherwise
+from a built-in Marathi/English sample.
+
+Usage: python scripts/check_embedding_parity.py [--texts chunks.txt]
+                                                [--min-cosine 0.98] [--threads 0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the parent directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import psutil
+
+from app.config import settings
+from app.services.onnx_embedding import OnnxSentenceEncoder
+
+SAMPLE_TEXTS = [
+    "ग्रामपंचायतीच्या मासिक सभेचे इतिवृत्त",
+    "ग्रामसभेत पाणीपुरवठा योजनेचा ठराव मंजूर करण्यात आला",
+    "घरपट्टी व पाणीपट्टी वसुलीचा आढावा घेण्यात आला",
+    "महाराष्ट्र ग्रामपंचायत अधिनियम १९५८ कलम ४५ नुसार",
+    "सरपंच व उपसरपंच यांची निवड",
+    "जन्म मृत्यू नोंदणी दाखला मिळण्यासाठी अर्ज",
+    "रोजगार हमी योजनेअंतर्गत कामांची यादी",
+    "शासन निर्णय क्रमांक ग्रापंच-२०१९/प्र.क्र.१२",
+    "अंगणवाडी इमारत बांधकामासाठी निधी",
+    "स्वच्छ भारत अभियान अंतर्गत शौचालय अनुदान",
+    "Minutes of the monthly gram panchayat meeting",
+    "Resolution approving the water supply scheme",
+    "Property tax and water tax collection review",
+    "Application for birth and death registration certificate",
+    "Funds for construction of the anganwadi building",
+    "पंधराव्या वित्त आयोगाचा निधी खर्चाचा तपशील",
+    "ग्रामसेवक यांनी मागील सभेचे इतिवृत्त वाचून दाखविले",
+    "दिव्यांग लाभार्थ्यांना ५ टक्के निधीचे वाटप",
+    "रस्ता दुरुस्ती व गटार बांधकाम",
+    "ई-ग्राम स्वराज पोर्टलवर आराखडा अपलोड करणे",
+]
+
+
+def rss_mb() -> float:
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def timed_load(create):
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    model = create()
+    return model, time.perf_counter() - start, rss_mb() - rss_before
+
+
+def query_ms(model, texts) -> float:
+    model.encode(texts[:1])
+    start = time.perf_counter()
+    for text in texts:
+        model.encode([text])
+    return (time.perf_counter() - start) * 1000 / len(texts)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts")
+    parser.add_argument("--onnx-dir", default=settings.embedding_onnx_dir)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=settings.embedding_intra_op_threads)
+    args = parser.parse_args()
+
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = SAMPLE_TEXTS
+
+    # ONNX first, so its memory is measured without PyTorch already loaded
+    onnx_model, onnx_load, onnx_rss = timed_load(
+        lambda: OnnxSentenceEncoder(args.onnx_dir, intra_op_threads=args.threads)
+    )
+
+    def load_torch():
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if args.threads > 0:
+            torch.set_num_threads(args.threads)
+        return SentenceTransformer(onnx_model.model_name, device="cpu")
+
+    torch_model, torch_load, torch_rss = timed_load(load_torch)
+
+    expected = normalize(np.asarray(torch_model.encode(texts, batch_size=32), dtype=np.float32))
+    actual = normalize(onnx_model.encode(texts, batch_size=32))
+    cosines = (expected * actual).sum(axis=1)
+
+    k = min(args.top_k, len(texts) - 1)
+    agreement = 1.0
+    if k > 0:
+        def neighbours(vectors):
+            similarity = vectors @ vectors.T
+            np.fill_diagonal(similarity, -np.inf)
+            return np.argsort(-similarity, axis=1)[:, :k]
+
+        agreement = np.mean([
+            len(set(a) & set(b)) / k for a, b in zip(neighbours(expected), neighbours(actual))
+        ])
+
+    print(f"{onnx_model.model_name}, {len(texts)} texts, "
+          f"{'int8' if onnx_model.config.get('quantized') else 'float32'} ONNX export in {args.onnx_dir}")
+    print(f"cosine torch vs onnx: min {cosines.min():.4f}  mean {cosines.mean():.4f}  "
+          f"neighbours@{k} agreement {agreement:.3f}")
+    print(f"{'backend':8s} {'load s':>7s} {'load MB':>8s} {'ms/query':>9s}")
+    print(f"{'torch':8s} {torch_load:7.2f} {torch_rss:8.1f} {query_ms(torch_model, texts):9.2f}")
+    print(f"{'onnx':8s} {onnx_load:7.2f} {onnx_rss:8.1f} {query_ms(onnx_model, texts):9.2f}")
+
+    if cosines.min() < args.min_cosine:
+        worst = int(np.argmin(cosines))
+        print(f"FAIL: cosine {cosines[worst]:.4f} < {args.min_cosine} for {texts[worst]!r}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
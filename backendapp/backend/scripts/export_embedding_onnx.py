@@ -0,0 +1,91 @@
+# scripts/export_embedding_onnx.py
+"""
+Export the sentence embedding model to ONNX for EMBEDDING_BACKEND=onnx
+
+Exports the transformer of EMBEDDING_MODEL_NAME (token embeddings out, pooling
+is done by OnnxSentenceEncoder), quantizes its weights to int8 with ONNX
+Runtime dynamic quantization, and saves the tokenizer next to it.
+Needs torch and sentence-transformers, which the onnx backend itself does not.
+Check the result with scripts/check_embedding_parity.py.
+
+Usage: python scripts/export_embedding_onnx.py [--output DIR] [--no-quantize]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+# Add the parent directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.services.onnx_embedding import ENCODER_CONFIG_FILE, ONNX_MODEL_FILE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.embedding_model_name)
+    parser.add_argument("--output", default=settings.embedding_onnx_dir)
+    parser.add_argument("--no-quantize", action="store_true", help="keep float32 weights")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(args.model, device="cpu")
+    transformer = model[0].auto_model.eval()
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask):
+            return self.transformer(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    os.makedirs(args.output, exist_ok=True)
+    sample = model.tokenizer(["नमुना वाक्य"], return_tensors="pt")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        float_path = os.path.join(tmp_dir, "model.float32.onnx")
+        torch.onnx.export(
+            TokenEmbeddings(transformer),
+            (sample["input_ids"], sample["attention_mask"]),
+            float_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["token_embeddings"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_embeddings": {0: "batch", 1: "sequence"},
+            },
+            opset_version=args.opset,
+            dynamo=False,
+        )
+
+        model_path = os.path.join(args.output, ONNX_MODEL_FILE)
+        if args.no_quantize:
+            os.replace(float_path, model_path)
+        else:
+            # Weights of MatMul/Gemm become int8; activations are quantized per batch at run time
+            quantize_dynamic(float_path, model_path, weight_type=QuantType.QInt8)
+
+    model.tokenizer.save_pretrained(args.output)
+    with open(os.path.join(args.output, ENCODER_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": args.model,
+            "max_seq_length": model.max_seq_length,
+            "pad_token": model.tokenizer.pad_token,
+            "quantized": not args.no_quantize,
+        }, f, indent=2)
+
+    size_mb = os.path.getsize(model_path) / (1024 * 1024)
+    print(f"Exported {args.model} to {model_path} ({size_mb:.1f} MB, "
+          f"{'float32' if args.no_quantize else 'int8 weights'})")
+
+
+if __name__ == "__main__":
+    main()
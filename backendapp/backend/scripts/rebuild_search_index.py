@@ -0,0 +1,45 @@
+# scripts/rebuild_search_index.py
+"""
+Script to rebuild the inverted text index for books that were ingested
+before the index existed (or after changing the tokenizer)
+
+With --vectors the books are also re-chunked and re-embedded into the
+semantic index (after changing the chunker or the embedding model).
+
+Usage: python scripts/rebuild_search_index.py [--vectors] [book_id ...]
+"""
+
+import os
+import sys
+
+# Add the parent directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import SessionLocal
+import app.models  # noqa: F401  (register all models)
+from app.models.books import Book
+from app.services.search_cache import invalidate_book
+from app.services.search_service import SearchService
+from app.services.text_index_service import TextIndexService
+
+
+def rebuild(book_ids, vectors=False):
+    db = SessionLocal()
+    try:
+        if not book_ids:
+            book_ids = [book_id for (book_id,) in db.query(Book.id).all()]
+
+        for book_id in book_ids:
+            TextIndexService.reindex_book(db, book_id)
+            if vectors:
+                SearchService(db).index_book(book_id)
+            # Only reaches other workers when REDIS_URL is set
+            invalidate_book(book_id)
+            print(f"Reindexed book {book_id}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    rebuild([int(arg) for arg in args if arg != "--vectors"], vectors="--vectors" in args)